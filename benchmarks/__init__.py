@@ -0,0 +1,42 @@
+"""Standalone benchmarks and stress checks, run with `python -m benchmarks.<name>` from the repo root.
+
+None of them touch bot_database.db: each runs against a throwaway copy of the schema.
+"""
+import os
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager, redirect_stdout
+
+import database as db
+
+@contextmanager
+def temporary_database():
+    """Points the database module at a fresh, migrated database file for the duration of the block."""
+    original = db.DATABASE_FILE
+    with tempfile.TemporaryDirectory() as directory:
+        db.DATABASE_FILE = os.path.join(directory, 'bench.db')
+        try:
+            with redirect_stdout(None):  # Keep the migration progress out of the results
+                db.init_db()
+            yield db.DATABASE_FILE
+        finally:
+            db.DATABASE_FILE = original
+
+def measure(func, repeat=5, setup=None):
+    """Runs `func` `repeat` times and returns (median, best) wall time in milliseconds.
+
+    `setup`, if given, runs untimed before each run.
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), min(timings)
+
+def report(label, timings):
+    median, best = timings
+    print(f"{label:<44} median {median:9.2f}ms   best {best:9.2f}ms")
@@ -0,0 +1,87 @@
+"""Measures the cost of per-player locks and how they behave under contention.
+
+    python -m benchmarks.lock_contention
+
+- uncontended: acquire/release cost when nobody else wants the lock, and that the registry
+  empties afterwards
+- hot player: many commands queued on one player; how long each one waits for its turn
+- spread load: commands over many players with simulated I/O inside the lock, per-player
+  locks against a single global lock
+- pairs: trades locking two random players at once; finishes (no deadlock) and loses no updates
+"""
+import asyncio
+import gc
+import random
+import statistics
+import time
+
+import player_locks
+from player_locks import player_lock
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+async def uncontended(operations=200_000, players=1_000):
+    start = time.perf_counter()
+    for i in range(operations):
+        async with player_lock(i % players):
+            pass
+    per_op = (time.perf_counter() - start) / operations * 1e6
+    gc.collect()
+    print(f"uncontended      {per_op:6.2f}us per acquire/release, {len(player_locks._locks)} locks left in the registry")
+
+async def hot_player(commands=2_000, hold=0.0):
+    waits = []
+    async def command():
+        queued = time.perf_counter()
+        async with player_lock(1):
+            waits.append(time.perf_counter() - queued)
+            await asyncio.sleep(hold)
+    start = time.perf_counter()
+    await asyncio.gather(*(command() for _ in range(commands)))
+    elapsed = time.perf_counter() - start
+    print(f"hot player       {commands} commands on one player in {elapsed * 1000:.0f}ms, "
+          f"wait p50 {statistics.median(waits) * 1000:.2f}ms p99 {percentile(waits, 0.99) * 1000:.2f}ms")
+
+async def spread_load(commands=2_000, players=200, io_time=0.002):
+    async def run(lock_for):
+        async def command(user_id):
+            async with lock_for(user_id):
+                await asyncio.sleep(io_time)  # Stands in for the database round trip
+        start = time.perf_counter()
+        await asyncio.gather(*(command(random.randrange(players)) for _ in range(commands)))
+        return time.perf_counter() - start
+
+    global_lock = asyncio.Lock()
+    per_player = await run(player_lock)
+    single = await run(lambda user_id: global_lock)
+    print(f"spread load      {commands} commands over {players} players, {io_time * 1000:g}ms held each: "
+          f"per-player locks {per_player * 1000:.0f}ms, one global lock {single * 1000:.0f}ms")
+
+async def pairs(trades=5_000, players=50):
+    balances = {user_id: 1_000 for user_id in range(players)}
+    async def trade():
+        a, b = random.sample(range(players), 2)
+        async with player_lock(a, b):
+            amount = random.randint(1, 10)
+            before_a, before_b = balances[a], balances[b]
+            await asyncio.sleep(0)  # Yield mid-update, like a database call would
+            balances[a], balances[b] = before_a - amount, before_b + amount
+    start = time.perf_counter()
+    await asyncio.wait_for(asyncio.gather(*(trade() for _ in range(trades))), timeout=30)
+    elapsed = time.perf_counter() - start
+    conserved = sum(balances.values()) == players * 1_000
+    print(f"pairs            {trades} two-player trades in {elapsed * 1000:.0f}ms, "
+          f"total balance {'conserved' if conserved else 'NOT conserved'}")
+    return conserved
+
+async def main():
+    random.seed(0)
+    await uncontended()
+    await hot_player()
+    await spread_load()
+    return await pairs()
+
+if __name__ == '__main__':
+    raise SystemExit(0 if asyncio.run(main()) else 1)
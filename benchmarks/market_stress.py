@@ -0,0 +1,95 @@
+"""Stress check for market purchases: many buyers race for the same listing.
+
+    python -m benchmarks.market_stress [buyers] [rounds]
+
+Every buyer calls buy_market_listing at once from its own thread and connection. Each round
+must end with exactly one winner, the character in the winner's collection, the seller paid
+once, and the total number of coins across all players unchanged. Exits non-zero on failure.
+"""
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import database as db
+from benchmarks import temporary_database
+
+SELLER_ID = 1
+PRICE = 250
+STARTING_COINS = 10_000
+
+def total_coins():
+    conn = sqlite3.connect(db.DATABASE_FILE)
+    try:
+        return conn.execute("SELECT SUM(coins) FROM players").fetchone()[0]
+    finally:
+        conn.close()
+
+def run_round(round_number, buyer_ids):
+    # A different character each round, so a buyer winning twice can't be confused with a duplicate
+    character = {"name": "All Might", "level": round_number, "iv": 75.0}
+    seller = db.get_player(SELLER_ID)
+    char_id = seller['next_character_id']
+    seller['characters'][char_id] = character
+    seller['next_character_id'] += 1
+    db.update_player(SELLER_ID, seller)
+    status, listing = db.add_market_listing(SELLER_ID, char_id, PRICE)
+    assert status == "ok", status
+    listing_id = listing['listing_id']
+    coins_before = total_coins()
+    seller_before = db.get_player(SELLER_ID)['coins']
+
+    start = threading.Barrier(len(buyer_ids))
+    def buy(buyer_id):
+        start.wait()  # Release every buyer at the same moment
+        status, _ = db.buy_market_listing(listing_id, buyer_id)
+        return buyer_id, status
+
+    began = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(buyer_ids)) as pool:
+        results = list(pool.map(buy, buyer_ids))
+    elapsed = time.perf_counter() - began
+
+    statuses = Counter(status for _, status in results)
+    winners = [buyer_id for buyer_id, status in results if status == "ok"]
+    failures = []
+    if len(winners) != 1:
+        failures.append(f"expected exactly one winner, got {len(winners)}: {dict(statuses)}")
+    if set(statuses) - {"ok", "missing", "insufficient_funds"}:
+        failures.append(f"unexpected statuses: {dict(statuses)}")
+    if total_coins() != coins_before:
+        failures.append(f"coins not conserved: {coins_before} before, {total_coins()} after")
+    if db.get_player(SELLER_ID)['coins'] != seller_before + PRICE * len(winners):
+        failures.append("seller was not paid exactly once")
+    if db.get_market_listing(listing_id) is not None:
+        failures.append("listing still exists after being bought")
+    for buyer_id in winners:
+        owned = [char for char in db.get_player(buyer_id)['characters'].values() if char == character]
+        if len(owned) != 1:
+            failures.append(f"winner {buyer_id} owns {len(owned)} copies of the character")
+    return elapsed, statuses, failures
+
+def main(buyers=300, rounds=5):
+    with temporary_database():
+        buyer_ids = list(range(100, 100 + buyers))
+        for user_id in [SELLER_ID, *buyer_ids]:
+            player = db.get_player(user_id)
+            player['coins'] = STARTING_COINS
+            db.update_player(user_id, player)
+
+        failed = False
+        for round_number in range(1, rounds + 1):
+            elapsed, statuses, failures = run_round(round_number, buyer_ids)
+            print(f"Round {round_number}: {buyers} simultaneous buyers, {dict(statuses)} in {elapsed * 1000:.0f}ms")
+            for failure in failures:
+                print(f"  FAIL: {failure}")
+            failed = failed or bool(failures)
+
+    print("FAILED" if failed else "OK: one winner per listing and coins conserved in every round")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:3]]
+    sys.exit(main(*args))
@@ -0,0 +1,51 @@
+"""Measures the calculator's evaluator and its worker pool.
+
+    python -m benchmarks.safe_eval
+
+- in-process: evaluate() on a plain and a worst-case accepted expression
+- cold start: how long a fresh pool takes to start its workers, which is kept out of EVAL_TIMEOUT
+- round trip: evaluate_async() on a warm pool, one at a time and many at once
+- restart: a timed-out evaluation, then the next one on the replacement pool
+"""
+import asyncio
+import statistics
+import time
+
+import safe_eval
+from benchmarks import measure, report
+
+EXPRESSIONS = {
+    "plain": "(12 + 7) * 3 / 4 - 2 ** 8",
+    "largest accepted": "2**1023 * 1 + 9" + "9" * 29 + " * 9" + "9" * 29,
+}
+
+def in_process():
+    for label, expression in EXPRESSIONS.items():
+        report(f"evaluate() {label} x1000", measure(lambda: [safe_eval.evaluate(expression) for _ in range(1000)]))
+
+async def timed(coro):
+    start = time.perf_counter()
+    await coro
+    return (time.perf_counter() - start) * 1000
+
+async def worker_pool(rounds=200, burst=50):
+    cold = await timed(safe_eval.warm_up())
+    print(f"{'cold start (' + str(safe_eval.WORKERS) + ' workers)':<44} {cold:9.2f}ms")
+
+    timings = [await timed(safe_eval.evaluate_async(EXPRESSIONS["plain"])) for _ in range(rounds)]
+    print(f"{'evaluate_async() round trip':<44} median {statistics.median(timings):9.2f}ms   best {min(timings):9.2f}ms")
+
+    elapsed = await timed(asyncio.gather(*(safe_eval.evaluate_async(EXPRESSIONS["plain"]) for _ in range(burst))))
+    print(f"{f'evaluate_async() burst of {burst}':<44} {elapsed:9.2f}ms total")
+
+    try:
+        await safe_eval.evaluate_async("1+1", timeout=0)
+    except safe_eval.EvaluationTimeout:
+        pass
+    first = await timed(safe_eval.evaluate_async("6*7"))
+    print(f"{'first call after a timeout restart':<44} {first:9.2f}ms (EVAL_TIMEOUT {safe_eval.EVAL_TIMEOUT:g}s)")
+    safe_eval.shutdown()
+
+if __name__ == '__main__':
+    in_process()
+    asyncio.run(worker_pool())
@@ -0,0 +1,61 @@
+"""Times the pieces of `!sellall` on a large collection.
+
+    python -m benchmarks.sell_all [collection size]
+
+Covers loading the player, matching the filters and pricing the matches (the work done before
+the confirmation prompt), and the single write that commits every sale.
+"""
+import random
+import sys
+
+import database as db
+from benchmarks import temporary_database, measure, report
+from cogs.commands import CharacterManagement
+
+USER_ID = 1
+FILTERS = ['', 'iv<30', 'iv<30 level<50', 'naruto']
+
+def build_collection(names, size):
+    characters = {}
+    for char_id in range(1, size + 1):
+        characters[char_id] = {
+            "name": random.choice(names), "level": random.randint(1, 100),
+            "iv": round(random.uniform(0, 100), 2), "xp": 0
+        }
+    return characters
+
+def main(size=50_000):
+    random.seed(0)
+    cog = CharacterManagement(bot=None)
+    collection = build_collection(list(cog.characters), size)
+    print(f"Collection of {size:,} characters")
+
+    with temporary_database():
+        player = db.get_player(USER_ID)
+        player.update(characters=collection, next_character_id=size + 1, team={'1': 1, '2': 2, '3': None}, selected_character_id=3)
+        db.update_player(USER_ID, player)
+
+        report("get_player", measure(lambda: db.get_player(USER_ID)))
+        player = db.get_player(USER_ID)
+        protected = cog._protected_ids(player)
+        for filters in FILTERS:
+            def match_and_price():
+                to_sell = [cid for cid in cog._apply_filters(player['characters'], filters) if cid not in protected]
+                return sum(cog._sale_price(player['characters'][cid]) for cid in to_sell)
+            report(f"match + price, filters {filters or '(none)'!r}", measure(match_and_price))
+
+        # The write is destructive, so every run starts from the full collection again
+        to_sell = [cid for cid in player['characters'] if cid not in protected]
+        def restore():
+            player = db.get_player(USER_ID)
+            player['characters'] = dict(collection)
+            db.update_player(USER_ID, player)
+        def sell(player):
+            for cid in to_sell:
+                player['coins'] += cog._sale_price(player['characters'].pop(cid))
+        def sell_everything():
+            assert db.mutate_player(USER_ID, sell) is not None
+        report(f"read + sell {len(to_sell):,} in one write", measure(sell_everything, setup=restore))
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
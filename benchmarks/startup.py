@@ -0,0 +1,82 @@
+"""Measures time to ready with and without lazy cog loading, in fresh processes.
+
+    python -m benchmarks.startup [rounds]
+
+Each round starts one process per mode, alternating, so both see the same machine load. A
+process counts as ready once setup would hand over to the gateway: interpreter start, imports,
+config, DB init on a throwaway database and cog loading. The gateway wait is the same in both
+modes and isn't included. The lazy mode also reports what each deferred cog costs on first use.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+LAZY = ["events", "abilities", "utils"]
+
+def child(lazy):
+    import asyncio
+    import main
+    import safe_eval
+    from benchmarks import temporary_database
+
+    async def run():
+        with temporary_database():
+            main.bot.config = dict(main.config, LAZY_COGS=lazy)
+            start = time.perf_counter()
+            await main.bot.load_all_cogs()
+            print("ready", flush=True)
+            first_use = {"cogs": (time.perf_counter() - start) * 1000}
+            for extension in list(main.bot.lazy_extensions):
+                start = time.perf_counter()
+                await main.bot.load_deferred(extension)
+                first_use[extension] = (time.perf_counter() - start) * 1000
+            print(json.dumps(first_use), flush=True)
+
+    asyncio.run(run())
+    safe_eval.shutdown()
+    os._exit(0)  # Skip tearing down the cogs' task loops, which never got a logged-in client
+
+def start_process(lazy):
+    """Returns (ms until the process reported ready, {"cogs": cog loading ms, extension: first-use ms})."""
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-m", "benchmarks.startup", "--child", json.dumps(lazy)],
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    ready = None
+    for line in process.stdout:
+        if line.strip() == "ready":
+            ready = (time.perf_counter() - start) * 1000
+        elif line.startswith("{"):
+            first_use = json.loads(line)
+    process.wait()
+    if ready is None:
+        raise RuntimeError(f"startup with LAZY_COGS={lazy} never became ready")
+    return ready, first_use
+
+def main(rounds):
+    ready = {"eager": [], "lazy": []}
+    cogs = {"eager": [], "lazy": []}
+    first_use = {}
+    for _ in range(rounds):
+        for mode, lazy in (("eager", []), ("lazy", LAZY)):
+            timing, loads = start_process(lazy)
+            ready[mode].append(timing)
+            cogs[mode].append(loads.pop("cogs"))
+            for extension, ms in loads.items():
+                first_use.setdefault(extension, []).append(ms)
+
+    for label, results in (("ready", ready), ("cog loading", cogs)):
+        for mode, timings in results.items():
+            print(f"{label + ', ' + mode:<44} median {statistics.median(timings):9.2f}ms   best {min(timings):9.2f}ms")
+        saved = statistics.median(results["eager"]) - statistics.median(results["lazy"])
+        print(f"{label + ' saved by deferring':<44} {saved:9.2f}ms")
+    for extension, timings in first_use.items():
+        print(f"{'first use of ' + extension:<44} median {statistics.median(timings):9.2f}ms")
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2 and sys.argv[1] == "--child":
+        child(json.loads(sys.argv[2]))
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 15)
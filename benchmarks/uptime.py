@@ -0,0 +1,53 @@
+"""Measures the !uptime client's request sharing and cache against the local UptimeRobot stub.
+
+    python -m benchmarks.uptime [callers] [stub_delay_seconds]
+
+- unshared: every caller sends its own request, as without the shared in-flight fetch
+- shared cold: the same burst through get_monitor_data with an empty cache
+- cached: get_monitor_data while the cached response is fresh
+"""
+import asyncio
+import sys
+import time
+import types
+
+import aiohttp
+from aiohttp import web
+
+import uptimerobot_stub
+from cogs.admin import Admin
+
+async def main(callers=100, delay=0.2):
+    app = uptimerobot_stub.create_app(delay=delay)
+    stub = app['stub']
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', 0).start()
+    session = aiohttp.ClientSession()
+    try:
+        cog = Admin(types.SimpleNamespace(http_session=session, config={}))
+        cog.api_key = 'stub'
+        cog.api_url = f'http://127.0.0.1:{runner.addresses[0][1]}/v2/getMonitors'
+
+        async def burst(label, call):
+            stub["requests"] = 0
+            start = time.perf_counter()
+            await asyncio.gather(*(call() for _ in range(callers)))
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"{label:<44} {elapsed:9.2f}ms   {stub['requests']} upstream requests")
+
+        await burst(f"unshared, {callers} callers", cog._fetch_monitor_data)
+        cog._monitor_cache = None
+        await burst(f"shared cold, {callers} callers", cog.get_monitor_data)
+
+        start = time.perf_counter()
+        for _ in range(10_000):
+            await cog.get_monitor_data()
+        print(f"{'cached call':<44} {(time.perf_counter() - start) / 10_000 * 1e6:9.2f}us")
+    finally:
+        await session.close()
+        await runner.cleanup()
+
+if __name__ == '__main__':
+    args = sys.argv[1:3]
+    asyncio.run(main(int(args[0]) if args else 100, float(args[1]) if len(args) > 1 else 0.2))
@@ -0,0 +1,74 @@
+import asyncio
+import heapq
+import time
+import database as db
+
+XP_BOOSTER_MULTIPLIER = 2  # Chat XP multiplier while a booster is running
+
+class BoosterEngine:
+    """Keeps the running XP boosters in memory so chat XP can apply them with one dict lookup.
+
+    The player_timers table is the source of truth; the engine loads the unexpired boosters once
+    and writes every purchase through to it. Expiry is driven by a heap ordered by expiry time and
+    a single task that sleeps until the earliest one, so nothing is checked per message. Extending
+    a booster leaves its old heap entry behind; the task skips entries that no longer match.
+    """
+    def __init__(self):
+        self.active = {}   # (user_id, char_id) -> (expires_at, multiplier)
+        self._heap = []    # (expires_at, user_id, char_id)
+        self._changed = asyncio.Event()
+        self._task = None
+
+    def load(self):
+        for user_id, subject, expires_at, multiplier in db.get_active_timers(db.TIMER_XP_BOOSTER):
+            self._set(user_id, int(subject), expires_at, multiplier)
+
+    def start(self):
+        self._task = asyncio.create_task(self._expire_loop())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+
+    def multiplier(self, user_id, char_id):
+        entry = self.active.get((user_id, char_id))
+        return entry[1] if entry else 1
+
+    def expires_at(self, user_id, char_id):
+        entry = self.active.get((user_id, char_id))
+        return entry[0] if entry else None
+
+    def add(self, user_id, char_id, seconds, multiplier=XP_BOOSTER_MULTIPLIER):
+        """Starts or extends a character's booster and returns when it now runs out."""
+        expires_at = db.extend_player_timer(user_id, db.TIMER_XP_BOOSTER, char_id, seconds, value=multiplier)
+        self._set(user_id, char_id, expires_at, multiplier)
+        return expires_at
+
+    def _set(self, user_id, char_id, expires_at, multiplier):
+        self.active[(user_id, char_id)] = (expires_at, multiplier)
+        heapq.heappush(self._heap, (expires_at, user_id, char_id))
+        if self._heap[0][0] == expires_at:
+            self._changed.set()  # New earliest expiry; wake the task so it sleeps for the right time
+
+    async def _expire_loop(self):
+        while True:
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                expires_at, user_id, char_id = heapq.heappop(self._heap)
+                entry = self.active.get((user_id, char_id))
+                if entry and entry[0] == expires_at:
+                    del self.active[(user_id, char_id)]
+            # The rows themselves are deleted by the periodic player timer sweep
+            timeout = self._heap[0][0] - now if self._heap else None
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+def start(bot):
+    """Loads the running boosters, starts expiring them and attaches the engine to the bot."""
+    bot.boosters = BoosterEngine()
+    bot.boosters.load()
+    bot.boosters.start()
+    return bot.boosters
@@ -3,17 +3,7 @@ import discord
 from discord.ext import commands
 import json
 import os
-
-# --- Helper for loading static game data ---
-def load_json_data(filename):
-    """Helper function to load data from a JSON file."""
-    try:
-        path = os.path.join(os.path.dirname(__file__), '..', 'data', filename)
-        with open(path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        print(f"Error: {filename} not found or is improperly formatted.")
-        return {}
+from game_data import load_json_data
 
 class Abilities(commands.Cog):
     """A command to look up character abilities."""
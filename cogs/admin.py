@@ -4,16 +4,29 @@ import json
 import os
 import random
 import asyncio
-import requests
+import aiohttp
+import time
 # Import the database functions
 import database as db
+import collection_index
+from player_locks import player_lock
+import perf
+import profiler
+import startup
+import game_data
+import threading
+import tracemalloc
+
+MONITOR_CACHE_TTL = 30  # Seconds an UptimeRobot response is reused for
 
 class Admin(commands.Cog):
     """A cog for bot administration commands, restricted to the Bot Admin."""
     def __init__(self, bot):
         self.bot = bot
         self.api_key = os.environ.get('UPTIMEROBOT_API_KEY', '')
-        self.api_url = 'https://api.uptimerobot.com/v2/getMonitors'
+        self.api_url = os.environ.get('UPTIMEROBOT_API_URL', 'https://api.uptimerobot.com/v2/getMonitors')
+        self._monitor_cache = None      # (fetched_at, monitors)
+        self._monitor_request = None    # In-flight fetch shared by concurrent callers
 
     # This check runs before any command in this cog is executed.
     async def cog_check(self, ctx):
@@ -72,6 +85,7 @@ class Admin(commands.Cog):
     @commands.command(name='reload', help="!reload <cog_name> - Reloads a cog.")
     async def reload_cog(self, ctx, cog_name: str):
         try:
+            game_data.clear_cache()  # So edited data files are read again
             await self.bot.reload_extension(f'cogs.{cog_name}')
             await ctx.send(f"✅ Successfully reloaded cog `{cog_name}`.")
         except Exception as e:
@@ -84,9 +98,10 @@ class Admin(commands.Cog):
 
     @commands.command(name='addbalance', aliases=['addbal'], help="!addbal <member> <amount> - Adds coins to a user.")
     async def add_balance(self, ctx, member: discord.Member, amount: int):
-        player = db.get_player(member.id)
-        player['coins'] += amount
-        db.update_player(member.id, player)
+        async with player_lock(member.id):
+            player = db.mutate_player(member.id, lambda player: player.update(coins=player['coins'] + amount))
+        if player is None:
+            await ctx.send(f"⚠️ {member.display_name}'s data kept changing, so the coins were not added. Please try again."); return
         await ctx.send(f"✅ Added **{amount}** coins to {member.mention}. Their new balance is **{player['coins']}**.")
 
     @commands.command(name='addchar', help="!addchar <member> <name> - Gives a character to a user.")
@@ -102,55 +117,66 @@ class Admin(commands.Cog):
             await ctx.send(f"❌ **Error:** Character '{character_name}' not found in the game data.")
             return
 
-        player = db.get_player(member.id)
-        base_char_data = cz_cog.characters[found_char_name]
-        new_char_instance = cz_cog._create_character_instance(base_char_data)
-        for stat in new_char_instance['individual_ivs'].keys():
-            new_char_instance['individual_ivs'][stat] = 31
-        new_char_instance['iv'] = 100.0
-        new_char_instance['stats'] = stats_cog._calculate_stats(base_char_data, new_char_instance['individual_ivs'], 1)
-        char_id = player['next_character_id']
-        player['characters'][char_id] = new_char_instance
-        player['next_character_id'] += 1
-        db.update_player(member.id, player)
+        async with player_lock(member.id):
+            player = db.get_player(member.id)
+            base_char_data = cz_cog.characters[found_char_name]
+            new_char_instance = cz_cog._create_character_instance(base_char_data)
+            for stat in new_char_instance['individual_ivs'].keys():
+                new_char_instance['individual_ivs'][stat] = 31
+            new_char_instance['iv'] = 100.0
+            new_char_instance['stats'] = stats_cog.stats_for_level(found_char_name, new_char_instance['individual_ivs'], 1)
+            char_id = player['next_character_id']
+            player['characters'][char_id] = new_char_instance
+            player['next_character_id'] += 1
+            if not db.update_player(member.id, player):
+                await ctx.send(f"⚠️ {member.display_name}'s data changed while this was running, so nothing was saved. Please try again."); return
+            collection_index.character_added(member.id, char_id, new_char_instance, player['version'])
         await ctx.send(f"✅ Gave a **100% IV {found_char_name}** (ID: {char_id}) to {member.mention}.")
 
     @commands.command(name='datatransfer', aliases=['dt'], help="!dt <from> <to> - Transfers all RPG data.")
     async def data_transfer(self, ctx, source_member: discord.Member, target_member: discord.Member):
         if source_member.id == target_member.id:
             await ctx.send("❌ You cannot transfer data to the same user."); return
-        source_player = db.get_player(source_member.id)
-        target_player = db.get_player(target_member.id)
-        target_player['coins'] += source_player.get('coins', 0)
-        for item, count in source_player.get('inventory', {}).items():
-            target_player['inventory'][item] = target_player['inventory'].get(item, 0) + count
-        next_id = target_player.get('next_character_id', 1)
-        for char_data in source_player.get('characters', {}).values():
-            target_player['characters'][next_id] = char_data
-            next_id += 1
-        target_player['next_character_id'] = next_id
-        db.reset_player(source_member.id)
-        db.update_player(target_member.id, target_player)
+        async with player_lock(source_member.id, target_member.id):
+            source_player = db.get_player(source_member.id)
+            target_player = db.get_player(target_member.id)
+            target_player['coins'] += source_player.get('coins', 0)
+            for item, count in source_player.get('inventory', {}).items():
+                target_player['inventory'][item] = target_player['inventory'].get(item, 0) + count
+            next_id = target_player.get('next_character_id', 1)
+            for char_data in source_player.get('characters', {}).values():
+                target_player['characters'][next_id] = char_data
+                next_id += 1
+            target_player['next_character_id'] = next_id
+            # Save the target first, so a rejected write can't leave the source wiped with nowhere to go
+            if not db.update_player(target_member.id, target_player):
+                await ctx.send(f"⚠️ {target_member.display_name}'s data changed while this was running, so nothing was transferred. Please try again."); return
+            db.reset_player(source_member.id)
+            collection_index.invalidate(source_member.id)
+            collection_index.invalidate(target_member.id)
         await ctx.send(f"✅ **Transfer Complete!** Data from {source_member.mention} has been moved to {target_member.mention}.")
 
     @commands.command(name='maxlevel', help="!maxlevel <member> <char_id> - Maxes a character's level.")
     async def max_level_character(self, ctx, member: discord.Member, char_id: int):
-        player = db.get_player(member.id)
-        if char_id not in player.get('characters', {}):
-            await ctx.send(f"❌ User {member.display_name} does not own a character with ID `{char_id}`."); return
-        character = player['characters'][char_id]
-        if character.get('level', 1) >= 100:
-            await ctx.send(f"✅ **{character['name']}** is already at max level."); return
-        stats_cog = self.bot.get_cog('Stat Calculations')
-        if not stats_cog:
-            await ctx.send("Stat calculation cog not loaded."); return
-        base_char_data = self.bot.get_cog('Core Gameplay').characters.get(character['name'])
-        if not base_char_data:
-            await ctx.send("Could not find base character data."); return
-        character['level'] = 100
-        character['xp'] = 0
-        character['stats'] = stats_cog._calculate_stats(base_char_data, character['individual_ivs'], 100)
-        db.update_player(member.id, player)
+        async with player_lock(member.id):
+            player = db.get_player(member.id)
+            if char_id not in player.get('characters', {}):
+                await ctx.send(f"❌ User {member.display_name} does not own a character with ID `{char_id}`."); return
+            character = player['characters'][char_id]
+            if character.get('level', 1) >= 100:
+                await ctx.send(f"✅ **{character['name']}** is already at max level."); return
+            stats_cog = self.bot.get_cog('Stat Calculations')
+            if not stats_cog:
+                await ctx.send("Stat calculation cog not loaded."); return
+            base_char_data = self.bot.get_cog('Core Gameplay').characters.get(character['name'])
+            if not base_char_data:
+                await ctx.send("Could not find base character data."); return
+            character['level'] = 100
+            character['xp'] = 0
+            character['stats'] = stats_cog.stats_for_level(character['name'], character['individual_ivs'], 100)
+            if not db.update_player(member.id, player):
+                await ctx.send(f"⚠️ {member.display_name}'s data changed while this was running, so nothing was saved. Please try again."); return
+            collection_index.character_updated(member.id, char_id, character, player['version'])
         await ctx.send(f"🎉 **Success!** {member.mention}'s **{character['name']}** (ID: {char_id}) has been maxed out to Level 100.")
 
     @commands.command(name='resetplayersdata', aliases=['rpd'], help="!rpd - Wipes all player data.")
@@ -165,6 +191,7 @@ class Admin(commands.Cog):
             await self.bot.wait_for('message', timeout=20.0, check=check)
             await ctx.send("Confirmation received. Wiping data...")
             db.reset_all_players()
+            collection_index.invalidate()
             await ctx.send("✅ **All player data has been successfully wiped.**")
         except asyncio.TimeoutError:
             await ctx.send("Confirmation timed out. Player data reset has been cancelled.")
@@ -185,7 +212,9 @@ class Admin(commands.Cog):
         try:
             await self.bot.wait_for('message', timeout=20.0, check=check)
             await ctx.send(f"Confirmation received. Wiping data for {member.display_name}...")
-            db.reset_player(member.id)
+            async with player_lock(member.id):
+                db.reset_player(member.id)
+                collection_index.invalidate(member.id)
             await ctx.send(f"✅ **All data for {member.display_name} has been successfully wiped.**")
         except asyncio.TimeoutError:
             await ctx.send("Confirmation timed out. Player data wipe has been cancelled.")
@@ -197,45 +226,61 @@ class Admin(commands.Cog):
         if not self.api_key:
             return {"error": "UptimeRobot API key not configured"}
 
-        try:
-            params = {
-                'api_key': self.api_key,
-                'format': 'json',
-                'logs': '1'
-            }
-
-            response = requests.post(self.api_url, data=params, timeout=10)
-            response.raise_for_status()
-
-            data = response.json()
+        if self._monitor_cache and time.monotonic() - self._monitor_cache[0] < MONITOR_CACHE_TTL:
+            return self._monitor_cache[1]
 
-            if data.get('stat') == 'ok':
-                return data.get('monitors', [])
-            else:
-                return {"error": f"API Error: {data.get('error', 'Unknown error')}"}
+        # Concurrent !uptime calls wait on the same request instead of each sending their own
+        if self._monitor_request is None or self._monitor_request.done():
+            self._monitor_request = asyncio.create_task(self._fetch_monitor_data())
+        return await asyncio.shield(self._monitor_request)
 
-        except requests.exceptions.RequestException as e:
-            return {"error": f"Request failed: {str(e)}"}
+    async def _fetch_monitor_data(self):
+        params = {
+            'api_key': self.api_key,
+            'format': 'json',
+            'logs': '1'
+        }
+        try:
+            async with self.bot.http_session.post(self.api_url, data=params) as response:
+                response.raise_for_status()
+                data = await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return {"error": f"Request failed: {str(e) or type(e).__name__}"}
         except json.JSONDecodeError:
             return {"error": "Invalid JSON response"}
 
+        # Anything but the documented shape is reported, not raised: every waiting !uptime shares this task
+        if not isinstance(data, dict):
+            return {"error": "Invalid JSON response"}
+        if data.get('stat') != 'ok':
+            return {"error": f"API Error: {data.get('error', 'Unknown error')}"}
+        monitors = data.get('monitors', [])
+        if not isinstance(monitors, list) or not all(isinstance(m, dict) for m in monitors):
+            return {"error": "Invalid JSON response"}
+        self._monitor_cache = (time.monotonic(), monitors)
+        return monitors
+
     @commands.command(name="status", help="!status - Check if bot is alive")
     async def get_status(self, ctx):
         """Check if the bot's web server is alive"""
 
-        import aiohttp
-        import asyncio
-
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get('http://127.0.0.1:5000', timeout=aiohttp.ClientTimeout(total=5)) as response:
-                    if response.status == 200:
-                        status_msg = "✅ **Bot is ALIVE!**\n✅ Connected and responding"
-                        if self.api_key:
-                            status_msg += "\n🔗 **Monitor:** https://stats.uptimerobot.com/"
-                        await ctx.send(status_msg)
-                    else:
-                        await ctx.send(f"⚠️ Bot responding but web server returned status {response.status}")
+            # Flagged like a keep-alive ping so the check doesn't count as outside traffic
+            async with self.bot.http_session.get('http://127.0.0.1:5000', headers={'X-Keep-Alive': '1'},
+                                                 timeout=aiohttp.ClientTimeout(total=5)) as response:
+                if response.status == 200:
+                    status_msg = "✅ **Bot is ALIVE!**\n✅ Connected and responding"
+                    keep_alive = getattr(self.bot, 'keep_alive', None)
+                    if keep_alive and keep_alive.history:
+                        stats = keep_alive.latency_stats()
+                        avg = f"{stats['avg']:.0f}ms avg" if stats['avg'] is not None else "no successful pings"
+                        status_msg += (f"\n🔄 **Keep-alive:** {avg} over {stats['pings']} pings, "
+                                       f"{stats['failures']} failed, {stats['skipped']} skipped for real traffic")
+                    if self.api_key:
+                        status_msg += "\n🔗 **Monitor:** https://stats.uptimerobot.com/"
+                    await ctx.send(status_msg)
+                else:
+                    await ctx.send(f"⚠️ Bot responding but web server returned status {response.status}")
         except (aiohttp.ClientError, asyncio.TimeoutError):
             await ctx.send("❌ **Bot web server not responding**\n✅ Discord connection active")
 
@@ -259,6 +304,116 @@ class Admin(commands.Cog):
 
         await ctx.send(f"**Total Monitors:** {total_monitors}\n**Currently Up:** {up_monitors}\n**Success Rate:** {success_rate:.1f}%")
 
+    @commands.command(name='dbstats', help="!dbstats - Shows player write conflict and retry rates.")
+    async def db_stats(self, ctx):
+        stats = db.get_cas_stats()
+        await ctx.send(
+            f"**Player Writes:** {stats['writes']}\n"
+            f"**Conflicts:** {stats['conflicts']} ({stats['conflict_rate']:.2%})\n"
+            f"**Retries:** {stats['retries']} ({stats['retry_rate']:.2%})\n"
+            f"**Given Up:** {stats['failures']}"
+        )
+
+    @commands.command(name='perf', help="!perf [p50|p95|p99|max|count|db|api] - Shows the slowest commands.")
+    async def perf_report(self, ctx, sort_by: str = 'p95'):
+        sort_by = sort_by.lower()
+        stats = perf.summary()
+        if not stats:
+            await ctx.send("No commands have been timed yet."); return
+        if sort_by not in next(iter(stats.values())):
+            await ctx.send("Sort by one of: `p50`, `p95`, `p99`, `max`, `count`, `db`, `api`."); return
+
+        top = sorted(stats.items(), key=lambda item: item[1][sort_by], reverse=True)[:10]
+        embed = discord.Embed(title=f"🐢 Slowest Commands (by {sort_by})", color=discord.Color.orange())
+        for name, s in top:
+            embed.add_field(
+                name=f"!{name} ({s['count']} runs)",
+                value=f"p50 `{s['p50']:.0f}ms` • p95 `{s['p95']:.0f}ms` • p99 `{s['p99']:.0f}ms` • max `{s['max']:.0f}ms`\n"
+                      f"avg DB `{s['db']:.1f}ms` • avg API `{s['api']:.0f}ms`",
+                inline=False
+            )
+        embed.set_footer(text=f"Last {perf.PERF_WINDOW} runs per command • Runs over {perf.slow_threshold * 1000:.0f}ms go to {perf.SLOW_LOG_FILE}")
+        await ctx.send(embed=embed)
+
+    @commands.command(name='lag', help="!lag - Shows event loop lag and the latest blocking stacks.")
+    async def loop_lag(self, ctx):
+        watchdog = getattr(self.bot, 'watchdog', None)
+        if not watchdog:
+            await ctx.send("The loop watchdog is not running."); return
+
+        embed = discord.Embed(title="⏱️ Event Loop Lag", color=discord.Color.blurple())
+        lag = watchdog.lag_percentiles()
+        if lag:
+            embed.add_field(name="Last Minute", value=f"p50 `{lag['p50']:.1f}ms` • p95 `{lag['p95']:.1f}ms` • p99 `{lag['p99']:.1f}ms` • max `{lag['max']:.0f}ms`", inline=False)
+        embed.add_field(name="Stalls Recorded", value=f"{len(watchdog.stalls)} (threshold {watchdog.threshold * 1000:.0f}ms)", inline=False)
+        for stall in list(watchdog.stalls)[-2:]:
+            # The innermost frames are the ones doing the blocking
+            stack = stall['stack'][-900:]
+            embed.add_field(name=f"Blocked {stall['duration'] * 1000:.0f}ms <t:{int(stall['time'])}:R>", value=f"```py\n{stack}```", inline=False)
+        await ctx.send(embed=embed)
+
+    @commands.command(name='startup', help="!startup - Shows where the time went during the last startup.")
+    async def startup_report(self, ctx):
+        lines = startup.report()
+        embed = discord.Embed(title="🚀 Startup Breakdown", description="```\n" + "\n".join(lines)[-3900:] + "```", color=discord.Color.blurple())
+        first = f"{startup.first_command * 1000:.0f}ms" if startup.first_command is not None else "none yet"
+        embed.add_field(name="First Command Finished", value=first)
+        if self.bot.config.get('LAZY_COGS'):
+            pending = getattr(self.bot, 'lazy_extensions', {})
+            embed.add_field(name="Deferred Cogs", value=", ".join(pending) or "all loaded")
+        await ctx.send(embed=embed)
+
+    @commands.command(name='profile', help="!profile [seconds] [sample|cprofile] - Profiles the bot for a while and shows the hottest functions.")
+    async def profile(self, ctx, seconds: int = 30, mode: str = 'sample'):
+        mode = mode.lower()
+        if mode not in ('sample', 'cprofile'):
+            await ctx.send("Mode must be `sample` or `cprofile`."); return
+        if getattr(self, 'profiling', False):
+            await ctx.send("A profiling session is already running."); return
+        seconds = max(1, min(seconds, profiler.MAX_PROFILE_SECONDS))
+
+        # Sampling only reads the loop thread's stack from another thread; cProfile traces every call
+        session = profiler.SamplingProfiler(threading.get_ident()) if mode == 'sample' else profiler.CProfileSession()
+        self.profiling = True
+        await ctx.send(f"🔬 Profiling for **{seconds}s** (`{mode}`)...")
+        try:
+            session.start()
+            await asyncio.sleep(seconds)
+        finally:
+            session.stop()
+            self.profiling = False
+        path = session.write()
+
+        embed = discord.Embed(title=f"🔬 Profile ({mode}, {seconds}s)", color=discord.Color.dark_teal())
+        if mode == 'sample':
+            lines = [f"`{cum:5.1f}%` `{own:5.1f}%` {name}" for name, cum, own in session.top()]
+            header = f"{session.samples} samples • cumulative % • own %"
+        else:
+            lines = [f"`{cum:7.3f}s` `{calls:>6}` {name}" for name, cum, calls in session.top()]
+            header = "cumulative time • calls"
+        embed.description = header + "\n" + ("\n".join(lines) or "Nothing was recorded.")
+        embed.set_footer(text=f"Full results: {path}")
+        await ctx.send(embed=embed)
+
+    @commands.command(name='memsnap', help="!memsnap [start|stop|top_n] - Tracks allocations and shows the top allocation sites.")
+    async def memory_snapshot(self, ctx, action: str = '10'):
+        action = action.lower()
+        if action == 'stop':
+            tracemalloc.stop()
+            await ctx.send("🧠 Allocation tracking stopped."); return
+        if action == 'start' or not tracemalloc.is_tracing():
+            tracemalloc.start()
+            await ctx.send("🧠 Allocation tracking started. Run `!memsnap` again later to see the top allocation sites."); return
+        if not action.isdigit():
+            await ctx.send("Usage: `!memsnap [start|stop|top_n]`"); return
+
+        path, top = await asyncio.to_thread(profiler.memory_snapshot, min(int(action), 20))
+        current, peak = tracemalloc.get_traced_memory()
+        embed = discord.Embed(title="🧠 Top Allocation Sites", color=discord.Color.dark_teal())
+        embed.description = "\n".join(f"`{size / 1024:9.1f} KiB` `{count:>7}` {site}" for site, size, count in top) or "Nothing allocated yet."
+        embed.set_footer(text=f"Traced: {current / 1024 / 1024:.1f} MiB (peak {peak / 1024 / 1024:.1f} MiB) • Full results: {path}")
+        await ctx.send(embed=embed)
+
     @commands.command(name='rmvimage', help="!rmvimage <char_id> - Remove a character image.")
     async def remove_character_image(self, ctx, char_id: int):
         """Remove a character image from the images directory"""
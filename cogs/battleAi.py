@@ -1,27 +1,23 @@
 # -*- coding: utf-8 -*-
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 import json
 import os
 import random
 import time
 import datetime
-from collections import defaultdict
+from collections import defaultdict, deque
 import asyncio
 import math
 # Import the database functions
 import database as db
+from player_locks import player_lock
+from game_data import load_json_data
 
-# --- Helper for loading static game data ---
-def load_json_data(filename):
-    """Helper function to load data from a JSON file."""
-    try:
-        path = os.path.join(os.path.dirname(__file__), '..', 'data', filename)
-        with open(path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        print(f"Error: {filename} not found or is improperly formatted.")
-        return {}
+# --- AI Team Pool Settings ---
+AI_TEAM_SIZE = 3
+AI_POOL_TEAMS_PER_LEVEL = 3       # Ready-made teams kept per level bucket
+AI_POOL_WARM_LEVELS = range(1, 26)  # Pulls land on levels 1-25, so warm those first
 
 # --- Custom Check for Rules Acceptance ---
 def has_accepted_rules():
@@ -46,7 +42,66 @@ class BattleAI(commands.Cog, name="AI Battle"):
         self.characters = load_json_data('characters.json')
         self.attacks = load_json_data('attacks.json')
         self.ranks = load_json_data('ranks.json')
-        
+        # Pre-generated AI teams, keyed by level bucket (the team's average level)
+        self.team_pool = defaultdict(deque)
+        self.pool_levels = set(AI_POOL_WARM_LEVELS)
+        self.pool_hits = 0
+        self.pool_misses = 0
+
+    async def cog_load(self):
+        self.refill_team_pool.start()
+
+    async def cog_unload(self):
+        self.refill_team_pool.cancel()
+
+    # --- AI Team Pool ---
+    def _build_ai_team(self, level):
+        """Builds a fresh, battle-ready AI team scaled to the given level."""
+        stats_cog = self.bot.get_cog('Stat Calculations')
+        if not stats_cog or not self.bot.get_cog('Core Gameplay'):
+            return None
+
+        bot_team = []
+        for name, data in random.sample(list(self.characters.items()), AI_TEAM_SIZE):
+            scaled_char = stats_cog._scale_character_to_level({"name": name, **data}, level)
+
+            # Advanced AI moveset learning - give them optimal movesets based on their level
+            scaled_char['moveset'] = self._generate_ai_moveset(scaled_char, name)
+
+            # Initialize current_hp for battle
+            scaled_char['current_hp'] = scaled_char['stats']['HP']
+
+            bot_team.append(scaled_char)
+        return bot_team
+
+    def _take_ai_team(self, level):
+        """Pops a ready AI team for the level bucket, building one inline only if the bucket is empty."""
+        self.pool_levels.add(level)
+        bucket = self.team_pool[level]
+        if bucket:
+            self.pool_hits += 1
+            return bucket.popleft()
+        self.pool_misses += 1
+        return self._build_ai_team(level)
+
+    @tasks.loop(seconds=15)
+    async def refill_team_pool(self):
+        """Tops every known level bucket back up to its target size."""
+        for level in sorted(self.pool_levels):
+            bucket = self.team_pool[level]
+            while len(bucket) < AI_POOL_TEAMS_PER_LEVEL:
+                team = self._build_ai_team(level)
+                if team is None:
+                    return  # Stat/Core cogs not loaded yet, try again next tick
+                bucket.append(team)
+                # Yield between teams so warming the pool never stalls the gateway
+                await asyncio.sleep(0)
+
+    @refill_team_pool.before_loop
+    async def before_refill_team_pool(self):
+        # Warm lazily once the bot is connected instead of delaying startup
+        await self.bot.wait_until_ready()
+
     def get_character_attacks(self, character):
         """Fetches the list of available attacks for a character instance."""
         active_moves = character.get('moveset', [])
@@ -156,6 +211,46 @@ class BattleAI(commands.Cog, name="AI Battle"):
         best_move = max(move_scores, key=lambda x: x[1])[0]
         return best_move
 
+    # --- Headless Battle Engine ---
+    def simulate_battle(self, team_a, team_b, max_rounds=100):
+        """Runs an AI-vs-AI battle with no Discord I/O and returns the winning side (0 or 1)."""
+        stats_cog = self.bot.get_cog('Stat Calculations')
+        teams = (team_a, team_b)
+        fallback = self.attacks.get('physical', [])[:1]
+        attacks = {}
+        for team in teams:
+            for char in team:
+                char['current_hp'] = char['stats']['HP']
+                attacks[id(char)] = self.get_character_attacks(char) or fallback
+
+        active = [team_a[0], team_b[0]]
+        for _ in range(max_rounds):
+            actions = [
+                (side, self._select_ai_move(active[side], active[1 - side], attacks[id(active[side])]))
+                for side in (0, 1)
+            ]
+            actions.sort(key=lambda a: active[a[0]]['stats']['SPD'], reverse=True)
+
+            for side, attack in actions:
+                attacker, defender = active[side], active[1 - side]
+                if not attack or attacker['current_hp'] <= 0 or defender['current_hp'] <= 0:
+                    continue
+                if random.randint(1, 100) > attack.get('accuracy', 100):
+                    continue
+
+                dmg = stats_cog.calculate_damage(attacker, defender, attack)
+                defender['current_hp'] = max(0, defender['current_hp'] - dmg['damage'])
+                if defender['current_hp'] == 0:
+                    remaining = [c for c in teams[1 - side] if c['current_hp'] > 0]
+                    if not remaining:
+                        return side
+                    active[1 - side] = random.choice(remaining)
+
+        # Round cap reached: the side with more HP left (as a share of max HP) wins
+        def hp_share(team):
+            return sum(c['current_hp'] for c in team) / max(1, sum(c['stats']['HP'] for c in team))
+        return 0 if hp_share(team_a) >= hp_share(team_b) else 1
+
     # --- Battle UI Components (Copied from rpg.py for consistency) ---
     class BattleView(discord.ui.View):
         def __init__(self, author, available_attacks):
@@ -222,18 +317,9 @@ class BattleAI(commands.Cog, name="AI Battle"):
         team_levels = [player_data['characters'][cid]['level'] for cid in team_slots.values() if cid and cid in player_data['characters']]
         avg_level = max(1, sum(team_levels) // len(team_levels)) if team_levels else 1
         
-        bot_team_chars = random.sample(list(self.characters.items()), 3)
-        bot_team = []
-        for name, data in bot_team_chars:
-            scaled_char = stats_cog._scale_character_to_level({"name": name, **data}, avg_level)
-            
-            # Advanced AI moveset learning - give them optimal movesets based on their level
-            scaled_char['moveset'] = self._generate_ai_moveset(scaled_char, name)
-            
-            # Initialize current_hp for battle
-            scaled_char['current_hp'] = scaled_char['stats']['HP']
-            
-            bot_team.append(scaled_char)
+        bot_team = self._take_ai_team(avg_level)
+        if not bot_team:
+            await ctx.send("Game systems are currently offline (Core Gameplay module not loaded)."); return
 
         await self._run_ai_battle(ctx, challenger, player_data, bot_team)
 
@@ -351,50 +437,53 @@ class BattleAI(commands.Cog, name="AI Battle"):
             winner_is_user = any(c['current_hp'] > 0 for c in user_team)
             
             final_embed = self._create_battle_embed(log, user_team, bot_team, user, self.bot.user, user_active_char, bot_active_char)
-            player = db.get_player(user.id)
-            
-            # Calculate rank changes
-            old_rp = player.get('rank_points', 0)
-            old_rank, old_rank_data = self.get_player_rank(old_rp)
-            
-            if winner_is_user:
-                rp_change = self.calculate_rp_change(old_rp, avg_level * 100, True)  # Bot strength based on level
-                coin_reward = old_rank_data['coin_bonus']
-                
-                player['rank_points'] = max(0, old_rp + rp_change)
-                player['coins'] += coin_reward
-                
-                new_rank, new_rank_data = self.get_player_rank(player['rank_points'])
+            async with player_lock(user.id):
+                player = db.get_player(user.id)
                 
-                final_embed.title = "🏆 Victory! 🏆"
-                final_embed.description = f"You defeated the AI!\n"
-                final_embed.description += f"**Coins:** +{coin_reward} 💰\n"
-                final_embed.description += f"**Rank Points:** +{rp_change} RP 📈\n"
-                final_embed.description += f"**Rank:** {old_rank} → {new_rank}"
+                # Calculate rank changes
+                old_rp = player.get('rank_points', 0)
+                old_rank, old_rank_data = self.get_player_rank(old_rp)
                 
-                if new_rank != old_rank:
-                    final_embed.description += f"\n🎉 **RANK UP!** Welcome to {new_rank}!"
-                    final_embed.color = discord.Color.from_str(f"#{new_rank_data['color']}")
-            else:
-                rp_change = self.calculate_rp_change(old_rp, avg_level * 100, False)
-                coin_loss = 20
-                
-                player['rank_points'] = max(0, old_rp + rp_change)  # rp_change is negative
-                player['coins'] = max(0, player['coins'] - coin_loss)
-                
-                new_rank, new_rank_data = self.get_player_rank(player['rank_points'])
-                
-                final_embed.title = "☠️ Defeat ☠️"
-                final_embed.description = f"The AI was victorious.\n"
-                final_embed.description += f"**Coins:** -{coin_loss} 💸\n"
-                final_embed.description += f"**Rank Points:** {rp_change} RP 📉\n"
-                final_embed.description += f"**Rank:** {old_rank} → {new_rank}"
+                if winner_is_user:
+                    rp_change = self.calculate_rp_change(old_rp, avg_level * 100, True)  # Bot strength based on level
+                    coin_reward = old_rank_data['coin_bonus']
+                    
+                    player['rank_points'] = max(0, old_rp + rp_change)
+                    player['coins'] += coin_reward
+                    
+                    new_rank, new_rank_data = self.get_player_rank(player['rank_points'])
+                    
+                    final_embed.title = "🏆 Victory! 🏆"
+                    final_embed.description = f"You defeated the AI!\n"
+                    final_embed.description += f"**Coins:** +{coin_reward} 💰\n"
+                    final_embed.description += f"**Rank Points:** +{rp_change} RP 📈\n"
+                    final_embed.description += f"**Rank:** {old_rank} → {new_rank}"
+                    
+                    if new_rank != old_rank:
+                        final_embed.description += f"\n🎉 **RANK UP!** Welcome to {new_rank}!"
+                        final_embed.color = discord.Color.from_str(f"#{new_rank_data['color']}")
+                else:
+                    rp_change = self.calculate_rp_change(old_rp, avg_level * 100, False)
+                    coin_loss = 20
+                    
+                    player['rank_points'] = max(0, old_rp + rp_change)  # rp_change is negative
+                    player['coins'] = max(0, player['coins'] - coin_loss)
+                    
+                    new_rank, new_rank_data = self.get_player_rank(player['rank_points'])
+                    
+                    final_embed.title = "☠️ Defeat ☠️"
+                    final_embed.description = f"The AI was victorious.\n"
+                    final_embed.description += f"**Coins:** -{coin_loss} 💸\n"
+                    final_embed.description += f"**Rank Points:** {rp_change} RP 📉\n"
+                    final_embed.description += f"**Rank:** {old_rank} → {new_rank}"
+                    
+                    if new_rank != old_rank:
+                        final_embed.description += f"\n😞 **RANK DOWN** to {new_rank}"
+                        final_embed.color = discord.Color.from_str(f"#{new_rank_data['color']}")
                 
-                if new_rank != old_rank:
-                    final_embed.description += f"\n😞 **RANK DOWN** to {new_rank}"
-                    final_embed.color = discord.Color.from_str(f"#{new_rank_data['color']}")
-            
-            db.update_player(user.id, player)
+                # Applied as deltas in SQL, so a concurrent write to the player can't reject or undo the result
+                coin_change = coin_reward if winner_is_user else -coin_loss
+                db.apply_player_rewards({user.id: {"rank_points": rp_change, "coins": coin_change}})
             final_embed.set_footer(text=f"Balance: {player['coins']} coins | RP: {player['rank_points']} ({new_rank})")
             await battle_message.edit(embed=final_embed, view=None)
         
@@ -6,22 +6,20 @@ import os
 import random
 import time
 import datetime
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 import asyncio
 import math
 # Import the database functions
 import database as db
+import collection_index
+from player_locks import player_lock, serialized, WRITE_CONFLICT_MESSAGE
+from paginator import Paginator
+from game_data import load_json_data
 
-# --- Helper for loading static game data ---
-def load_json_data(filename):
-    """Helper function to load data from a JSON file."""
-    try:
-        path = os.path.join(os.path.dirname(__file__), '..', 'data', filename)
-        with open(path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        print(f"Error: {filename} not found or is improperly formatted.")
-        return {}
+# --- Character Catalog Settings ---
+CATALOG_SORTS = ['atk', 'def', 'spd', 'sp_atk', 'sp_def', 'hp', 'name']
+CATALOG_PAGE_SIZE = 10
+CATALOG_CACHE_SIZE = 128  # Filtered result sets kept in the LRU
 
 # --- Custom Check for Rules Acceptance ---
 def has_accepted_rules():
@@ -75,23 +73,78 @@ class CharacterManagement(commands.Cog, name="Player Commands"):
         self.characters = load_json_data('characters.json')
         self.attacks = load_json_data('attacks.json')
         self.items = load_json_data('items.json')
+        self._build_catalog_views()
+
+    # --- Character Catalog Views ---
+    def _build_catalog_views(self):
+        """Precomputes the per-stat orderings and unfiltered page embeds of the static character catalog."""
+        items = list(self.characters.items())
+        self.catalog_orders = {'name': sorted(items, key=lambda i: i[0])}
+        for sort_key in CATALOG_SORTS:
+            if sort_key != 'name':
+                self.catalog_orders[sort_key] = sorted(items, key=lambda i: i[1].get(sort_key.upper(), 0), reverse=True)
+
+        self.catalog_pages = {}
+        for sort_key, ordered in self.catalog_orders.items():
+            total_pages = math.ceil(len(ordered) / CATALOG_PAGE_SIZE)
+            self.catalog_pages[sort_key] = [self._render_catalog_page(ordered, page, total_pages, sort_key, "") for page in range(total_pages)]
+
+        # LRU of filtered, already-sorted results keyed by (sort key, sorted filter tokens)
+        self.catalog_filter_cache = OrderedDict()
+        self.catalog_cache_hits = 0
+        self.catalog_cache_misses = 0
+
+    def _render_catalog_page(self, sorted_chars, page_num, total_pages, sort_key, filters):
+        start_idx = page_num * CATALOG_PAGE_SIZE
+        page_chars = sorted_chars[start_idx:start_idx + CATALOG_PAGE_SIZE]
+
+        embed = discord.Embed(
+            title=f"All Characters (Sorted by {sort_key.upper()})",
+            description=f"Page {page_num + 1}/{total_pages} • {len(sorted_chars)} characters" + (f" (filtered)" if filters else ""),
+            color=discord.Color.dark_teal()
+        )
+
+        for name, stats in page_chars:
+            stat_line = f"`ATK:{stats['ATK']}|DEF:{stats['DEF']}|SPD:{stats['SPD']}|SP_ATK:{stats['SP_ATK']}|SP_DEF:{stats['SP_DEF']}|HP:{stats['HP']}`"
+            embed.add_field(name=name, value=stat_line, inline=False)
+
+        if filters:
+            embed.set_footer(text=f"Filters: {filters} • Use the buttons to navigate")
+        else:
+            embed.set_footer(text="Add filters: !chars name:Naruto atk>100 • Use the buttons to navigate")
+
+        return embed
+
+    def _get_filtered_catalog(self, sort_key, filters):
+        """Returns the catalog filtered and sorted, served from the LRU when the same query was seen recently."""
+        # Keep the tokens separate: joining them would make `name:"a b"` and `name:a b` the same key
+        cache_key = (sort_key, tuple(sorted(self._split_filters(filters))))
+        cached = self.catalog_filter_cache.get(cache_key)
+        if cached is not None:
+            self.catalog_filter_cache.move_to_end(cache_key)
+            self.catalog_cache_hits += 1
+            return cached
+
+        self.catalog_cache_misses += 1
+        matching = self._apply_character_filters(self.characters, filters)
+        # Walk the precomputed ordering instead of re-sorting the matches
+        result = [item for item in self.catalog_orders[sort_key] if item[0] in matching]
+        self.catalog_filter_cache[cache_key] = result
+        if len(self.catalog_filter_cache) > CATALOG_CACHE_SIZE:
+            self.catalog_filter_cache.popitem(last=False)
+        return result
 
     def _apply_filters(self, characters, filter_string):
         """Apply PokéTwo-style filters to character collection."""
         if not filter_string:
             return characters
         
+        filter_parts = self._split_filters(filter_string)
+
         filtered = {}
         for char_id, char_data in characters.items():
             include = True
             
-            # Split filters by spaces, but handle quoted strings
-            import shlex
-            try:
-                filter_parts = shlex.split(filter_string.lower())
-            except ValueError:
-                filter_parts = filter_string.lower().split()
-            
             for filter_part in filter_parts:
                 if ':' in filter_part:
                     # Handle key:value filters
@@ -188,22 +241,25 @@ class CharacterManagement(commands.Cog, name="Player Commands"):
         
         return filtered
 
+    def _split_filters(self, filter_string):
+        """Split filters by spaces, but handle quoted strings."""
+        import shlex
+        try:
+            return shlex.split(filter_string.lower())
+        except ValueError:
+            return filter_string.lower().split()
+
     def _apply_character_filters(self, characters, filter_string):
         """Apply filters to the global character database."""
         if not filter_string:
             return characters
         
+        filter_parts = self._split_filters(filter_string)
+
         filtered = {}
         for char_name, char_data in characters.items():
             include = True
             
-            # Split filters by spaces, but handle quoted strings
-            import shlex
-            try:
-                filter_parts = shlex.split(filter_string.lower())
-            except ValueError:
-                filter_parts = filter_string.lower().split()
-            
             for filter_part in filter_parts:
                 if ':' in filter_part:
                     # Handle key:value filters
@@ -294,10 +350,8 @@ class CharacterManagement(commands.Cog, name="Player Commands"):
             else:
                 await ctx.send(f"❌ No character found in your collection with ID `{char_id}`."); return None
 
-        matches = []
-        for char_id, char_data in player_data['characters'].items():
-            if identifier.lower() in char_data['name'].lower():
-                matches.append((char_id, char_data))
+        index = collection_index.get_index(player_data)
+        matches = [(char_id, player_data['characters'][char_id]) for char_id in index.find(identifier)]
 
         if not matches:
             await ctx.send(f"❌ No character found in your collection with the name `{identifier}`."); return None
@@ -310,6 +364,7 @@ class CharacterManagement(commands.Cog, name="Player Commands"):
 
     @commands.command(name='pull', aliases=['p'], help="!pull - Get a free random character every 5 minutes.", category="Gacha System")
     @has_accepted_rules()
+    @serialized
     async def pull(self, ctx):
         cz_cog = self.bot.get_cog('Core Gameplay')
         stats_cog = self.bot.get_cog('Stat Calculations')
@@ -357,13 +412,89 @@ class CharacterManagement(commands.Cog, name="Player Commands"):
         if not ticket_used:
             player['last_pull_time'] = time.time()
 
-        db.update_player(ctx.author.id, player)
+        if not db.update_player(ctx.author.id, player):
+            await ctx.send(WRITE_CONFLICT_MESSAGE); return
+        collection_index.character_added(ctx.author.id, char_id, new_char_instance, player['version'])
 
         ticket_text = " (🎟️ Ticket used)" if ticket_used else ""
         await ctx.send(f"You pulled a **Lvl {random_level} {char_name}** with **{new_char_instance['iv']}% IV**{ticket_text}! Use `!info latest` to see their stats.")
 
+    class ConfirmView(discord.ui.View):
+        def __init__(self, author):
+            super().__init__(timeout=30.0)
+            self.author = author
+            self.confirmed = False
+
+        async def interaction_check(self, interaction: discord.Interaction) -> bool:
+            return interaction.user.id == self.author.id
+
+        @discord.ui.button(label="Confirm", style=discord.ButtonStyle.green)
+        async def confirm(self, interaction: discord.Interaction, button: discord.ui.Button):
+            self.confirmed = True
+            await interaction.response.defer()
+            self.stop()
+
+        @discord.ui.button(label="Cancel", style=discord.ButtonStyle.red)
+        async def cancel(self, interaction: discord.Interaction, button: discord.ui.Button):
+            await interaction.response.defer()
+            self.stop()
+
+    def _sale_price(self, character):
+        return 10 + (character['level'] * 2) + round(character['iv'] / 5)
+
+    def _protected_ids(self, player):
+        """IDs that can never be sold: the selected character and the team."""
+        protected = {char_id for char_id in player.get('team', {}).values() if char_id is not None}
+        protected.add(player.get('selected_character_id'))
+        return protected
+
+    @commands.command(name='sellall', help="!sellall [filters] - Sells every character matching the filters, except your team and selected one.", category="Economy")
+    @has_accepted_rules()
+    async def sell_all(self, ctx, *, filters: str = None):
+        """Sells every character matching the collection filters after a single confirmation."""
+        player = db.get_player(ctx.author.id)
+        protected = self._protected_ids(player)
+        to_sell = [cid for cid in self._apply_filters(player['characters'], filters) if cid not in protected]
+        if not to_sell:
+            await ctx.send("No sellable characters match your filters. Team and selected characters are never sold."); return
+
+        total_price = sum(self._sale_price(player['characters'][cid]) for cid in to_sell)
+        view = self.ConfirmView(ctx.author)
+        prompt = await ctx.send(
+            f"⚠️ Sell **{len(to_sell):,}** character{'s' if len(to_sell) != 1 else ''} for **{total_price:,}** coins?"
+            + (f" (Filters: `{filters}`)" if filters else " This will sell **every** character except your team and selected one."),
+            view=view
+        )
+        await view.wait()
+        if not view.confirmed:
+            await prompt.edit(content="Sale cancelled.", view=None); return
+
+        # Sell from fresh data so anything that changed while the prompt was open is respected
+        sale = {}
+        def sell_matches(player):
+            protected = self._protected_ids(player)
+            sale['sold'], sale['total_price'] = 0, 0
+            for cid in to_sell:
+                character = player['characters'].get(cid)
+                if character is None or cid in protected:
+                    continue
+                sale['total_price'] += self._sale_price(character)
+                del player['characters'][cid]
+                sale['sold'] += 1
+            player['coins'] += sale['total_price']
+
+        async with player_lock(ctx.author.id):
+            # One write commits every sale at once
+            player = db.mutate_player(ctx.author.id, sell_matches)
+            collection_index.invalidate(ctx.author.id)
+        if player is None:
+            await prompt.edit(content=WRITE_CONFLICT_MESSAGE, view=None); return
+        sold = sale['sold']
+        await prompt.edit(content=f"💰 You sold **{sold:,}** character{'s' if sold != 1 else ''} for **{sale['total_price']:,}** coins.", view=None)
+
     @commands.command(name='sell', help="!sell <id_or_name> - Sells a character for coins.", category="Economy")
     @has_accepted_rules()
+    @serialized
     async def sell(self, ctx, *, identifier: str):
         player = db.get_player(ctx.author.id)
         char_id = await self._find_character_from_input(ctx, player, identifier)
@@ -376,12 +507,14 @@ class CharacterManagement(commands.Cog, name="Player Commands"):
             await ctx.send("You cannot sell a character that is on your team. Use `!team remove` first."); return
 
         character_to_sell = player['characters'][char_id]
-        sale_price = 10 + (character_to_sell['level'] * 2) + round(character_to_sell['iv'] / 5)
+        sale_price = self._sale_price(character_to_sell)
 
         del player['characters'][char_id]
         player['coins'] += sale_price
 
-        db.update_player(ctx.author.id, player)
+        if not db.update_player(ctx.author.id, player):
+            await ctx.send(WRITE_CONFLICT_MESSAGE); return
+        collection_index.character_removed(ctx.author.id, char_id, player['version'])
         await ctx.send(f"You sold **{character_to_sell['name']}** for **{sale_price}** coins.")
 
     @commands.command(name='balance', aliases=['bal'], help="!balance - Check your coin balance.", category="Economy")
@@ -392,44 +525,49 @@ class CharacterManagement(commands.Cog, name="Player Commands"):
 
     @commands.command(name='daily', help="!daily - Claim your daily coins.", category="Economy")
     @has_accepted_rules()
+    @serialized
     async def daily(self, ctx):
-        player = db.get_player(ctx.author.id)
         today, today_str = datetime.date.today(), datetime.date.today().isoformat()
-        if player['last_daily_date'] == today_str:
-            await ctx.send("You have already claimed your daily reward today!"); return
-
-        yesterday = today - datetime.timedelta(days=1)
-        player['daily_streak'] = player['daily_streak'] + 1 if player['last_daily_date'] == yesterday.isoformat() else 1
-        base_reward, bonus = 50, (player['daily_streak'] - 1) * random.randint(10, 20)
-        total_reward = min(200, base_reward + bonus)
-
-        player['coins'] += total_reward
-        player['last_daily_date'] = today_str
-        db.update_player(ctx.author.id, player)
-        await ctx.send(f"🎉 You claimed **{total_reward}** coins! Your current streak is **{player['daily_streak']}** day(s).")
+        reward = {}
+
+        def claim(player):
+            reward['already_claimed'] = player['last_daily_date'] == today_str
+            if reward['already_claimed']:
+                return False
+            yesterday = today - datetime.timedelta(days=1)
+            player['daily_streak'] = player['daily_streak'] + 1 if player['last_daily_date'] == yesterday.isoformat() else 1
+            base_reward, bonus = 50, (player['daily_streak'] - 1) * random.randint(10, 20)
+            reward['total'] = min(200, base_reward + bonus)
+            player['coins'] += reward['total']
+            player['last_daily_date'] = today_str
+
+        player = db.mutate_player(ctx.author.id, claim)
+        if player is None:
+            # None is either the claim declining or mutate_player giving up after repeated write conflicts
+            if reward['already_claimed']:
+                await ctx.send("You have already claimed your daily reward today!"); return
+            await ctx.send(WRITE_CONFLICT_MESSAGE); return
+        await ctx.send(f"🎉 You claimed **{reward['total']}** coins! Your current streak is **{player['daily_streak']}** day(s).")
 
     @commands.command(name='weekly', help="!weekly - Claim your weekly coins.", category="Economy")
     @has_accepted_rules()
+    @serialized
     async def weekly(self, ctx):
-        player = db.get_player(ctx.author.id)
         today = datetime.date.today()
-        last_weekly = player.get('last_weekly_date')
+        # Claimable again from midnight seven days after the claim, like the daily reward's calendar days
+        next_claim = datetime.datetime.combine(today + datetime.timedelta(days=7), datetime.time.min).timestamp()
+        weekly_reward = random.randint(1000, 1500)
 
-        if last_weekly:
-            last_weekly_date = datetime.datetime.strptime(last_weekly, '%Y-%m-%d').date()
-            days_since_weekly = (today - last_weekly_date).days
-            if days_since_weekly < 7:
-                days_remaining = 7 - days_since_weekly
-                await ctx.send(f"You can claim your weekly reward in **{days_remaining}** day(s)!"); return
+        running_until = db.claim_cooldown(ctx.author.id, db.TIMER_WEEKLY, next_claim, coins=weekly_reward)
+        if running_until is not None:
+            days_remaining = (datetime.date.fromtimestamp(running_until) - today).days
+            await ctx.send(f"You can claim your weekly reward in **{days_remaining}** day(s)!"); return
 
-        weekly_reward = random.randint(1000, 1500)
-        player['coins'] += weekly_reward
-        player['last_weekly_date'] = today.isoformat()
-        db.update_player(ctx.author.id, player)
         await ctx.send(f"🎁 You claimed your weekly reward of **{weekly_reward}** coins!")
 
     @commands.command(name='slots', help="!slots <amount> - Play the slot machine.", category="Economy")
     @has_accepted_rules()
+    @serialized
     async def slots(self, ctx, amount: int):
         player = db.get_player(ctx.author.id)
 
@@ -459,7 +597,8 @@ class CharacterManagement(commands.Cog, name="Player Commands"):
             winnings = int(amount * 0.5)
 
         player['coins'] += winnings
-        db.update_player(ctx.author.id, player)
+        if not db.update_player(ctx.author.id, player):
+            await ctx.send(WRITE_CONFLICT_MESSAGE); return
 
         result_display = " | ".join(result)
         embed = discord.Embed(title="🎰 Slot Machine", color=discord.Color.gold())
@@ -488,78 +627,31 @@ class CharacterManagement(commands.Cog, name="Player Commands"):
         sort_key = "name"
         filters = ""
         
-        valid_sorts = ['atk', 'def', 'spd', 'sp_atk', 'sp_def', 'hp', 'name']
-        
         # Check if first argument is a sort key
-        if parts and parts[0].lower() in valid_sorts:
+        if parts and parts[0].lower() in CATALOG_SORTS:
             sort_key = parts[0].lower()
             filters = " ".join(parts[1:]) if len(parts) > 1 else ""
         else:
             filters = " ".join(parts)
 
-        # Apply filters to characters
-        filtered_chars = self._apply_character_filters(self.characters, filters)
-        
-        if not filtered_chars:
-            await ctx.send("No characters match your filters!"); return
+        # Unfiltered views are pre-rendered at load time
+        if not filters:
+            pages = self.catalog_pages[sort_key]
+            if not pages:
+                await ctx.send("No characters match your filters!"); return
+            await Paginator(ctx.author, len(pages), lambda page_num: pages[page_num]).start(ctx)
+            return
 
-        # Sort characters
-        char_list = list(filtered_chars.items())
-        if sort_key == 'name':
-            sorted_chars = sorted(char_list, key=lambda i: i[0])
-        else:
-            sorted_chars = sorted(char_list, key=lambda i: i[1].get(sort_key.upper(), 0), reverse=True)
+        sorted_chars = self._get_filtered_catalog(sort_key, filters)
+        if not sorted_chars:
+            await ctx.send("No characters match your filters!"); return
 
-        # Pagination
-        chars_per_page = 10
-        total_pages = math.ceil(len(sorted_chars) / chars_per_page)
-        current_page = 0
+        total_pages = math.ceil(len(sorted_chars) / CATALOG_PAGE_SIZE)
 
         def create_embed(page_num):
-            start_idx = page_num * chars_per_page
-            end_idx = start_idx + chars_per_page
-            page_chars = sorted_chars[start_idx:end_idx]
-            
-            embed = discord.Embed(
-                title=f"All Characters (Sorted by {sort_key.upper()})",
-                description=f"Page {page_num + 1}/{total_pages} • {len(filtered_chars)} characters" + (f" (filtered)" if filters else ""),
-                color=discord.Color.dark_teal()
-            )
-            
-            for name, stats in page_chars:
-                stat_line = f"`ATK:{stats['ATK']}|DEF:{stats['DEF']}|SPD:{stats['SPD']}|SP_ATK:{stats['SP_ATK']}|SP_DEF:{stats['SP_DEF']}|HP:{stats['HP']}`"
-                embed.add_field(name=name, value=stat_line, inline=False)
-            
-            if filters:
-                embed.set_footer(text=f"Filters: {filters} • Use reactions to navigate")
-            else:
-                embed.set_footer(text="Add filters: !chars name:Naruto atk>100 • Use reactions to navigate")
-            
-            return embed
+            return self._render_catalog_page(sorted_chars, page_num, total_pages, sort_key, filters)
 
-        if total_pages == 1:
-            await ctx.send(embed=create_embed(0))
-            return
-
-        message = await ctx.send(embed=create_embed(current_page))
-        await message.add_reaction('◀️')
-        await message.add_reaction('▶️')
-
-        def check(r, u): 
-            return u == ctx.author and str(r.emoji) in ['◀️', '▶️'] and r.message.id == message.id
-
-        while True:
-            try:
-                reaction, user = await self.bot.wait_for('reaction_add', timeout=60.0, check=check)
-                if str(reaction.emoji) == '▶️' and current_page < total_pages - 1: 
-                    current_page += 1
-                elif str(reaction.emoji) == '◀️' and current_page > 0: 
-                    current_page -= 1
-                await message.edit(embed=create_embed(current_page))
-                await message.remove_reaction(reaction, user)
-            except asyncio.TimeoutError:
-                await message.clear_reactions()
-                break
+        await Paginator(ctx.author, total_pages, create_embed).start(ctx)
 
     @commands.command(name='info', aliases=['i'], help="!info [latest|id_or_name] - Shows info for a character.", category="Player Info")
     @has_accepted_rules()
@@ -621,26 +713,33 @@ class CharacterManagement(commands.Cog, name="Player Commands"):
         # Call the info command with "latest" as argument
         await self.info(ctx, identifier="latest")
 
-    @commands.command(name='collection', aliases=['col'], help="!collection [filters] - View your character collection with optional filters.", category="Player Info")
+    @commands.command(name='collection', aliases=['col'], help="!collection [id|level|iv] [filters] - View your character collection, sorted and filtered.", category="Player Info")
     @has_accepted_rules()
     async def collection(self, ctx, *, filters: str = None):
         player = db.get_player(ctx.author.id)
         if not player['characters']:
             await ctx.send("Your collection is empty!"); return
 
+        # An optional leading sort key orders the list by level or IV instead of ID
+        sort_key = 'id'
+        if filters:
+            first, _, rest = filters.strip().partition(' ')
+            if first.lower() in ('id', 'level', 'iv'):
+                sort_key, filters = first.lower(), rest.strip() or None
+
         # Apply filters
         filtered_chars = self._apply_filters(player['characters'], filters)
         
         if not filtered_chars:
             await ctx.send("No characters match your filters!"); return
 
-        # Sort characters by ID
-        sorted_chars = sorted(filtered_chars.items(), key=lambda x: x[0])
+        # Walk the index's pre-sorted order instead of sorting the collection
+        index = collection_index.get_index(player)
+        sorted_chars = [(cid, filtered_chars[cid]) for cid in index.ordered_ids(sort_key) if cid in filtered_chars]
         
         # Pagination setup
         chars_per_page = 10
         total_pages = math.ceil(len(sorted_chars) / chars_per_page)
-        current_page = 0
 
         def create_collection_embed(page_num):
             start_idx = page_num * chars_per_page
@@ -668,40 +767,13 @@ class CharacterManagement(commands.Cog, name="Player Commands"):
             embed.description += "\n\n" + "\n".join(char_list)
             
             if filters:
-                embed.set_footer(text=f"Applied filters: {filters} • Use reactions to navigate")
+                embed.set_footer(text=f"Applied filters: {filters} • Use the buttons to navigate")
             else:
-                embed.set_footer(text="Use reactions to navigate • Add filters: !col name:Naruto level>50 iv>=80")
+                embed.set_footer(text="Use the buttons to navigate • Sort and filter: !col iv name:Naruto level>50")
             
             return embed
 
-        if total_pages == 1:
-            await ctx.send(embed=create_collection_embed(0))
-            return
-
-        message = await ctx.send(embed=create_collection_embed(current_page))
-        await message.add_reaction('◀️')
-        await message.add_reaction('▶️')
-
-        def check(reaction, user):
-            return (user == ctx.author and 
-                   str(reaction.emoji) in ['◀️', '▶️'] and 
-                   reaction.message.id == message.id)
-
-        while True:
-            try:
-                reaction, user = await self.bot.wait_for('reaction_add', timeout=60.0, check=check)
-                
-                if str(reaction.emoji) == '▶️' and current_page < total_pages - 1:
-                    current_page += 1
-                elif str(reaction.emoji) == '◀️' and current_page > 0:
-                    current_page -= 1
-                
-                await message.edit(embed=create_collection_embed(current_page))
-                await message.remove_reaction(reaction, user)
-                
-            except asyncio.TimeoutError:
-                await message.clear_reactions()
-                break
+        await Paginator(ctx.author, total_pages, create_collection_embed).start(ctx)
 
     @commands.command(name='inventory', aliases=['inv'], help="!inventory - View your items.", category="Player Info")
     @has_accepted_rules()
@@ -769,6 +841,7 @@ class CharacterManagement(commands.Cog, name="Player Commands"):
 
     @commands.command(name='select', help="!select <id_or_name> - Select your active character from your collection.", category="Gacha System")
     @has_accepted_rules()
+    @serialized
     async def select(self, ctx, *, identifier: str):
         player = db.get_player(ctx.author.id)
 
@@ -782,7 +855,8 @@ class CharacterManagement(commands.Cog, name="Player Commands"):
             char_id = int(identifier)
             if char_id not in player['characters']:
                 # Show available character IDs for better user experience
-                available_ids = ", ".join([f"`{cid}`" for cid in player['characters'].keys()])
+                owned_ids = collection_index.get_index(player).ids
+                available_ids = ", ".join(f"`{cid}`" for cid in owned_ids[:25]) + (f" ... and {len(owned_ids) - 25} more" if len(owned_ids) > 25 else "")
                 await ctx.send(f"❌ **Character ID `{char_id}` not found in your collection.**\n"
                              f"💡 Available character IDs: {available_ids}\n"
                              f"🔍 Use `!collection` to see all your characters.")
@@ -790,7 +864,8 @@ class CharacterManagement(commands.Cog, name="Player Commands"):
 
             selected_char = player['characters'][char_id]
             player['selected_character_id'] = char_id
-            db.update_player(ctx.author.id, player)
+            if not db.update_player(ctx.author.id, player):
+                await ctx.send(WRITE_CONFLICT_MESSAGE); return
             await ctx.send(f"✅ **Selected:** {selected_char['name']} (ID: {char_id}) - Level {selected_char['level']}, {selected_char['iv']}% IV\n"
                           f"⭐ This character will now gain XP as you chat!")
             return
@@ -799,9 +874,8 @@ class CharacterManagement(commands.Cog, name="Player Commands"):
         char_id = await self._find_character_from_input(ctx, player, identifier)
         if char_id is None: 
             # Show some helpful suggestions
-            char_names = [char['name'] for char in player['characters'].values()]
-            if len(char_names) <= 5:
-                suggestions = ", ".join([f"`{name}`" for name in char_names])
+            if len(player['characters']) <= 5:
+                suggestions = ", ".join([f"`{char['name']}`" for char in player['characters'].values()])
                 await ctx.send(f"💡 **Available characters:** {suggestions}")
             else:
                 await ctx.send("🔍 Use `!collection` to see all your characters and their IDs.")
@@ -811,7 +885,8 @@ class CharacterManagement(commands.Cog, name="Player Commands"):
         char_id = int(char_id)
         selected_char = player['characters'][char_id]
         player['selected_character_id'] = char_id
-        db.update_player(ctx.author.id, player)
+        if not db.update_player(ctx.author.id, player):
+            await ctx.send(WRITE_CONFLICT_MESSAGE); return
         await ctx.send(f"✅ **Selected:** {selected_char['name']} (ID: {char_id}) - Level {selected_char['level']}, {selected_char['iv']}% IV\n"
                       f"⭐ This character will now gain XP as you chat!")
 
@@ -844,6 +919,7 @@ class CharacterManagement(commands.Cog, name="Player Commands"):
 
     @team.command(name='add', help="!team add <slot> <id_or_name> - Adds a character to a team slot.", category="Team Management")
     @has_accepted_rules()
+    @serialized
     async def team_add(self, ctx, slot: str, *, identifier: str):
         if slot not in ['1', '2', '3']:
             await ctx.send("Invalid slot. Please choose 1, 2, or 3."); return
@@ -865,12 +941,14 @@ class CharacterManagement(commands.Cog, name="Player Commands"):
 
         team_slots[slot] = char_id
         player['team'] = team_slots
-        db.update_player(ctx.author.id, player)
+        if not db.update_player(ctx.author.id, player):
+            await ctx.send(WRITE_CONFLICT_MESSAGE); return
         await ctx.send(f"Added **{player['characters'][char_id]['name']}** to team slot {slot}.")
         await self.view_team(ctx)
 
     @team.command(name='remove', aliases=['r'], help="!team remove <slot> - Removes a character from a team slot.", category="Team Management")
     @has_accepted_rules()
+    @serialized
     async def team_remove(self, ctx, slot: str):
         if slot not in ['1', '2', '3']:
             await ctx.send("Invalid slot. Please choose 1, 2, or 3."); return
@@ -885,12 +963,14 @@ class CharacterManagement(commands.Cog, name="Player Commands"):
         char_name = player['characters'][char_id]['name']
         team_slots[slot] = None
         player['team'] = team_slots
-        db.update_player(ctx.author.id, player)
+        if not db.update_player(ctx.author.id, player):
+            await ctx.send(WRITE_CONFLICT_MESSAGE); return
         await ctx.send(f"Removed **{char_name}** from team slot {slot}.")
         await self.view_team(ctx)
 
     @team.command(name='swap', help="!team swap <slot> <id_or_name> - Swaps a character into a team slot.", category="Team Management")
     @has_accepted_rules()
+    @serialized
     async def team_swap(self, ctx, slot: str, *, identifier: str):
         if slot not in ['1', '2', '3']:
             await ctx.send("Invalid slot. Please choose 1, 2, or 3."); return
@@ -923,11 +1003,13 @@ class CharacterManagement(commands.Cog, name="Player Commands"):
             await ctx.send(f"Placed **{player['characters'][char_id_to_add]['name']}** into team slot {slot}.")
 
         player['team'] = team_slots
-        db.update_player(ctx.author.id, player)
+        if not db.update_player(ctx.author.id, player):
+            await ctx.send(WRITE_CONFLICT_MESSAGE); return
         await self.view_team(ctx)
 
     @commands.command(name='equip', aliases=['eq'], help="!equip <id_or_name>, <item_name> - Equips an item.", category="Team Management")
     @has_accepted_rules()
+    @serialized
     async def equip(self, ctx, *, arguments: str):
         try:
             identifier, item_name = [arg.strip() for arg in arguments.split(',', 1)]
@@ -950,11 +1032,13 @@ class CharacterManagement(commands.Cog, name="Player Commands"):
         character['equipped_item'] = found_item
         player['inventory'][found_item] -= 1
         if player['inventory'][found_item] == 0: del player['inventory'][found_item]
-        db.update_player(ctx.author.id, player)
+        if not db.update_player(ctx.author.id, player):
+            await ctx.send(WRITE_CONFLICT_MESSAGE); return
         await ctx.send(f"Equipped **{found_item}** on **{character['name']}**.")
 
     @commands.command(name='unequip', aliases=['ue'], help="!unequip <id_or_name> - Unequips an item.", category="Team Management")
     @has_accepted_rules()
+    @serialized
     async def unequip(self, ctx, *, identifier: str):
         player = db.get_player(ctx.author.id)
         char_id = await self._find_character_from_input(ctx, player, identifier)
@@ -967,7 +1051,8 @@ class CharacterManagement(commands.Cog, name="Player Commands"):
 
         character['equipped_item'] = None
         player['inventory'][item_name] = player['inventory'].get(item_name, 0) + 1
-        db.update_player(ctx.author.id, player)
+        if not db.update_player(ctx.author.id, player):
+            await ctx.send(WRITE_CONFLICT_MESSAGE); return
         await ctx.send(f"Unequipped **{item_name}** from **{character['name']}**.")
 
     @commands.group(name='moves', aliases=['m'], invoke_without_command=True, help="!moves [id_or_name] - Manage character moves.", category="Team Management")
@@ -1101,6 +1186,7 @@ class CharacterManagement(commands.Cog, name="Player Commands"):
 
     @moves.command(name='swap', help="!moves swap <id_or_name>, <new>, <old> - Swaps moves.", category="Team Management")
     @has_accepted_rules()
+    @serialized
     async def swap_moves(self, ctx, *, arguments: str):
         try:
             identifier, new_move, old_move = [arg.strip() for arg in arguments.split(',', 2)]
@@ -1138,7 +1224,8 @@ class CharacterManagement(commands.Cog, name="Player Commands"):
              await ctx.send(f"An unexpected error occurred."); return
 
         character['moveset'] = active_moveset
-        db.update_player(ctx.author.id, player)
+        if not db.update_player(ctx.author.id, player):
+            await ctx.send(WRITE_CONFLICT_MESSAGE); return
         await ctx.send(f"Swapped **{old_move_name}** for **{new_move_data['name']}** on {character['name']}!")
 
     class SlotSelectionView(discord.ui.View):
@@ -1178,8 +1265,17 @@ class CharacterManagement(commands.Cog, name="Player Commands"):
                 self.current_moveset[slot_index] = self.move_data['name']
                 self.character['moveset'] = self.current_moveset
 
-                # Update database
-                db.update_player(self.ctx.author.id, self.player)
+                # Update database, writing onto fresh player data since the view may have been open a while
+                async with player_lock(self.ctx.author.id):
+                    player = db.get_player(self.ctx.author.id)
+                    character = player['characters'].get(self.char_id)
+                    if character is None:
+                        await interaction.response.edit_message(content="❌ That character is no longer in your collection.", embed=None, view=None)
+                        self.stop(); return
+                    character['moveset'] = self.current_moveset
+                    if not db.update_player(self.ctx.author.id, player):
+                        await interaction.response.edit_message(content=WRITE_CONFLICT_MESSAGE, embed=None, view=None)
+                        self.stop(); return
 
                 if old_move == "Empty Slot":
                     response = f"✅ **{self.character['name']}** learned **{self.move_data['name']}** in slot {slot_index + 1}!"
@@ -1199,6 +1295,7 @@ class CharacterManagement(commands.Cog, name="Player Commands"):
 
     @commands.command(name='learn', help="!learn [key|move_name] [position] - Shows moveset or teaches a move to selected character. Use !select first.", category="Team Management")
     @has_accepted_rules()
+    @serialized
     async def learn_move(self, ctx, move_identifier: str = None, position: int = None):
         player = db.get_player(ctx.author.id)
 
@@ -1208,7 +1305,8 @@ class CharacterManagement(commands.Cog, name="Player Commands"):
             # Show user's characters if they have any
             if player['characters']:
                 char_list = []
-                for cid, char in list(player['characters'].items())[:5]:  # Show first 5
+                for cid in collection_index.get_index(player).ids[:5]:  # Show first 5
+                    char = player['characters'][cid]
                     char_list.append(f"`{cid}` - {char['name']} (Lvl {char['level']})")
                 char_display = "\n".join(char_list)
                 if len(player['characters']) > 5:
@@ -1291,7 +1389,8 @@ class CharacterManagement(commands.Cog, name="Player Commands"):
             old_move = current_moveset[target_slot] if current_moveset[target_slot] else "Empty Slot"
             current_moveset[target_slot] = move_data['name']
             character['moveset'] = current_moveset
-            db.update_player(ctx.author.id, player)
+            if not db.update_player(ctx.author.id, player):
+                await ctx.send(WRITE_CONFLICT_MESSAGE); return
 
             if old_move == "Empty Slot":
                 await ctx.send(f"✅ **{character['name']}** learned **{move_data['name']}** in position {position}!")
@@ -1310,7 +1409,8 @@ class CharacterManagement(commands.Cog, name="Player Commands"):
             # Learn move in empty slot
             current_moveset[empty_slot] = move_data['name']
             character['moveset'] = current_moveset
-            db.update_player(ctx.author.id, player)
+            if not db.update_player(ctx.author.id, player):
+                await ctx.send(WRITE_CONFLICT_MESSAGE); return
             await ctx.send(f"✅ **{character['name']}** learned **{move_data['name']}** in position {empty_slot + 1}!")
         else:
             # All slots full, show slot selection UI
@@ -1436,26 +1536,22 @@ class CharacterManagement(commands.Cog, name="Player Commands"):
     #     await self.bot.process_commands(message) # Process commands as usual
 
     async def _gain_xp_as_chat(self, user_id: int):
-        """Grants XP to the selected character when a user chats."""
+        """Grants XP to the selected character when a user chats.
+
+        Returns whether anything was saved; a tick that loses a write conflict is simply dropped.
+        """
         player = db.get_player(user_id)
         char_id = player.get('selected_character_id')
 
-        if not char_id: return # No character selected
+        if not char_id: return False # No character selected
 
         char = player["characters"].get(char_id)
-        if not char or char['level'] >= 100: return
+        if not char or char['level'] >= 100: return False
 
         old_level = char['level']
 
-        # Check for XP booster
-        xp_gain = 5
-        if 'xp_booster' in player and str(char_id) in player['xp_booster']:
-            import time
-            if time.time() < player['xp_booster'][str(char_id)]:
-                xp_gain *= 2  # Double XP
-            else:
-                # Remove expired booster
-                del player['xp_booster'][str(char_id)]
+        # Apply any running XP booster
+        xp_gain = int(5 * self.bot.boosters.multiplier(user_id, char_id))
 
         char['xp'] += xp_gain
 
@@ -1477,7 +1573,7 @@ class CharacterManagement(commands.Cog, name="Player Commands"):
                 # Check for newly learned moves
                 await self.learn_new_moves_on_level_up(player, char_id, char['level'])
 
-        db.update_player(user_id, player)
+        return db.update_player(user_id, player)
 
     async def learn_new_moves_on_level_up(self, player, char_id, new_level):
         """Checks if a character learned any new moves upon leveling up."""
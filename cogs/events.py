@@ -12,17 +12,6 @@ import math
 # Import the database functions
 import database as db
 
-# --- Helper for loading static game data ---
-def load_json_data(filename):
-    """Helper function to load data from a JSON file."""
-    try:
-        path = os.path.join(os.path.dirname(__file__), '..', 'data', filename)
-        with open(path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        print(f"Error: {filename} not found or is improperly formatted.")
-        return {}
-
 # --- Custom Check for Rules Acceptance ---
 def has_accepted_rules():
     """A custom check to see if a player has accepted the game rules."""
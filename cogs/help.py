@@ -57,7 +57,7 @@ class HelpView(discord.ui.View):
             'weekly': 'Economy',
             'slots': 'Economy',
             'balance': 'Economy', 'bal': 'Economy',
-            'sell': 'Economy',
+            'sell': 'Economy', 'sellall': 'Economy',
 
             # Shop
             'shop': 'Shop',
@@ -73,6 +73,8 @@ class HelpView(discord.ui.View):
             'battle': 'Battle System',
             'battlecz': 'Battle System',
             'battleend': 'Battle System',
+            'queue': 'Battle System', 'q': 'Battle System',
+            'tournament': 'Battle System', 'tour': 'Battle System',
 
             # Market
             'market': 'Market',
@@ -88,7 +90,9 @@ class HelpView(discord.ui.View):
         for cmd in self.bot.commands:
             if not cmd.hidden and cmd.name != 'help':
                 # Skip certain cogs entirely
-                if cmd.cog_name in ['Admin', 'Webmonitor', 'Core Gameplay', 'Stat Calculations']:
+                # A deferred cog's placeholder commands know the cog they stand in for
+                cog_name = getattr(cmd, 'lazy_cog_name', None) or cmd.cog_name
+                if cog_name in ['Admin', 'Webmonitor', 'Core Gameplay', 'Stat Calculations']:
                     continue
 
                 # Use custom category mapping or fall back to cog name
@@ -229,7 +233,7 @@ class HelpCog(commands.Cog, name="Help"):
 
         embed.add_field(name="Aliases", value=aliases, inline=False)
 
-        category = getattr(command, 'category', command.cog_name)
+        category = getattr(command, 'category', getattr(command, 'lazy_cog_name', None) or command.cog_name)
         if category:
             embed.add_field(name="Category", value=category, inline=False)
 
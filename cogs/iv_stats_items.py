@@ -5,17 +5,29 @@ import json
 import os
 import random
 import math
+import functools
+from game_data import load_json_data
 
-# --- Helper for loading static game data ---
-def load_json_data(filename):
-    """Helper function to load data from a JSON file."""
-    try:
-        path = os.path.join(os.path.dirname(__file__), '..', 'data', filename)
-        with open(path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        print(f"Error: {filename} not found or is improperly formatted.")
-        return {}
+STAT_KEYS = ('HP', 'ATK', 'DEF', 'SPD', 'SP_ATK', 'SP_DEF')
+STAT_CACHE_SIZE = 4096  # (character, IVs, level) combinations kept by stats_for_level
+
+def calculate_stats(base_stats, individual_ivs, level):
+    """Calculates a character's stats based on the Pokémon formula."""
+    final_stats = {}
+    for stat_name, base_value in base_stats.items():
+        iv = individual_ivs.get(stat_name, 0)
+        if stat_name.upper() == "HP":
+            stat_val = math.floor(((2 * base_value + iv) * level / 100) + level + 10)
+        else:
+            stat_val = math.floor(((2 * base_value + iv) * level / 100) + 5)
+        final_stats[stat_name] = max(1, stat_val)
+    return final_stats
+
+# Keyed on the base stats themselves rather than the character's name, so a !reload with edited
+# game data can't serve stale stats, and module-level so it isn't tied to one cog instance.
+@functools.lru_cache(maxsize=STAT_CACHE_SIZE)
+def _cached_stats(base_items, iv_items, level):
+    return tuple(calculate_stats(dict(base_items), dict(iv_items), level).items())
 
 class StatsCog(commands.Cog, name="Stat Calculations"):
     """Handles all core logic for character stats, IVs, and items."""
@@ -25,16 +37,22 @@ class StatsCog(commands.Cog, name="Stat Calculations"):
         self.items = load_json_data('items.json')
 
     def _calculate_stats(self, base_stats, individual_ivs, level):
-        """Calculates a character's stats based on the Pokémon formula."""
-        final_stats = {}
-        for stat_name, base_value in base_stats.items():
-            iv = individual_ivs.get(stat_name, 0)
-            if stat_name.upper() == "HP":
-                stat_val = math.floor(((2 * base_value + iv) * level / 100) + level + 10)
-            else:
-                stat_val = math.floor(((2 * base_value + iv) * level / 100) + 5)
-            final_stats[stat_name] = max(1, stat_val)
-        return final_stats
+        return calculate_stats(base_stats, individual_ivs, level)
+
+    def stats_for_level(self, name, individual_ivs, level):
+        """A character's stats at a level, from its base stats and IVs. Returns None for unknown characters.
+
+        Memoized, since the same character and IVs are recalculated at every level change.
+        """
+        base_char_data = self.characters.get(name)
+        if not base_char_data:
+            return None
+        # Only the stat keys; the game data also holds the ID, description, image and so on
+        base_items = tuple((k, base_char_data[k]) for k in STAT_KEYS if k in base_char_data)
+        return dict(_cached_stats(base_items, tuple(sorted(individual_ivs.items())), level))
+
+    def stats_cache_info(self):
+        return _cached_stats.cache_info()
         
     def get_character_display_stats(self, character_instance):
         """Gets final stats for a character, including level, IVs, and item boosts."""
@@ -2,7 +2,10 @@
 import discord
 from discord.ext import commands
 import database as db
+import collection_index
+from player_locks import player_lock, serialized
 import re
+from paginator import Paginator
 
 class Market(commands.Cog, name="Market"):
     """Commands for the player-driven market."""
@@ -161,31 +164,28 @@ class Market(commands.Cog, name="Market"):
         await ctx.send_help(ctx.command)
 
     @market.command(name='add', help="!market add <char_id> <price> - List a character on the market.")
+    @serialized
     async def market_add(self, ctx, char_id: int, price: int):
         if price <= 0:
             await ctx.send("The price must be greater than zero."); return
 
-        player = db.get_player(ctx.author.id)
-        if char_id not in player['characters']:
+        status, listing = db.add_market_listing(ctx.author.id, char_id, price)
+        if status == "missing":
             await ctx.send("You do not own a character with that ID."); return
-        
-        if char_id in player.get('team', []):
+        if status == "on_team":
             await ctx.send("You cannot list a character that is on your team."); return
-        
-        if char_id == player.get('selected_character_id'):
+        if status == "selected":
             await ctx.send("You cannot list your selected character."); return
 
-        character_to_list = player['characters'].pop(char_id)
-        listing_id = db.add_market_listing(ctx.author.id, price, character_to_list)
-        db.update_player(ctx.author.id, player)
+        character_to_list = listing['character_data']
+        collection_index.character_removed(ctx.author.id, char_id)
 
-        await ctx.send(f"✅ You have listed **{character_to_list['name']}** (Lvl {character_to_list['level']}) on the market for **{price}** coins. Listing ID: **#{listing_id}**")
+        await ctx.send(f"✅ You have listed **{character_to_list['name']}** (Lvl {character_to_list['level']}) on the market for **{price}** coins. Listing ID: **#{listing['listing_id']}**")
 
     @market.command(name='view', help="!market view [filters] - View market listings with optional filters.")
     async def market_view(self, ctx, *, filters: str = None):
         import math
-        import asyncio
-        
+
         listings = db.get_all_market_listings()
         if not listings:
             await ctx.send("The market is currently empty."); return
@@ -202,7 +202,6 @@ class Market(commands.Cog, name="Market"):
         # Pagination setup
         listings_per_page = 8
         total_pages = math.ceil(len(filtered_listings) / listings_per_page)
-        current_page = 0
 
         async def create_market_embed(page_num):
             start_idx = page_num * listings_per_page
@@ -218,8 +217,9 @@ class Market(commands.Cog, name="Market"):
             listing_text = []
             for listing in page_listings:
                 char = listing['character_data']
+                seller = self.bot.get_user(listing['seller_id'])
                 try:
-                    seller = await self.bot.fetch_user(listing['seller_id'])
+                    seller = seller or await self.bot.fetch_user(listing['seller_id'])
                     seller_name = seller.display_name[:12]
                 except discord.NotFound:
                     seller_name = "Unknown"
@@ -232,42 +232,14 @@ class Market(commands.Cog, name="Market"):
             embed.description += "\n\n" + "\n".join(listing_text)
             
             if filters:
-                embed.set_footer(text=f"Filters: {filters} • Use reactions to navigate • !market buy <id>")
+                embed.set_footer(text=f"Filters: {filters} • Use the buttons to navigate • !market buy <id>")
             else:
-                embed.set_footer(text="Add filters: !market view name:Naruto level>50 price<5000 • Use reactions to navigate")
+                embed.set_footer(text="Add filters: !market view name:Naruto level>50 price<5000 • Use the buttons to navigate")
             
             return embed
 
-        if total_pages == 1:
-            embed = await create_market_embed(0)
-            await ctx.send(embed=embed)
-            return
+        await Paginator(ctx.author, total_pages, create_market_embed).start(ctx)
 
-        message = await ctx.send(embed=await create_market_embed(current_page))
-        await message.add_reaction('◀️')
-        await message.add_reaction('▶️')
-
-        def check(reaction, user):
-            return (user == ctx.author and 
-                   str(reaction.emoji) in ['◀️', '▶️'] and 
-                   reaction.message.id == message.id)
-
-        while True:
-            try:
-                reaction, user = await self.bot.wait_for('reaction_add', timeout=60.0, check=check)
-                
-                if str(reaction.emoji) == '▶️' and current_page < total_pages - 1:
-                    current_page += 1
-                elif str(reaction.emoji) == '◀️' and current_page > 0:
-                    current_page -= 1
-                
-                await message.edit(embed=await create_market_embed(current_page))
-                await message.remove_reaction(reaction, user)
-                
-            except asyncio.TimeoutError:
-                await message.clear_reactions()
-                break
-            
     @market.command(name='buy', help="!market buy <listing_id> - Purchase a character.")
     async def market_buy(self, ctx, listing_id: int):
         listing = db.get_market_listing(listing_id)
@@ -277,29 +249,23 @@ class Market(commands.Cog, name="Market"):
         if listing['seller_id'] == ctx.author.id:
             await ctx.send("You cannot buy your own listing."); return
 
-        buyer = db.get_player(ctx.author.id)
-        if buyer['coins'] < listing['price']:
-            await ctx.send(f"You do not have enough coins. You need {listing['price']} coins."); return
+        # Lock both players so their other commands can't write stale coin totals over the purchase
+        async with player_lock(ctx.author.id, listing['seller_id']):
+            status, sale = db.buy_market_listing(listing_id, ctx.author.id)
+        if status == "missing":
+            await ctx.send("This listing has already been sold or removed."); return
+        if status == "insufficient_funds":
+            await ctx.send(f"You do not have enough coins. You need {sale['price']} coins."); return
+        if status != "ok":
+            await ctx.send("You cannot buy your own listing."); return
 
-        # Perform transaction
-        seller = db.get_player(listing['seller_id'])
-        
-        buyer['coins'] -= listing['price']
-        seller['coins'] += listing['price']
+        char_data = sale['character_data']
+        collection_index.character_added(ctx.author.id, sale['new_id'], char_data)
         
-        char_data = listing['character_data']
-        new_id = buyer['next_character_id']
-        buyer['characters'][new_id] = char_data
-        buyer['next_character_id'] += 1
-        
-        db.remove_market_listing(listing_id)
-        db.update_player(buyer['user_id'], buyer)
-        db.update_player(seller['user_id'], seller)
-        
-        await ctx.send(f"🎉 You have successfully purchased **{char_data['name']}** for **{listing['price']}** coins!")
+        await ctx.send(f"🎉 You have successfully purchased **{char_data['name']}** for **{sale['price']}** coins!")
         try:
-            seller_user = await self.bot.fetch_user(seller['user_id'])
-            await seller_user.send(f"Your listing for **{char_data['name']}** has sold for **{listing['price']}** coins!")
+            seller_user = await self.bot.fetch_user(sale['seller_id'])
+            await seller_user.send(f"Your listing for **{char_data['name']}** has sold for **{sale['price']}** coins!")
         except discord.HTTPException:
             pass # Can't DM user
             
@@ -312,14 +278,12 @@ class Market(commands.Cog, name="Market"):
         if listing['seller_id'] != ctx.author.id:
             await ctx.send("You can only remove your own listings."); return
             
-        player = db.get_player(ctx.author.id)
-        char_data = listing['character_data']
-        new_id = player['next_character_id']
-        player['characters'][new_id] = char_data
-        player['next_character_id'] += 1
-        
-        db.remove_market_listing(listing_id)
-        db.update_player(ctx.author.id, player)
+        async with player_lock(ctx.author.id):
+            returned = db.return_market_listing(listing_id, ctx.author.id)
+        if not returned:
+            await ctx.send("This listing has already been sold or removed."); return
+        char_data, new_id = returned
+        collection_index.character_added(ctx.author.id, new_id, char_data)
         
         await ctx.send(f"✅ You have removed your listing for **{char_data['name']}** from the market. It has been returned to your collection with the new ID #{new_id}.")
 
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+import discord
+from discord.ext import commands, tasks
+import time
+from collections import defaultdict, deque
+import asyncio
+# Import the database functions
+import database as db
+
+# --- Matchmaking Settings ---
+RP_BAND_WIDTH = 250          # Rank points covered by one queue bucket
+LEVEL_TOLERANCE = 5          # Allowed team level gap when a player first joins
+WIDEN_INTERVAL = 15          # Seconds of waiting before the search widens by one step
+LEVEL_WIDEN_PER_STEP = 5     # Extra team level gap allowed per widening step
+MAX_EXTRA_BANDS = 8          # Furthest neighbouring band a long wait can reach
+QUEUE_TIMEOUT = 600          # Players are dropped from the queue after 10 minutes
+
+# --- Custom Check for Rules Acceptance ---
+def has_accepted_rules():
+    """A custom check to see if a player has accepted the game rules."""
+    async def predicate(ctx):
+        player = db.get_player(ctx.author.id)
+        if player.get("rules_accepted", 0) == 1:
+            return True
+        await ctx.send("You must accept the rules first. The rules prompt will be shown on your next command.")
+        return False
+    return commands.check(predicate)
+
+class Matchmaking(commands.Cog, name="Matchmaking"):
+    """Pairs queued players by rank and team level and starts PvP battles automatically."""
+    def __init__(self, bot):
+        self.bot = bot
+        # band index -> {user_id: entry}; dicts keep join order so the oldest entry is found first
+        self.buckets = defaultdict(dict)
+        self.entries = {}
+        # Metrics
+        self.wait_times = deque(maxlen=200)
+        self.match_times = deque()
+        self.total_matches = 0
+
+    async def cog_load(self):
+        self.match_loop.start()
+
+    async def cog_unload(self):
+        self.match_loop.cancel()
+
+    # --- Helpers ---
+    def _team_level(self, player_data):
+        """Average level of the characters in a player's team."""
+        team_slots = player_data.get('team', {})
+        team_levels = [player_data['characters'][cid]['level'] for cid in team_slots.values() if cid and cid in player_data['characters']]
+        return max(1, sum(team_levels) // len(team_levels)) if team_levels else 0
+
+    def _is_battling(self, user_id):
+        return user_id in self._battling_users()
+
+    def _battling_users(self):
+        """IDs of every player currently in a PvP or AI battle."""
+        busy = set()
+        cz_cog = self.bot.get_cog('Core Gameplay')
+        if cz_cog:
+            for key in cz_cog.active_battles:
+                busy.update(key)
+        ai_cog = self.bot.get_cog('AI Battle')
+        if ai_cog:
+            busy.update(ai_cog.active_battles)
+        return busy
+
+    def _add_entry(self, entry):
+        self.entries[entry['user'].id] = entry
+        self.buckets[entry['band']][entry['user'].id] = entry
+
+    def _remove_entry(self, user_id):
+        entry = self.entries.pop(user_id, None)
+        if entry:
+            bucket = self.buckets[entry['band']]
+            bucket.pop(user_id, None)
+            if not bucket:
+                del self.buckets[entry['band']]
+        return entry
+
+    def _find_opponent(self, entry, now, busy=()):
+        """Searches the entry's band, then neighbouring bands, widening with the time already waited.
+
+        Players in `busy` are skipped; they keep their place and can be matched once their battle ends.
+        """
+        steps = int((now - entry['joined_at']) // WIDEN_INTERVAL)
+        band_radius = min(steps, MAX_EXTRA_BANDS)
+        level_gap = LEVEL_TOLERANCE + steps * LEVEL_WIDEN_PER_STEP
+
+        for distance in range(band_radius + 1):
+            for band in {entry['band'] - distance, entry['band'] + distance}:
+                for user_id, candidate in self.buckets.get(band, {}).items():
+                    if user_id == entry['user'].id or user_id in busy:
+                        continue
+                    if abs(candidate['team_level'] - entry['team_level']) <= level_gap:
+                        return candidate
+        return None
+
+    def matches_per_minute(self):
+        cutoff = time.time() - 60
+        while self.match_times and self.match_times[0] < cutoff:
+            self.match_times.popleft()
+        return len(self.match_times)
+
+    def average_wait(self):
+        return sum(self.wait_times) / len(self.wait_times) if self.wait_times else 0.0
+
+    async def _start_match(self, first, second):
+        """Launches an interactive battle between two matched queue entries."""
+        cz_cog = self.bot.get_cog('Core Gameplay')
+        if not cz_cog:
+            for entry in (first, second):
+                await entry['ctx'].send(f"{entry['user'].mention}, the battle system is offline, your queue entry was dropped.")
+            return
+
+        now = time.time()
+        for entry in (first, second):
+            self.wait_times.append(now - entry['joined_at'])
+        self.match_times.append(now)
+        self.total_matches += 1
+
+        p1_user, p2_user = first['user'], second['user']
+        p1_data, p2_data = db.get_player(p1_user.id), db.get_player(p2_user.id)
+        ctx = first['ctx']
+
+        await ctx.send(f"⚔️ **Match found!** {p1_user.mention} vs {p2_user.mention} - get ready!")
+        if second['ctx'].channel.id != ctx.channel.id:
+            await second['ctx'].send(f"⚔️ **Match found!** {p2_user.mention}, your battle against **{p1_user.display_name}** is starting in {ctx.channel.mention}.")
+
+        battle_key = tuple(sorted((p1_user.id, p2_user.id)))
+        task = asyncio.create_task(cz_cog._run_interactive_battle(ctx, p1_user, p2_user, p1_data, p2_data))
+        cz_cog.active_battles[battle_key] = {"task": task, "channel": ctx.channel}
+
+    # --- Matching Loop ---
+    @tasks.loop(seconds=3)
+    async def match_loop(self):
+        if not self.entries:
+            return
+
+        now = time.time()
+        # A player may have started another battle while waiting; they stay queued but aren't matched until it ends
+        busy = self._battling_users()
+        pairs = []
+        for user_id in list(self.entries):
+            entry = self.entries.get(user_id)
+            if entry is None:
+                continue  # Already matched earlier in this pass
+
+            if now - entry['joined_at'] > QUEUE_TIMEOUT:
+                self._remove_entry(user_id)
+                await entry['ctx'].send(f"⌛ {entry['user'].mention}, no opponent was found in time. You have been removed from the queue.")
+                continue
+
+            if user_id in busy:
+                continue
+            opponent = self._find_opponent(entry, now, busy)
+            if opponent:
+                self._remove_entry(user_id)
+                self._remove_entry(opponent['user'].id)
+                pairs.append((entry, opponent))
+
+        for first, second in pairs:
+            # Announcing earlier matches yields to other commands, which may have started a battle meanwhile
+            busy = self._battling_users()
+            if first['user'].id in busy or second['user'].id in busy:
+                # Put both back with their original join time, so their search stays as wide as it was
+                self._add_entry(first)
+                self._add_entry(second)
+                continue
+            await self._start_match(first, second)
+
+    @match_loop.before_loop
+    async def before_match_loop(self):
+        await self.bot.wait_until_ready()
+
+    # --- Commands ---
+    @commands.group(name='queue', aliases=['q'], invoke_without_command=True, help="!queue - Join the PvP matchmaking queue.", category="Battle System")
+    @has_accepted_rules()
+    async def queue(self, ctx):
+        user = ctx.author
+        if user.id in self.entries:
+            await ctx.send("You are already in the queue! Use `!queue leave` to leave it."); return
+        if self._is_battling(user.id):
+            await ctx.send("You are already in a battle!"); return
+
+        player = db.get_player(user.id)
+        team_level = self._team_level(player)
+        if not team_level:
+            await ctx.send("You need a team to battle! Use `!team add` to add characters first."); return
+
+        rank_points = player.get('rank_points', 0)
+        entry = {
+            "user": user, "ctx": ctx, "rank_points": rank_points,
+            "band": rank_points // RP_BAND_WIDTH, "team_level": team_level,
+            "joined_at": time.time()
+        }
+        self._add_entry(entry)
+
+        await ctx.send(f"🔎 **{user.display_name}** joined the matchmaking queue ({rank_points} RP, team Lvl {team_level}). "
+                       f"Players waiting: **{len(self.entries)}**.")
+
+    @queue.command(name='leave', help="!queue leave - Leave the matchmaking queue.", category="Battle System")
+    async def queue_leave(self, ctx):
+        if self._remove_entry(ctx.author.id):
+            await ctx.send("You have left the matchmaking queue.")
+        else:
+            await ctx.send("You are not in the queue.")
+
+    @queue.command(name='status', help="!queue status - Show matchmaking queue statistics.", category="Battle System")
+    async def queue_status(self, ctx):
+        embed = discord.Embed(title="🔎 Matchmaking Queue", color=discord.Color.blurple())
+        embed.add_field(name="Players Waiting", value=str(len(self.entries)), inline=True)
+        embed.add_field(name="Matches / Minute", value=str(self.matches_per_minute()), inline=True)
+        embed.add_field(name="Avg. Wait", value=f"{self.average_wait():.1f}s", inline=True)
+
+        entry = self.entries.get(ctx.author.id)
+        if entry:
+            waited = time.time() - entry['joined_at']
+            embed.set_footer(text=f"You have been waiting {int(waited)}s • Use !queue leave to leave")
+        else:
+            embed.set_footer(text=f"Total matches made: {self.total_matches} • Use !queue to join")
+        await ctx.send(embed=embed)
+
+async def setup(bot):
+    await bot.add_cog(Matchmaking(bot))
@@ -1,8 +1,9 @@
 # -*- coding: utf-8 -*-
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 import json
 import os
+import sqlite3
 import random
 import time
 import datetime
@@ -11,17 +12,11 @@ import asyncio
 import math
 # Import the database functions
 import database as db
+import collection_index
+from player_locks import player_lock, WRITE_CONFLICT_MESSAGE
+from game_data import load_json_data
 
-# --- Helper for loading static game data ---
-def load_json_data(filename):
-    """Helper function to load data from a JSON file."""
-    try:
-        path = os.path.join(os.path.dirname(__file__), '..', 'data', filename)
-        with open(path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        print(f"Error: {filename} not found or is improperly formatted.")
-        return {}
+TIMER_SWEEP_MINUTES = 5  # How often expired player timers are deleted
 
 # --- Custom Check for Rules Acceptance ---
 def has_accepted_rules():
@@ -76,8 +71,23 @@ class CZ(commands.Cog, name="Core Gameplay"):
         self.attacks = load_json_data('attacks.json')
         self.active_battles = {}
         self.rules_prompts = {}
-        # Initialize database first
-        db.init_db()
+
+    async def cog_load(self):
+        self.sweep_timers.start()
+
+    async def cog_unload(self):
+        self.sweep_timers.cancel()
+
+    @tasks.loop(minutes=TIMER_SWEEP_MINUTES)
+    async def sweep_timers(self):
+        """Deletes every expired cooldown and booster in one statement, instead of checking them one by one on use."""
+        try:
+            expired = db.expire_player_timers()
+        except sqlite3.Error as e:
+            # An unhandled error would stop the loop for good; just try again next round
+            print(f"❌ Timer sweep failed: {e}"); return
+        if expired:
+            print(f"⌛ Expired {len(expired)} player timer(s)")
 
     @commands.Cog.listener()
     async def on_reaction_add(self, reaction, user):
@@ -85,9 +95,11 @@ class CZ(commands.Cog, name="Core Gameplay"):
             return
 
         if str(reaction.emoji) == '✅':
-            player = db.get_player(user.id)
-            player['rules_accepted'] = 1
-            db.update_player(user.id, player)
+            async with player_lock(user.id):
+                accepted = db.mutate_player(user.id, lambda player: player.update(rules_accepted=1))
+            if accepted is None:
+                # Keep the prompt so the player can react again
+                await user.send(WRITE_CONFLICT_MESSAGE); return
 
             del self.rules_prompts[reaction.message.id]
             await reaction.message.delete()
@@ -267,6 +279,7 @@ class CZ(commands.Cog, name="Core Gameplay"):
         return view.selected_character
 
     async def _run_interactive_battle(self, ctx, p1_user, p2_user, p1_data, p2_data):
+        """Runs a PvP battle and returns the winning user, or None if it ended without one."""
         stats_cog = self.bot.get_cog('Stat Calculations')
         if not stats_cog:
             await ctx.send("Battle system is offline, stat module not loaded."); return
@@ -358,6 +371,7 @@ class CZ(commands.Cog, name="Core Gameplay"):
             final_embed = self._create_battle_embed(log, team1, team2, p1_user, p2_user, p1_active_char, p2_active_char)
             final_embed.title = f"🏆 Winner: {winner.display_name}! 🏆"
             await battle_message.edit(embed=final_embed, view=None)
+            return winner
 
         except asyncio.CancelledError:
             log.append("Battle ended by mutual agreement.")
@@ -468,47 +482,61 @@ class CZ(commands.Cog, name="Core Gameplay"):
     async def on_message(self, message):
         if message.author.bot or (await self.bot.get_context(message)).valid: return
 
-        player = db.get_player(message.author.id)
-        if not player.get("rules_accepted", 0): return
+        async with player_lock(message.author.id):
+            await self._grant_chat_xp(message)
 
-        char_id = player.get("selected_character_id")
-        if not char_id or time.time() - player.get("last_xp_gain_time", 0) < 60: return
+    async def _grant_chat_xp(self, message):
+        """Gives the selected character XP for chatting, at most once a minute."""
+        gained = {}
 
-        player["last_xp_gain_time"] = time.time()
-        char = player["characters"].get(char_id)
-        if not char or char['level'] >= 100: return
+        def gain_xp(player):
+            if not player.get("rules_accepted", 0): return False
 
-        old_level = char['level']
-        char['xp'] += random.randint(15, 25)
-        xp_needed = self._get_xp_for_next_level(char['level'])
+            char_id = player.get("selected_character_id")
+            if not char_id or time.time() - player.get("last_xp_gain_time", 0) < 60: return False
 
-        leveled_up = False
-        while char['xp'] >= xp_needed:
-            if char['level'] >= 100: 
-                char['xp'] = 0; break
-            char['level'] += 1
-            char['xp'] -= xp_needed
-            leveled_up = True
-            xp_needed = self._get_xp_for_next_level(char['level'])
+            player["last_xp_gain_time"] = time.time()
+            char = player["characters"].get(char_id)
+            if not char or char['level'] >= 100: return False
 
-        if leveled_up:
-            stats_cog = self.bot.get_cog('Stat Calculations')
-            base_char_data = self.characters.get(char['name'])
-            if base_char_data and stats_cog:
-                stat_keys = ['HP', 'ATK', 'DEF', 'SPD', 'SP_ATK', 'SP_DEF']
-                base_stats = {k: v for k, v in base_char_data.items() if k in stat_keys}
-                char['stats'] = stats_cog._calculate_stats(base_stats, char['individual_ivs'], char['level'])
-
-            await message.channel.send(f"🎉 **{char['name']}** (ID: {char['id']}) leveled up to **Level {char['level']}**!")
-
-            all_special_moves = self.attacks.get('characters', {}).get(str(char.get('id')), [])
-            newly_unlocked = [move for move in all_special_moves if old_level < move['unlock_level'] <= char['level']]
-
-            if newly_unlocked:
-                for new_move in newly_unlocked:
-                    await message.channel.send(f"✨ **{char['name']}** unlocked a new move: **{new_move['name']}**!")
+            old_level = char['level']
+            char['xp'] += int(random.randint(15, 25) * self.bot.boosters.multiplier(message.author.id, char_id))
+            xp_needed = self._get_xp_for_next_level(char['level'])
 
-        db.update_player(message.author.id, player)
+            leveled_up = False
+            while char['xp'] >= xp_needed:
+                if char['level'] >= 100: 
+                    char['xp'] = 0; break
+                char['level'] += 1
+                char['xp'] -= xp_needed
+                leveled_up = True
+                xp_needed = self._get_xp_for_next_level(char['level'])
+
+            if leveled_up:
+                stats_cog = self.bot.get_cog('Stat Calculations')
+                base_char_data = self.characters.get(char['name'])
+                if base_char_data and stats_cog:
+                    stat_keys = ['HP', 'ATK', 'DEF', 'SPD', 'SP_ATK', 'SP_DEF']
+                    base_stats = {k: v for k, v in base_char_data.items() if k in stat_keys}
+                    char['stats'] = stats_cog._calculate_stats(base_stats, char['individual_ivs'], char['level'])
+            gained.update(char_id=char_id, char=char, old_level=old_level, leveled_up=leveled_up)
+
+        # Saved with compare-and-swap, so the closure is re-run if another process wrote the player meanwhile
+        player = db.mutate_player(message.author.id, gain_xp)
+        if player is None: return
+        # Even without a level up, so the index follows the new version instead of re-checking on next use
+        collection_index.character_updated(message.author.id, gained['char_id'], gained['char'], player['version'])
+        if not gained['leveled_up']: return
+
+        char, old_level = gained['char'], gained['old_level']
+        await message.channel.send(f"🎉 **{char['name']}** (ID: {char['id']}) leveled up to **Level {char['level']}**!")
+
+        all_special_moves = self.attacks.get('characters', {}).get(str(char.get('id')), [])
+        newly_unlocked = [move for move in all_special_moves if old_level < move['unlock_level'] <= char['level']]
+
+        if newly_unlocked:
+            for new_move in newly_unlocked:
+                await message.channel.send(f"✨ **{char['name']}** unlocked a new move: **{new_move['name']}**!")
 
 async def setup(bot):
     cog = CZ(bot)
@@ -7,17 +7,56 @@ import random
 import time
 from collections import defaultdict
 import database as db
+import collection_index
+from player_locks import serialized, WRITE_CONFLICT_MESSAGE
+from game_data import load_json_data
 
-# --- Helper for loading static game data ---
-def load_json_data(filename):
-    """Helper function to load data from a JSON file."""
-    try:
-        path = os.path.join(os.path.dirname(__file__), '..', 'data', filename)
-        with open(path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        print(f"Error: {filename} not found or is improperly formatted.")
-        return {}
+# --- Item Box Settings ---
+ITEM_BOX_RARITIES = {"common": 65, "rare": 25, "epic": 9.5, "legendary": 0.5}  # Relative weights
+DISCORD_MESSAGE_LIMIT = 2000
+
+# --- Level Potion Settings ---
+POTION_HIGH_LEVEL = 50   # From this level on a potion gives exactly one level
+MAX_LEVEL = 100
+
+def open_item_boxes(item_types, amount):
+    """Draws `amount` item boxes at once, returning {item name: count}.
+
+    Every box picks a type uniformly and a rarity by weight, so the counts per (type, rarity)
+    follow a multinomial distribution. It is sampled as a chain of binomial draws, one per
+    combination: each takes its share of the boxes not yet assigned, in proportion to its
+    probability among the combinations left. The cost depends on the number of item types and
+    rarities, not on how many boxes are opened.
+    """
+    total_weight = sum(ITEM_BOX_RARITIES.values()) * len(item_types)
+    outcomes = [(f"{item_type} {rarity}", weight) for item_type in item_types for rarity, weight in ITEM_BOX_RARITIES.items()]
+    counts = {}
+    remaining, remaining_weight = amount, total_weight
+    for index, (name, weight) in enumerate(outcomes):
+        if remaining == 0:
+            break
+        if index == len(outcomes) - 1:
+            drawn = remaining  # The last outcome takes whatever is left
+        else:
+            drawn = random.binomialvariate(remaining, min(1.0, weight / remaining_weight))
+        if drawn:
+            counts[name] = drawn
+        remaining -= drawn
+        remaining_weight -= weight
+    return counts
+
+def apply_level_potions(level, amount):
+    """The level after drinking `amount` level potions, one after another, starting at `level`.
+
+    Below POTION_HIGH_LEVEL each potion gives 1-3 levels; from there on each gives one. Every
+    low-level potion adds at least a level, so that phase takes fewer than POTION_HIGH_LEVEL
+    rolls however many potions there are, and the remaining potions are added in one step.
+    This gives the same distribution as rolling each potion in turn.
+    """
+    while amount > 0 and level < POTION_HIGH_LEVEL:
+        level += random.randint(1, 3)
+        amount -= 1
+    return min(MAX_LEVEL, level + amount)
 
 # --- Custom Check for Rules Acceptance ---
 def has_accepted_rules():
@@ -48,6 +87,7 @@ class Shop(commands.Cog):
 
     @shop.command(name='buy', help="!shop buy <item> [amount] - Buy an item from the shop.", category="Shop")
     @has_accepted_rules()
+    @serialized
     async def buy(self, ctx, item: str, amount: int = 1):
         player = db.get_player(ctx.author.id)
         item_lower = item.lower()
@@ -61,21 +101,28 @@ class Shop(commands.Cog):
                 await ctx.send(f"You don't have enough coins! (Need {total_cost} for {amount} Item Box{'es' if amount > 1 else ''})"); return
                 
             player['coins'] -= total_cost
-            items_received = []
-            
-            for _ in range(amount):
-                rarity = random.choices(["common", "rare", "epic", "legendary"], [65, 25, 9.5, 0.5], k=1)[0]
-                item_type = random.choice(list(self.items.keys()))
-                item_full_name = f"{item_type} {rarity}"
-                player['inventory'][item_full_name] = player['inventory'].get(item_full_name, 0) + 1
-                items_received.append(item_full_name)
+            items_received = open_item_boxes(list(self.items.keys()), amount)
+            for item_full_name, count in items_received.items():
+                player['inventory'][item_full_name] = player['inventory'].get(item_full_name, 0) + count
             
-            db.update_player(ctx.author.id, player)
+            if not db.update_player(ctx.author.id, player):
+                await ctx.send(WRITE_CONFLICT_MESSAGE); return
             
             if amount == 1:
-                await ctx.send(f"You bought an Item Box and found a **{items_received[0]}**!")
+                await ctx.send(f"You bought an Item Box and found a **{next(iter(items_received))}**!")
             else:
-                await ctx.send(f"You bought {amount} Item Boxes and found:\n" + "\n".join(f"• **{item}**" for item in items_received))
+                # Rarest first, so the interesting finds survive if the list has to be cut short
+                rarity_order = {rarity: index for index, rarity in enumerate(reversed(list(ITEM_BOX_RARITIES)))}
+                found = sorted(items_received.items(), key=lambda entry: (rarity_order[entry[0].rsplit(' ', 1)[1]], -entry[1]))
+                message = f"You bought {amount:,} Item Boxes and found:"
+                for index, (item_full_name, count) in enumerate(found):
+                    line = f"\n• **{item_full_name}** ×{count:,}"
+                    more = f"\n…and {len(found) - index} more kinds of items."
+                    if len(message) + len(line) + len(more) > DISCORD_MESSAGE_LIMIT:
+                        message += more
+                        break
+                    message += line
+                await ctx.send(message)
             
         elif item_lower in ['ticket', 'pull ticket', 'pullticket', '🎟️', 'pull', 'tk']:
             total_cost = 50 * amount
@@ -84,7 +131,8 @@ class Shop(commands.Cog):
                 
             player['coins'] -= total_cost
             player['inventory']['🎟️ Pull Ticket'] = player['inventory'].get('🎟️ Pull Ticket', 0) + amount
-            db.update_player(ctx.author.id, player)
+            if not db.update_player(ctx.author.id, player):
+                await ctx.send(WRITE_CONFLICT_MESSAGE); return
             
             if amount == 1:
                 await ctx.send(f"You bought a **🎟️ Pull Ticket**! Use `!pull` to bypass the cooldown.")
@@ -116,18 +164,12 @@ class Shop(commands.Cog):
                 await ctx.send(f"You don't have enough coins! (Need {total_cost} for {amount} {duration} XP Booster{'s' if amount > 1 else ''})"); return
             
             player['coins'] -= total_cost
-            
-            # Add XP booster with expiration time
-            import time
+            if not db.update_player(ctx.author.id, player):
+                await ctx.send(WRITE_CONFLICT_MESSAGE); return
+
+            # Buying more extends the running booster
             duration_seconds = {'1hr': 3600, '6hr': 21600, '12hr': 43200}[duration]
-            expiration_time = time.time() + (duration_seconds * amount)
-            
-            # Store XP booster info in player data
-            if 'xp_booster' not in player:
-                player['xp_booster'] = {}
-            player['xp_booster'][char_id] = expiration_time
-            
-            db.update_player(ctx.author.id, player)
+            self.bot.boosters.add(ctx.author.id, char_id, duration_seconds * amount)
             
             character = player['characters'][char_id]
             if amount == 1:
@@ -155,31 +197,20 @@ class Shop(commands.Cog):
             
             player['coins'] -= total_cost
             
-            # Calculate level increase based on current level
-            levels_gained = 0
-            for _ in range(amount):
-                if character['level'] >= 100:
-                    break
-                elif character['level'] < 50:
-                    # Low level: 1-3 levels
-                    level_increase = random.randint(1, 3)
-                else:
-                    # High level: only 1 level
-                    level_increase = 1
-                
-                new_level = min(100, character['level'] + level_increase)
-                levels_gained += new_level - character['level']
-                character['level'] = new_level
+            new_level = apply_level_potions(character['level'], amount)
+            levels_gained = new_level - character['level']
+            character['level'] = new_level
             
             # Recalculate stats with new level
             stats_cog = self.bot.get_cog('Stat Calculations')
-            cz_cog = self.bot.get_cog('Core Gameplay')
-            if stats_cog and cz_cog:
-                base_char_data = cz_cog.characters.get(character['name'])
-                if base_char_data:
-                    character['stats'] = stats_cog._calculate_stats(base_char_data, character['individual_ivs'], character['level'])
-            
-            db.update_player(ctx.author.id, player)
+            if stats_cog:
+                stats = stats_cog.stats_for_level(character['name'], character['individual_ivs'], character['level'])
+                if stats:
+                    character['stats'] = stats
+            
+            if not db.update_player(ctx.author.id, player):
+                await ctx.send(WRITE_CONFLICT_MESSAGE); return
+            collection_index.character_updated(ctx.author.id, char_id, character, player['version'])
             
             if amount == 1:
                 await ctx.send(f"🧪 You used a **Level Potion** on **{character['name']}**! They gained **{levels_gained} level{'s' if levels_gained != 1 else ''}** and are now level **{character['level']}**!")
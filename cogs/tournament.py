@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+import discord
+from discord.ext import commands
+import random
+import time
+import math
+from collections import defaultdict
+import asyncio
+# Import the database functions
+import database as db
+from player_locks import player_lock
+
+# --- Tournament Settings ---
+MAX_BATTLES_PER_CHANNEL = 4   # Simultaneous live battles a single channel may host
+MATCH_WIN_RP = 10             # Rank points awarded for every tournament match won
+CHAMPION_COINS = 500          # Coin prize for the tournament winner
+MAX_SIMULATED_PLAYERS = 4096
+
+# --- Custom Check for Rules Acceptance ---
+def has_accepted_rules():
+    """A custom check to see if a player has accepted the game rules."""
+    async def predicate(ctx):
+        player = db.get_player(ctx.author.id)
+        if player.get("rules_accepted", 0) == 1:
+            return True
+        await ctx.send("You must accept the rules first. The rules prompt will be shown on your next command.")
+        return False
+    return commands.check(predicate)
+
+def is_bot_admin():
+    """A custom check that only lets the configured Bot Admin through."""
+    async def predicate(ctx):
+        try:
+            return ctx.author.id == int(ctx.bot.config.get('ADMIN_ID'))
+        except (ValueError, TypeError):
+            return False
+    return commands.check(predicate)
+
+# --- Bracket Generation ---
+def _bracket_order(size):
+    """Seed positions in standard bracket order, so the top two seeds can only meet in the final."""
+    order = [0]
+    while len(order) < size:
+        mirror = len(order) * 2 - 1
+        order = [seed for s in order for seed in (s, mirror - s)]
+    return order
+
+def single_elimination_pairings(seeded_ids):
+    """First-round pairings for a single-elimination bracket. Missing slots are byes (None)."""
+    size = 1
+    while size < len(seeded_ids):
+        size *= 2
+    slots = list(seeded_ids) + [None] * (size - len(seeded_ids))
+    order = _bracket_order(size)
+    return [(slots[order[i]], slots[order[i + 1]]) for i in range(0, size, 2)]
+
+def next_round_pairings(winners):
+    """Pairs the winners of adjacent matches for the next elimination round."""
+    return [(winners[i], winners[i + 1]) for i in range(0, len(winners), 2)]
+
+def swiss_pairings(ranked_ids, scores, history, byes):
+    """Pairs players with the closest scores who have not met yet.
+
+    Returns (pairs, bye); with an odd field the lowest-ranked player without a bye sits out.
+    """
+    ranked = sorted(ranked_ids, key=lambda p: -scores[p])  # Stable: seed order breaks score ties
+    bye = None
+    if len(ranked) % 2:
+        bye = next((p for p in reversed(ranked) if p not in byes), ranked[-1])
+        ranked.remove(bye)
+
+    pairs = []
+    while ranked:
+        player = ranked.pop(0)
+        opponent_idx = next((i for i, other in enumerate(ranked) if other not in history[player]), 0)
+        pairs.append((player, ranked.pop(opponent_idx)))
+    return pairs, bye
+
+def swiss_round_count(player_count):
+    return max(1, math.ceil(math.log2(max(2, player_count))))
+
+class Tournament:
+    """State for one tournament hosted in a channel."""
+    def __init__(self, host, fmt, channel):
+        self.host = host
+        self.format = fmt
+        self.channel = channel
+        self.players = {}  # user_id -> member, in join order
+        self.task = None
+        self.round = 0
+
+    @property
+    def started(self):
+        return self.task is not None
+
+class TournamentCog(commands.Cog, name="Tournaments"):
+    """Bracket tournaments (single elimination or Swiss) that run whole rounds of battles concurrently."""
+    FORMATS = ('single', 'swiss')
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.tournaments = {}  # channel_id -> Tournament
+        self.channel_semaphores = {}
+
+    def cog_unload(self):
+        for tournament in self.tournaments.values():
+            if tournament.task:
+                tournament.task.cancel()
+
+    def _channel_semaphore(self, channel_id):
+        if channel_id not in self.channel_semaphores:
+            self.channel_semaphores[channel_id] = asyncio.Semaphore(MAX_BATTLES_PER_CHANNEL)
+        return self.channel_semaphores[channel_id]
+
+    # --- Scheduler ---
+    async def _run_round(self, channel_id, pairs, play_match):
+        """Runs every match of a round concurrently, capped per channel. Returns the winner of each pair in order."""
+        semaphore = self._channel_semaphore(channel_id)
+
+        async def run_pair(p1, p2):
+            if p2 is None: return p1
+            if p1 is None: return p2
+            async with semaphore:
+                return await play_match(p1, p2)
+
+        return await asyncio.gather(*(run_pair(p1, p2) for p1, p2 in pairs))
+
+    async def _play_live_match(self, ctx, tournament, p1_id, p2_id):
+        """Plays one interactive battle and returns the winner's ID. The higher seed advances if it ends without a result."""
+        cz_cog = self.bot.get_cog('Core Gameplay')
+        if not cz_cog:
+            return p1_id
+
+        p1_user, p2_user = tournament.players[p1_id], tournament.players[p2_id]
+        battle_key = tuple(sorted((p1_id, p2_id)))
+        task = asyncio.create_task(cz_cog._run_interactive_battle(ctx, p1_user, p2_user, db.get_player(p1_id), db.get_player(p2_id)))
+        cz_cog.active_battles[battle_key] = {"task": task, "channel": ctx.channel}
+
+        winner = await task
+        return winner.id if winner else p1_id
+
+    def _simulate_round(self, pairs, teams):
+        """Resolves a whole round with the headless engine. Runs in a worker thread."""
+        ai_cog = self.bot.get_cog('AI Battle')
+        winners = []
+        for p1, p2 in pairs:
+            if p2 is None or p1 is None:
+                winners.append(p1 if p2 is None else p2)
+            else:
+                winners.append(p1 if ai_cog.simulate_battle(teams[p1], teams[p2]) == 0 else p2)
+        return winners
+
+    async def _run_bracket(self, fmt, seeded_ids, play_round, on_round=None):
+        """Drives a full bracket. `play_round(pairs)` returns the winners; returns the final standings."""
+        if fmt == 'single':
+            pairs = single_elimination_pairings(seeded_ids)
+            eliminated = []
+            round_num = 0
+            while True:
+                round_num += 1
+                winners = await play_round(pairs)
+                eliminated.extend(p for pair, w in zip(pairs, winners) for p in pair if p is not None and p != w)
+                if on_round: await on_round(round_num, pairs, winners)
+                if len(winners) == 1:
+                    # Later eliminations rank higher
+                    return [winners[0]] + eliminated[::-1]
+                pairs = next_round_pairings(winners)
+
+        scores, history, byes = defaultdict(float), defaultdict(set), set()
+        for round_num in range(1, swiss_round_count(len(seeded_ids)) + 1):
+            pairs, bye = swiss_pairings(seeded_ids, scores, history, byes)
+            if bye is not None:
+                scores[bye] += 1
+                byes.add(bye)
+            winners = await play_round(pairs)
+            for (p1, p2), winner in zip(pairs, winners):
+                scores[winner] += 1
+                history[p1].add(p2)
+                history[p2].add(p1)
+            if on_round: await on_round(round_num, pairs, winners)
+        return sorted(seeded_ids, key=lambda p: -scores[p])
+
+    async def _run_live_tournament(self, ctx, tournament):
+        try:
+            # Seed by rank points, highest first
+            ranked = sorted(tournament.players, key=lambda uid: db.get_player(uid).get('rank_points', 0), reverse=True)
+
+            async def play_round(pairs):
+                return await self._run_round(ctx.channel.id, pairs, lambda a, b: self._play_live_match(ctx, tournament, a, b))
+
+            async def on_round(round_num, pairs, winners):
+                tournament.round = round_num
+                # Commit every result of the round in one transaction
+                rewards = {}
+                for (p1, p2), winner in zip(pairs, winners):
+                    if p1 is not None and p2 is not None:
+                        rewards.setdefault(winner, {"rank_points": 0, "coins": 0})["rank_points"] += MATCH_WIN_RP
+                # Hold the winners' locks so none of their in-flight commands writes back stale totals
+                async with player_lock(*rewards):
+                    db.apply_player_rewards(rewards)
+                results = [f"🏅 <@{w}>" for (p1, p2), w in zip(pairs, winners) if p1 is not None and p2 is not None]
+                await ctx.send(f"**Round {round_num} complete!** Winners:\n" + ("\n".join(results[:25]) or "All byes."))
+
+            await ctx.send(f"🏟️ **The tournament has begun!** {len(ranked)} players • Format: **{tournament.format}**")
+            standings = await self._run_bracket(tournament.format, ranked, play_round, on_round)
+
+            champion = standings[0]
+            async with player_lock(champion):
+                db.apply_player_rewards({champion: {"coins": CHAMPION_COINS}})
+            embed = discord.Embed(title="🏆 Tournament Results 🏆", color=discord.Color.gold())
+            embed.description = "\n".join(f"**{i}.** <@{uid}>" for i, uid in enumerate(standings[:10], 1))
+            embed.set_footer(text=f"Champion prize: {CHAMPION_COINS} coins • Every match won: +{MATCH_WIN_RP} RP")
+            await ctx.send(embed=embed)
+
+        except asyncio.CancelledError:
+            await ctx.send("🛑 The tournament was cancelled.")
+        except Exception as e:
+            print(f"An error occurred during the tournament: {e}")
+            await ctx.send("An unexpected error occurred and the tournament has been stopped.")
+        finally:
+            self.tournaments.pop(ctx.channel.id, None)
+
+    # --- Commands ---
+    @commands.group(name='tournament', aliases=['tour'], invoke_without_command=True, help="!tournament - Show the tournament in this channel.", category="Battle System")
+    async def tournament(self, ctx):
+        tournament = self.tournaments.get(ctx.channel.id)
+        if not tournament:
+            await ctx.send("There is no tournament in this channel. Start one with `!tournament create [single|swiss]`."); return
+
+        embed = discord.Embed(title="🏟️ Tournament", color=discord.Color.blurple())
+        embed.add_field(name="Format", value=tournament.format.title(), inline=True)
+        embed.add_field(name="Host", value=tournament.host.display_name, inline=True)
+        embed.add_field(name="Players", value=str(len(tournament.players)), inline=True)
+        status = f"Round {tournament.round + 1} in progress" if tournament.started else "Open for sign-ups - `!tournament join`"
+        embed.add_field(name="Status", value=status, inline=False)
+        await ctx.send(embed=embed)
+
+    @tournament.command(name='create', help="!tournament create [single|swiss] - Open a tournament in this channel.", category="Battle System")
+    @has_accepted_rules()
+    async def tournament_create(self, ctx, fmt: str = 'single'):
+        fmt = fmt.lower()
+        if fmt not in self.FORMATS:
+            await ctx.send("Invalid format. Choose `single` or `swiss`."); return
+        if ctx.channel.id in self.tournaments:
+            await ctx.send("A tournament is already running in this channel."); return
+
+        self.tournaments[ctx.channel.id] = Tournament(ctx.author, fmt, ctx.channel)
+        await ctx.send(f"🏟️ **{ctx.author.display_name}** opened a **{fmt}** tournament! Use `!tournament join` to enter.")
+
+    @tournament.command(name='join', help="!tournament join - Enter the tournament in this channel.", category="Battle System")
+    @has_accepted_rules()
+    async def tournament_join(self, ctx):
+        tournament = self.tournaments.get(ctx.channel.id)
+        if not tournament:
+            await ctx.send("There is no tournament to join in this channel."); return
+        if tournament.started:
+            await ctx.send("This tournament has already started."); return
+        if ctx.author.id in tournament.players:
+            await ctx.send("You have already joined."); return
+
+        player = db.get_player(ctx.author.id)
+        if not any(cid for cid in player.get('team', {}).values() if cid):
+            await ctx.send("You need a team to battle! Use `!team add` to add characters first."); return
+
+        tournament.players[ctx.author.id] = ctx.author
+        await ctx.send(f"✅ **{ctx.author.display_name}** joined the tournament ({len(tournament.players)} players).")
+
+    @tournament.command(name='leave', help="!tournament leave - Leave the tournament before it starts.", category="Battle System")
+    async def tournament_leave(self, ctx):
+        tournament = self.tournaments.get(ctx.channel.id)
+        if not tournament or ctx.author.id not in tournament.players:
+            await ctx.send("You are not in a tournament here."); return
+        if tournament.started:
+            await ctx.send("You cannot leave a tournament that has already started."); return
+
+        del tournament.players[ctx.author.id]
+        await ctx.send(f"**{ctx.author.display_name}** left the tournament.")
+
+    @tournament.command(name='start', help="!tournament start - Start the tournament (host only).", category="Battle System")
+    async def tournament_start(self, ctx):
+        tournament = self.tournaments.get(ctx.channel.id)
+        if not tournament:
+            await ctx.send("There is no tournament in this channel."); return
+        if ctx.author.id != tournament.host.id:
+            await ctx.send("Only the host can start the tournament."); return
+        if tournament.started:
+            await ctx.send("The tournament is already running."); return
+        if len(tournament.players) < 2:
+            await ctx.send("At least 2 players are needed to start."); return
+
+        tournament.task = asyncio.create_task(self._run_live_tournament(ctx, tournament))
+
+    @tournament.command(name='cancel', help="!tournament cancel - Cancel the tournament (host only).", category="Battle System")
+    async def tournament_cancel(self, ctx):
+        tournament = self.tournaments.get(ctx.channel.id)
+        if not tournament:
+            await ctx.send("There is no tournament in this channel."); return
+        if ctx.author.id != tournament.host.id:
+            await ctx.send("Only the host can cancel the tournament."); return
+
+        if tournament.task:
+            tournament.task.cancel()
+        else:
+            del self.tournaments[ctx.channel.id]
+            await ctx.send("🛑 The tournament was cancelled.")
+
+    @tournament.command(name='simulate', aliases=['sim'], help="!tournament simulate [players] [single|swiss] - Run a headless AI tournament.", category="Battle System")
+    @is_bot_admin()
+    async def tournament_simulate(self, ctx, players: int = 1024, fmt: str = 'single'):
+        fmt = fmt.lower()
+        if fmt not in self.FORMATS:
+            await ctx.send("Invalid format. Choose `single` or `swiss`."); return
+        if not 2 <= players <= MAX_SIMULATED_PLAYERS:
+            await ctx.send(f"Player count must be between 2 and {MAX_SIMULATED_PLAYERS}."); return
+
+        ai_cog = self.bot.get_cog('AI Battle')
+        if not ai_cog or not self.bot.get_cog('Stat Calculations'):
+            await ctx.send("Game systems are currently offline."); return
+
+        start = time.perf_counter()
+        # Team generation and every round run in a worker thread so the gateway stays responsive
+        teams = await asyncio.to_thread(lambda: [ai_cog._build_ai_team(random.randint(1, 100)) for _ in range(players)])
+        if any(team is None for team in teams):
+            await ctx.send("Game systems are currently offline."); return
+        built = time.perf_counter()
+
+        matches = 0
+        async def play_round(pairs):
+            nonlocal matches
+            matches += sum(1 for p1, p2 in pairs if p1 is not None and p2 is not None)
+            return await asyncio.to_thread(self._simulate_round, pairs, teams)
+
+        standings = await self._run_bracket(fmt, list(range(players)), play_round)
+        finished = time.perf_counter()
+
+        champion = teams[standings[0]]
+        embed = discord.Embed(title="🤖 Simulated Tournament", color=discord.Color.dark_teal())
+        embed.add_field(name="Format", value=fmt.title(), inline=True)
+        embed.add_field(name="Players", value=str(players), inline=True)
+        embed.add_field(name="Matches", value=str(matches), inline=True)
+        embed.add_field(name="Champion", value=f"Bot #{standings[0] + 1}: " + ", ".join(f"{c['name']} (Lv.{c['level']})" for c in champion), inline=False)
+        embed.set_footer(text=f"Teams built in {built - start:.2f}s • Bracket played in {finished - built:.2f}s")
+        await ctx.send(embed=embed)
+
+async def setup(bot):
+    await bot.add_cog(TournamentCog(bot))
@@ -4,9 +4,9 @@ import os
 import random
 import hashlib
 import asyncio
-import re
 # Import the database functions to manage player coins
 import database as db
+import safe_eval
 
 # AFK storage dictionary (can remain in memory as it's not critical)
 AFK_USERS = {}
@@ -24,20 +24,22 @@ class Utils(commands.Cog):
 
     @commands.command(name='calculator', aliases=['calc'], help="!calc <expression> - A simple calculator.")
     async def calculator(self, ctx, *, expression: str):
-        # Securely evaluate the expression
-        # Only allow digits, basic operators, parentheses, and spaces
-        if not re.match(r"^[0-9\s()+\-*/.]*$", expression):
-            await ctx.send("Invalid characters in expression. Only numbers and `+ - * / ()` are allowed.")
-            return
+        # Parsed and evaluated by safe_eval in a worker process with size limits and a timeout,
+        # so no expression can run arbitrary code or tie up the bot
         try:
-            # Safe evaluation
-            result = eval(expression, {"__builtins__": {}}, {})
+            result = await safe_eval.evaluate_async(expression)
             await ctx.send(f"🧮 Result: `{expression} = {result}`")
-        except (SyntaxError, ZeroDivisionError, TypeError, OverflowError) as e:
+        except safe_eval.EvaluationTimeout as e:
+            await ctx.send(f"⏱️ That calculation took too long: `{e}`")
+        except (safe_eval.UnsafeExpression, SyntaxError, ZeroDivisionError, OverflowError) as e:
             await ctx.send(f"Invalid mathematical expression: `{e}`")
 
-    
-        
+    async def cog_load(self):
+        # Spawned workers take a while to start; doing it now keeps that off the first !calc
+        safe_eval.warm_up()
+
+    async def cog_unload(self):
+        safe_eval.shutdown()
 
 async def setup(bot):
     await bot.add_cog(Utils(bot))
@@ -0,0 +1,162 @@
+import bisect
+from collections import OrderedDict
+
+MAX_INDEXED_PLAYERS = 2048  # Indexes for the least recently used players are dropped past this
+
+def _discard(sorted_list, value):
+    """Removes a value from a sorted list using binary search."""
+    pos = bisect.bisect_left(sorted_list, value)
+    if pos < len(sorted_list) and sorted_list[pos] == value:
+        del sorted_list[pos]
+
+def _entry(char):
+    return char['name'].lower(), char['level'], char['iv']
+
+class CollectionIndex:
+    """Secondary indexes over one player's collection.
+
+    Maps lower-cased character names to their IDs and keeps the IDs sorted by ID, level and IV,
+    so lookups and sorted listings don't have to scan or re-sort the whole collection.
+    """
+    def __init__(self, user_id, characters, next_character_id, version=None):
+        self.user_id = user_id
+        self.next_character_id = next_character_id
+        self.version = version  # The player data version this index reflects
+        self._build(characters)
+
+    def _build(self, characters):
+        # Sorting once is far cheaper than inserting a large collection one character at a time
+        self._entries = {int(char_id): _entry(char) for char_id, char in characters.items()}  # char_id -> (name, level, iv)
+        self.ids = sorted(self._entries)                  # char IDs, ascending
+        self.by_name = {}                                 # lower-cased name -> sorted list of char IDs
+        for char_id in self.ids:
+            self.by_name.setdefault(self._entries[char_id][0], []).append(char_id)
+        self.by_level = sorted((-level, char_id) for char_id, (_, level, _) in self._entries.items())  # highest level first
+        self.by_iv = sorted((-iv, char_id) for char_id, (_, _, iv) in self._entries.items())           # highest IV first
+        if self.ids:
+            self.next_character_id = max(self.next_character_id, self.ids[-1] + 1)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, char_id, char):
+        """Indexes a character, replacing any previous entry for the same ID."""
+        char_id = int(char_id)  # Collections written back to JSON can come with string keys
+        if char_id in self._entries:
+            self.remove(char_id)
+        name, level, iv = self._entries[char_id] = _entry(char)
+        bisect.insort(self.by_name.setdefault(name, []), char_id)
+        bisect.insort(self.ids, char_id)
+        bisect.insort(self.by_level, (-level, char_id))
+        bisect.insort(self.by_iv, (-iv, char_id))
+        self.next_character_id = max(self.next_character_id, char_id + 1)
+
+    def remove(self, char_id):
+        char_id = int(char_id)
+        entry = self._entries.pop(char_id, None)
+        if entry is None:
+            return
+        name, level, iv = entry
+        _discard(self.by_name[name], char_id)
+        if not self.by_name[name]:
+            del self.by_name[name]
+        _discard(self.ids, char_id)
+        _discard(self.by_level, (-level, char_id))
+        _discard(self.by_iv, (-iv, char_id))
+
+    def update(self, char_id, char):
+        """Re-indexes a character whose level or IV may have changed."""
+        if self._entries.get(int(char_id)) != _entry(char):
+            self.add(char_id, char)
+
+    def sync(self, characters, version):
+        """Brings the index in line with a collection that changed without it being told.
+
+        Compares every character's name, level and IV against the index, which is much cheaper
+        than a rebuild; only if a large part of the collection changed is it rebuilt.
+        """
+        changed = [char_id for char_id, char in characters.items() if self._entries.get(char_id) != _entry(char)]
+        removed = [char_id for char_id in self._entries if char_id not in characters]
+        if len(changed) + len(removed) > max(64, len(characters) // 8):
+            self._build(characters)
+        else:
+            for char_id in removed:
+                self.remove(char_id)
+            for char_id in changed:
+                self.add(char_id, characters[char_id])
+        self.version = version
+
+    def find(self, identifier):
+        """Returns the IDs of characters whose name contains the identifier (case-insensitive), ascending."""
+        needle = identifier.lower()
+        # Partial names only need to be checked against the distinct names, not every character
+        matches = [char_id for name, ids in self.by_name.items() if needle in name for char_id in ids]
+        return sorted(matches)
+
+    def ordered_ids(self, sort_key='id'):
+        """Character IDs ordered by 'id', 'level' or 'iv' (highest first for level and IV)."""
+        if sort_key == 'level':
+            return [char_id for _, char_id in self.by_level]
+        if sort_key == 'iv':
+            return [char_id for _, char_id in self.by_iv]
+        return list(self.ids)
+
+_indexes = OrderedDict()
+stats = {"hits": 0, "misses": 0}
+
+def get_index(player):
+    """Returns the collection index for a player's data, building it on first use.
+
+    Every write bumps the player's version, so an index whose version doesn't match the data
+    missed a change (a level set without update(), say) and is re-synced before use.
+    """
+    user_id = player['user_id']
+    index = _indexes.get(user_id)
+    if index is not None and index.version == player.get('version'):
+        stats["hits"] += 1
+        _indexes.move_to_end(user_id)
+        return index
+
+    stats["misses"] += 1
+    if index is None:
+        index = CollectionIndex(user_id, player['characters'], player['next_character_id'], player.get('version'))
+        _indexes[user_id] = index
+        if len(_indexes) > MAX_INDEXED_PLAYERS:
+            _indexes.popitem(last=False)
+    else:
+        index.sync(player['characters'], player.get('version'))
+        _indexes.move_to_end(user_id)
+    return index
+
+def _changed(user_id, version, change):
+    """Applies one change to a player's cached index.
+
+    `version` is the player's version after the write that made the change. update_player bumps it
+    by exactly one, so an index that was current before that write is current again afterwards.
+    Otherwise the index keeps its old version and get_index re-syncs it on next use.
+    """
+    index = _indexes.get(user_id)
+    if index is None:
+        return
+    change(index)
+    if version is not None and index.version == version - 1:
+        index.version = version
+
+def character_added(user_id, char_id, char, version=None):
+    """Indexes a character that has just been added to a player's collection, without a rebuild."""
+    _changed(user_id, version, lambda index: index.add(char_id, char))
+
+def character_removed(user_id, char_id, version=None):
+    """Drops a character that has just been removed from a player's collection from its index."""
+    _changed(user_id, version, lambda index: index.remove(char_id))
+
+def character_updated(user_id, char_id, char, version=None):
+    """Re-indexes a character whose level, IV or name has just changed."""
+    _changed(user_id, version, lambda index: index.update(char_id, char))
+
+def invalidate(user_id=None):
+    """Drops a player's index (or every index) so it is rebuilt on next use."""
+    if user_id is None:
+        _indexes.clear()
+    else:
+        _indexes.pop(user_id, None)
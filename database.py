@@ -2,71 +2,27 @@ import sqlite3
 import json
 from collections import defaultdict
 import time
+from metrics import timed_db
+import migrations
 
 DATABASE_FILE = 'bot_database.db'
+CAS_RETRIES = 5  # Attempts mutate_player makes before giving up on a contended player
 
-def update_db_schema(cursor):
-    """Checks for and applies necessary database schema updates."""
-    try:
-        cursor.execute("PRAGMA table_info(players)")
-        columns = [column[1] for column in cursor.fetchall()]
-        
-        if 'last_pull_time' not in columns:
-            print("Updating database schema: Adding 'last_pull_time' column...")
-            cursor.execute("ALTER TABLE players ADD COLUMN last_pull_time REAL NOT NULL DEFAULT 0")
-            print("Schema update complete.")
-            
-        if 'rank_points' not in columns:
-            print("Updating database schema: Adding 'rank_points' column...")
-            cursor.execute("ALTER TABLE players ADD COLUMN rank_points INTEGER NOT NULL DEFAULT 0")
-            print("Schema update complete.")
-    except sqlite3.Error as e:
-        print(f"Schema update error (likely column already exists): {e}")
+# Kinds of rows in player_timers
+TIMER_WEEKLY = 'weekly'            # Weekly reward cooldown
+TIMER_XP_BOOSTER = 'xp_booster'    # XP multiplier on one character; subject is the character ID
+
+# Compare-and-swap counters for update_player/mutate_player
+cas_stats = {"writes": 0, "conflicts": 0, "retries": 0, "failures": 0}
 
+@timed_db
 def init_db():
-    """Initializes the database and creates/updates tables as needed."""
-    conn = sqlite3.connect(DATABASE_FILE)
-    cursor = conn.cursor()
-    
-    # --- Players Table ---
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS players (
-            user_id INTEGER PRIMARY KEY,
-            coins INTEGER NOT NULL DEFAULT 500,
-            characters TEXT NOT NULL DEFAULT '{}',
-            inventory TEXT NOT NULL DEFAULT '{}',
-            team TEXT NOT NULL DEFAULT '{}',
-            latest_pull_id INTEGER,
-            selected_character_id INTEGER,
-            next_character_id INTEGER NOT NULL DEFAULT 1,
-            last_xp_gain_time REAL NOT NULL DEFAULT 0,
-            last_daily_date TEXT,
-            daily_streak INTEGER NOT NULL DEFAULT 0,
-            rules_accepted INTEGER NOT NULL DEFAULT 0,
-            last_pull_time REAL NOT NULL DEFAULT 0,
-            rank_points INTEGER NOT NULL DEFAULT 0
-        )
-    ''')
-    
-    # Run schema update after table creation
-    update_db_schema(cursor)
-    
-    # --- Market Table ---
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS market (
-            listing_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            seller_id INTEGER NOT NULL,
-            price INTEGER NOT NULL,
-            character_data TEXT NOT NULL,
-            listed_at REAL NOT NULL
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
+    """Brings the database schema up to date. Does nothing beyond a version check when it already is."""
+    migrations.migrate(DATABASE_FILE)
 
 # --- Player Data Functions ---
 
+@timed_db
 def get_player(user_id):
     """Fetches a player's data, creating a new entry if one doesn't exist."""
     conn = sqlite3.connect(DATABASE_FILE)
@@ -92,7 +48,8 @@ def get_player(user_id):
             "daily_streak": player_row['daily_streak'], 
             "rules_accepted": player_row['rules_accepted'],
             "last_pull_time": player_row['last_pull_time'],
-            "rank_points": player_row['rank_points']
+            "rank_points": player_row['rank_points'],
+            "version": player_row['version']
         }
         player_data['characters'] = {int(k): v for k, v in player_data['characters'].items()}
     else:
@@ -104,18 +61,30 @@ def get_player(user_id):
             "latest_pull_id": None, "selected_character_id": None, 
             "next_character_id": 1, "last_xp_gain_time": 0, 
             "last_daily_date": None, "daily_streak": 0, "rules_accepted": 0,
-            "last_pull_time": 0, "rank_points": 0
+            "last_pull_time": 0, "rank_points": 0, "version": 0
         }
         
     conn.close()
     return player_data
 
+@timed_db
 def update_player(user_id, data):
-    """Updates a player's data in the database."""
+    """Updates a player's data in the database.
+
+    The write is a compare-and-swap on the `version` read by get_player: it only applies if nobody
+    else has saved the player since, and returns False otherwise. Data without a version is written
+    unconditionally.
+    """
+    saved = _write_player(user_id, data)
+    if not saved:
+        print(f"Write conflict for player {user_id}: their data changed since it was read.")
+    return saved
+
+def _write_player(user_id, data):
     conn = sqlite3.connect(DATABASE_FILE)
     cursor = conn.cursor()
     
-    data['characters'] = {str(k): v for k, v in data.get("characters", {}).items()}
+    # json.dumps turns the int character IDs into string keys without touching the caller's dict
     characters_str = json.dumps(data.get("characters", {}))
     inventory_dict = dict(data.get("inventory", defaultdict(int)))
     inventory_str = json.dumps(inventory_dict)
@@ -125,20 +94,76 @@ def update_player(user_id, data):
         UPDATE players
         SET coins = ?, characters = ?, inventory = ?, team = ?, latest_pull_id = ?,
             selected_character_id = ?, next_character_id = ?, last_xp_gain_time = ?,
-            last_daily_date = ?, daily_streak = ?, rules_accepted = ?, last_pull_time = ?, rank_points = ?
-        WHERE user_id = ?
+            last_daily_date = ?, daily_streak = ?, rules_accepted = ?, last_pull_time = ?, rank_points = ?,
+            version = version + 1
+        WHERE user_id = ? AND (? IS NULL OR version = ?)
     ''', (
         data.get("coins", 500), characters_str, inventory_str, team_str,
         data.get("latest_pull_id"), data.get("selected_character_id"),
         data.get("next_character_id", 1), data.get("last_xp_gain_time", 0),
         data.get("last_daily_date"), data.get("daily_streak", 0),
         data.get("rules_accepted", 0), data.get("last_pull_time", 0), data.get("rank_points", 0),
-        user_id
+        user_id, data.get("version"), data.get("version")
     ))
+    saved = cursor.rowcount == 1
     
     conn.commit()
     conn.close()
 
+    if saved:
+        cas_stats["writes"] += 1
+        if data.get("version") is not None:
+            data["version"] += 1
+    else:
+        cas_stats["conflicts"] += 1
+    return saved
+
+@timed_db
+def mutate_player(user_id, mutate, retries=CAS_RETRIES):
+    """Applies `mutate(player)` to fresh player data and saves it, re-running it on write conflicts.
+
+    `mutate` may return False to leave the player unchanged. Returns the saved player data,
+    or None if nothing was written.
+    """
+    for attempt in range(retries):
+        if attempt:
+            cas_stats["retries"] += 1
+        player = get_player(user_id)
+        if mutate(player) is False:
+            return None
+        if _write_player(user_id, player):
+            return player
+    cas_stats["failures"] += 1
+    print(f"Giving up on player {user_id} after {retries} conflicting writes.")
+    return None
+
+def get_cas_stats():
+    """Compare-and-swap counters plus the conflict and retry rates per write attempt."""
+    attempts = cas_stats["writes"] + cas_stats["conflicts"]
+    return {
+        **cas_stats,
+        "conflict_rate": cas_stats["conflicts"] / attempts if attempts else 0.0,
+        "retry_rate": cas_stats["retries"] / attempts if attempts else 0.0
+    }
+
+@timed_db
+def apply_player_rewards(rewards):
+    """Applies rank point and coin changes for many players in a single transaction.
+
+    `rewards` maps user_id -> {"rank_points": delta, "coins": delta}.
+    """
+    if not rewards:
+        return
+    conn = sqlite3.connect(DATABASE_FILE)
+    cursor = conn.cursor()
+    cursor.executemany(
+        "UPDATE players SET rank_points = MAX(0, rank_points + ?), coins = MAX(0, coins + ?), version = version + 1 WHERE user_id = ?",
+        [(r.get("rank_points", 0), r.get("coins", 0), user_id) for user_id, r in rewards.items()]
+    )
+    conn.commit()
+    conn.close()
+
+@timed_db
 def reset_player(user_id):
     """Resets a single player's data to the default state."""
     conn = sqlite3.connect(DATABASE_FILE)
@@ -148,47 +173,239 @@ def reset_player(user_id):
         UPDATE players
         SET coins = 500, characters = '{}', inventory = '{}', team = '{}', 
             latest_pull_id = NULL, selected_character_id = NULL, next_character_id = 1, 
-            last_xp_gain_time = 0, last_daily_date = NULL, daily_streak = 0, last_pull_time = 0, rank_points = 0
+            last_xp_gain_time = 0, last_daily_date = NULL, daily_streak = 0, last_pull_time = 0, rank_points = 0,
+            version = version + 1
         WHERE user_id = ?
     ''', (user_id,))
+    cursor.execute("DELETE FROM player_timers WHERE user_id = ?", (user_id,))
     conn.commit()
     conn.close()
 
+@timed_db
 def reset_all_players():
     """Drops and re-initializes all player-related tables."""
     conn = sqlite3.connect(DATABASE_FILE)
     cursor = conn.cursor()
     cursor.execute("DROP TABLE IF EXISTS players")
     cursor.execute("DROP TABLE IF EXISTS market")
+    cursor.execute("DROP TABLE IF EXISTS player_timers")
+    # Rewind the schema version so init_db recreates the dropped tables
+    cursor.execute("PRAGMA user_version = 0")
     conn.commit()
     conn.close()
     init_db()
 
-# --- Market Data Functions ---
-def add_market_listing(seller_id, price, character_data):
-    """Adds a new character listing to the market."""
+# --- Player Timer Functions ---
+# Timers live in their own table and are only read by the commands that need them, so
+# get_player stays the same size. Expired rows are ignored on read and deleted in bulk by
+# expire_player_timers.
+
+@timed_db
+def get_active_timers(kind):
+    """Returns [(user_id, subject, expires_at, value)] for every unexpired timer of one kind."""
     conn = sqlite3.connect(DATABASE_FILE)
     cursor = conn.cursor()
-    character_json = json.dumps(character_data)
-    listed_at = time.time()
-    
-    cursor.execute(
-        "INSERT INTO market (seller_id, price, character_data, listed_at) VALUES (?, ?, ?, ?)",
-        (seller_id, price, character_json, listed_at)
-    )
-    listing_id = cursor.lastrowid
+    cursor.execute("SELECT user_id, subject, expires_at, value FROM player_timers WHERE kind = ? AND expires_at > ?",
+                   (kind, time.time()))
+    timers = cursor.fetchall()
+    conn.close()
+    return timers
+
+@timed_db
+def claim_cooldown(user_id, kind, expires_at, coins=0):
+    """Starts a cooldown if the previous one has run out, paying `coins` in the same transaction.
+
+    Returns None when claimed, otherwise the expiry time of the cooldown still running.
+    """
+    conn = sqlite3.connect(DATABASE_FILE)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute('''
+            INSERT INTO player_timers (user_id, kind, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT (user_id, kind, subject) DO UPDATE SET expires_at = excluded.expires_at
+            WHERE player_timers.expires_at <= ?
+        ''', (user_id, kind, expires_at, time.time()))
+        if cursor.rowcount == 0:
+            cursor.execute("SELECT expires_at FROM player_timers WHERE user_id = ? AND kind = ? AND subject = ''", (user_id, kind))
+            running_until = cursor.fetchone()[0]
+            conn.rollback()
+            return running_until
+        if coins:
+            cursor.execute("UPDATE players SET coins = coins + ?, version = version + 1 WHERE user_id = ?", (coins, user_id))
+        conn.commit()
+        return None
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+@timed_db
+def extend_player_timer(user_id, kind, subject, seconds, value=0):
+    """Adds `seconds` to a timer, starting from now if it isn't running. Returns the new expiry time."""
+    now = time.time()
+    conn = sqlite3.connect(DATABASE_FILE)
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO player_timers (user_id, kind, subject, expires_at, value) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (user_id, kind, subject) DO UPDATE SET expires_at = MAX(expires_at, ?) + ?, value = excluded.value
+        RETURNING expires_at
+    ''', (user_id, kind, str(subject), now + seconds, value, now, seconds))
+    expires_at = cursor.fetchone()[0]
     conn.commit()
     conn.close()
-    return listing_id
+    return expires_at
 
-def remove_market_listing(listing_id):
-    """Removes a character listing from the market."""
+@timed_db
+def expire_player_timers(now=None):
+    """Deletes every timer that has run out. Returns [(user_id, kind, subject)] of the deleted rows."""
     conn = sqlite3.connect(DATABASE_FILE)
     cursor = conn.cursor()
-    cursor.execute("DELETE FROM market WHERE listing_id = ?", (listing_id,))
+    cursor.execute("DELETE FROM player_timers WHERE expires_at <= ? RETURNING user_id, kind, subject",
+                   (now if now is not None else time.time(),))
+    expired = cursor.fetchall()
     conn.commit()
     conn.close()
+    return expired
+
+# --- Market Data Functions ---
+@timed_db
+def add_market_listing(seller_id, char_id, price):
+    """Moves a character from the seller's collection to a new market listing in a single transaction.
+
+    Returns (status, listing) where status is one of "ok", "missing", "on_team" or "selected".
+    On success the listing carries its `listing_id` and `character_data`.
+    """
+    conn = sqlite3.connect(DATABASE_FILE, isolation_level=None)
+    cursor = conn.cursor()
+    path = f'$."{int(char_id)}"'
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("SELECT json_extract(characters, ?), team, selected_character_id FROM players WHERE user_id = ?",
+                       (path, seller_id))
+        row = cursor.fetchone()
+        if not row or row[0] is None:
+            cursor.execute("ROLLBACK")
+            return "missing", None
+        character_json, team_json, selected_id = row
+        if char_id in json.loads(team_json).values():
+            cursor.execute("ROLLBACK")
+            return "on_team", None
+        if char_id == selected_id:
+            cursor.execute("ROLLBACK")
+            return "selected", None
+
+        cursor.execute("UPDATE players SET characters = json_remove(characters, ?), version = version + 1 WHERE user_id = ?",
+                       (path, seller_id))
+        cursor.execute("INSERT INTO market (seller_id, price, character_data, listed_at) VALUES (?, ?, ?, ?)",
+                       (seller_id, price, character_json, time.time()))
+        listing_id = cursor.lastrowid
+        cursor.execute("COMMIT")
+    except sqlite3.Error:
+        if conn.in_transaction:
+            cursor.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+    return "ok", {"listing_id": listing_id, "character_data": json.loads(character_json)}
+
+def _claim_listing(cursor, listing_id, seller_id=None):
+    """Deletes a listing and returns (seller_id, price, character_json), or None if it was already gone."""
+    query = "DELETE FROM market WHERE listing_id = ?"
+    params = [listing_id]
+    if seller_id is not None:
+        query += " AND seller_id = ?"
+        params.append(seller_id)
+    cursor.execute(query + " RETURNING seller_id, price, character_data", params)
+    return cursor.fetchone()
+
+def _give_character(cursor, user_id, character_json):
+    """Appends a character to a player's collection in SQL and returns its new ID."""
+    cursor.execute('''
+        UPDATE players
+        SET characters = json_set(characters, '$."' || next_character_id || '"', json(?)),
+            next_character_id = next_character_id + 1,
+            version = version + 1
+        WHERE user_id = ?
+        RETURNING next_character_id - 1
+    ''', (character_json, user_id))
+    return cursor.fetchone()[0]
+
+@timed_db
+def buy_market_listing(listing_id, buyer_id):
+    """Buys a listing in a single transaction.
+
+    Returns (status, listing) where status is one of "ok", "missing", "own_listing" or "insufficient_funds".
+    On success the listing also carries the buyer's `new_id` for the character.
+    """
+    conn = sqlite3.connect(DATABASE_FILE, isolation_level=None)
+    cursor = conn.cursor()
+    try:
+        # Take the write lock up front so no other connection can touch the listing or the coins meanwhile
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("SELECT seller_id, price FROM market WHERE listing_id = ?", (listing_id,))
+        row = cursor.fetchone()
+        if not row:
+            cursor.execute("ROLLBACK")
+            return "missing", None
+        seller_id, price = row
+        if seller_id == buyer_id:
+            cursor.execute("ROLLBACK")
+            return "own_listing", None
+
+        cursor.execute("INSERT OR IGNORE INTO players (user_id) VALUES (?)", (buyer_id,))
+        cursor.execute("UPDATE players SET coins = coins - ?, version = version + 1 WHERE user_id = ? AND coins >= ?", (price, buyer_id, price))
+        if cursor.rowcount == 0:
+            cursor.execute("ROLLBACK")
+            return "insufficient_funds", {"price": price}
+
+        claimed = _claim_listing(cursor, listing_id)
+        if not claimed:
+            cursor.execute("ROLLBACK")
+            return "missing", None
+        seller_id, price, character_json = claimed
+        cursor.execute("UPDATE players SET coins = coins + ?, version = version + 1 WHERE user_id = ?", (price, seller_id))
+        new_id = _give_character(cursor, buyer_id, character_json)
+        cursor.execute("COMMIT")
+    except sqlite3.Error:
+        if conn.in_transaction:
+            cursor.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+    return "ok", {
+        "listing_id": listing_id, "seller_id": seller_id, "price": price,
+        "character_data": json.loads(character_json), "new_id": new_id
+    }
+
+@timed_db
+def return_market_listing(listing_id, seller_id):
+    """Removes a seller's own listing and gives the character back in one transaction.
+
+    Returns (character_data, new_id), or None if the listing is gone or belongs to someone else.
+    """
+    conn = sqlite3.connect(DATABASE_FILE, isolation_level=None)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        claimed = _claim_listing(cursor, listing_id, seller_id)
+        if not claimed:
+            cursor.execute("ROLLBACK")
+            return None
+        new_id = _give_character(cursor, seller_id, claimed[2])
+        cursor.execute("COMMIT")
+    except sqlite3.Error:
+        if conn.in_transaction:
+            cursor.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    return json.loads(claimed[2]), new_id
 
+@timed_db
 def get_market_listing(listing_id):
     """Fetches a single market listing by its ID."""
     conn = sqlite3.connect(DATABASE_FILE)
@@ -208,6 +425,7 @@ def get_market_listing(listing_id):
         "listed_at": row[4]
     }
 
+@timed_db
 def get_all_market_listings():
     """Fetches all active listings from the market."""
     conn = sqlite3.connect(DATABASE_FILE)
@@ -227,6 +445,7 @@ def get_all_market_listings():
         })
     return listings
 
+@timed_db
 def get_leaderboard(limit=10):
     """Fetches the top players by rank points for the leaderboard."""
     conn = sqlite3.connect(DATABASE_FILE)
@@ -0,0 +1,29 @@
+import json
+import os
+import startup
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+
+# filename -> parsed data, shared by every cog
+_cache = {}
+
+def load_json_data(filename):
+    """Loads a JSON file from the data folder, parsing each file only once per process.
+
+    Every caller gets the same object back, so the data must be treated as read-only.
+    """
+    if filename in _cache:
+        return _cache[filename]
+    with startup.trace(f"parse {filename}"):
+        try:
+            with open(os.path.join(DATA_DIR, filename), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            print(f"Error: {filename} not found or is improperly formatted.")
+            return {}
+    _cache[filename] = data
+    return data
+
+def clear_cache():
+    """Forgets the parsed files so edited data is picked up by the next cog (re)load."""
+    _cache.clear()
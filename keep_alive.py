@@ -1,15 +1,21 @@
-
 import asyncio
-import aiohttp
 import os
+import random
 import time
+from collections import deque
 from datetime import datetime
 
+PING_INTERVAL = 240    # Average seconds between self-pings
+PING_JITTER = 30       # Pings are spread +/- this many seconds so they don't line up with other schedules
+HISTORY_SIZE = 100     # Ping results kept for latency stats
+
 class KeepAlive:
     def __init__(self, bot):
         self.bot = bot
         self.url = None
         self.running = False
+        self.history = deque(maxlen=HISTORY_SIZE)  # (timestamp, latency in ms or None if it failed)
+        self.skipped = 0
         
     async def start_keep_alive(self):
         """Start the keep-alive service"""
@@ -18,11 +24,19 @@ class KeepAlive:
         
         while self.running:
             try:
-                await self.ping_self()
-                await asyncio.sleep(240)  # Ping every 4 minutes
+                if self.recently_visited():
+                    # Real traffic already keeps the server awake
+                    self.skipped += 1
+                else:
+                    await self.ping_self()
+                await asyncio.sleep(PING_INTERVAL + random.uniform(-PING_JITTER, PING_JITTER))
             except Exception as e:
                 print(f"Keep-alive error: {e}")
                 await asyncio.sleep(60)  # Wait 1 minute on error
+
+    def recently_visited(self):
+        web_server = getattr(self.bot, 'web_server', None)
+        return bool(web_server) and time.time() - web_server.last_request_at < PING_INTERVAL
     
     async def ping_self(self):
         """Ping the web server to keep it alive"""
@@ -37,16 +51,30 @@ class KeepAlive:
             else:
                 self.url = "http://127.0.0.1:5000/ping"
         
+        start = time.perf_counter()
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(self.url, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                    if response.status == 200:
-                        timestamp = datetime.now().strftime("%H:%M:%S")
-                        print(f"🔄 Keep-alive ping successful [{timestamp}]")
-                    else:
-                        print(f"⚠️ Keep-alive ping returned status {response.status}")
+            # The header lets the web server tell our own pings apart from real traffic
+            async with self.bot.http_session.get(self.url, headers={'X-Keep-Alive': '1'}) as response:
+                latency = (time.perf_counter() - start) * 1000
+                if response.status == 200:
+                    self.history.append((time.time(), latency))
+                    timestamp = datetime.now().strftime("%H:%M:%S")
+                    print(f"🔄 Keep-alive ping successful in {latency:.0f}ms [{timestamp}]")
+                else:
+                    self.history.append((time.time(), None))
+                    print(f"⚠️ Keep-alive ping returned status {response.status}")
         except Exception as e:
+            self.history.append((time.time(), None))
             print(f"❌ Keep-alive ping failed: {e}")
+
+    def latency_stats(self):
+        """Average/min/max latency in ms of the successful pings in the history, plus the failure count."""
+        latencies = [latency for _, latency in self.history if latency is not None]
+        return {
+            "pings": len(self.history), "failures": len(self.history) - len(latencies), "skipped": self.skipped,
+            "avg": sum(latencies) / len(latencies) if latencies else None,
+            "min": min(latencies, default=None), "max": max(latencies, default=None)
+        }
     
     def stop(self):
         """Stop the keep-alive service"""
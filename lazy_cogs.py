@@ -0,0 +1,89 @@
+import ast
+import os
+from discord.ext import commands
+
+# Opt-in: cogs named in LAZY_COGS in config.json (e.g. ["events", "abilities", "utils"]) are only
+# imported the first time one of their commands is used. Empty or missing loads everything up front.
+# Only commands are stood in for: a deferred cog's listeners and background tasks don't run until
+# it loads, so only cogs without them belong in the list.
+
+def _is_top_level_command(decorator):
+    """True for @commands.command(...) and @commands.group(...), not a group's @queue.command(...)."""
+    return (isinstance(decorator, ast.Call) and isinstance(decorator.func, ast.Attribute)
+            and isinstance(decorator.func.value, ast.Name) and decorator.func.value.id == 'commands'
+            and decorator.func.attr in ('command', 'group'))
+
+def _literal(node, default):
+    try:
+        return ast.literal_eval(node)
+    except ValueError:
+        return default  # Not a plain literal (an f-string, say); the default will do for a stub
+
+def scan_commands(path):
+    """Reads the cog names and top-level commands out of a cog file without importing it.
+
+    Returns [(cog_name, spec)], one per command; subcommands come with their group's cog.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=path)
+    found = []
+    for cls in tree.body:
+        if not isinstance(cls, ast.ClassDef):
+            continue
+        cog_name = next((_literal(k.value, cls.name) for k in cls.keywords if k.arg == 'name'), cls.name)
+        for node in cls.body:
+            if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                continue
+            for decorator in node.decorator_list:
+                if not _is_top_level_command(decorator):
+                    continue
+                spec = {'name': node.name, 'aliases': [], 'help': None, 'hidden': False}
+                for keyword in decorator.keywords:
+                    if keyword.arg in spec:
+                        spec[keyword.arg] = _literal(keyword.value, spec[keyword.arg])
+                found.append((cog_name, spec))
+    return found
+
+def make_stub(extension, cog_name, spec):
+    """A placeholder command that stands in for a command of a cog that hasn't been loaded yet.
+
+    It carries the real name, aliases, help and cog name so help listings look the same. The bot
+    loads the extension when a stub is invoked and runs the real command in its place; the stub's
+    own callback only runs if that load failed.
+    """
+    async def not_loaded(ctx):
+        await ctx.send("❌ That command is unavailable right now, please try again later.")
+
+    stub = commands.Command(not_loaded, name=spec['name'], aliases=spec['aliases'], help=spec['help'], hidden=spec['hidden'])
+    stub.lazy_extension = extension
+    stub.lazy_cog_name = cog_name
+    return stub
+
+def register(bot, names, cogs_dir='cogs'):
+    """Registers stubs for the given cogs and returns {extension: [stub commands]}.
+
+    A cog that can't be scanned gets no stubs, and so is loaded up front like any other.
+    """
+    pending = {}
+    for name in names:
+        extension = f'cogs.{name}'
+        try:
+            found = scan_commands(os.path.join(cogs_dir, f'{name}.py'))
+        except (OSError, SyntaxError, ValueError) as e:
+            print(f"❌ Could not scan {extension} for lazy loading, loading it now instead: {e}")
+            continue
+        stubs = [make_stub(extension, cog_name, spec) for cog_name, spec in found]
+        for stub in stubs:
+            bot.add_command(stub)
+        pending[extension] = stubs
+    return pending
+
+def remove_stubs(bot, stubs):
+    for stub in stubs:
+        bot.remove_command(stub.name)
+
+def restore_stubs(bot, stubs):
+    """Puts stubs back after their cog failed to load, so the commands still answer."""
+    for stub in stubs:
+        if bot.get_command(stub.name) is None:
+            bot.add_command(stub)
@@ -1,11 +1,21 @@
-import discord
-from discord.ext import commands
-import os
-import json
-import asyncio
-import time
-from flask import Flask
-import threading
+import startup
+
+with startup.trace("imports"):
+    import discord
+    from discord.ext import commands
+    import os
+    import json
+    import asyncio
+    import time
+    import aiohttp
+    from web_server import WebServer
+    import metrics
+    import perf
+    import watchdog
+    import database as db
+    import lazy_cogs
+    import boosters
+    from keep_alive import KeepAlive
 
 # --- Configuration Loading ---
 def load_config():
@@ -17,7 +27,8 @@ def load_config():
         print(f"❌ Error loading config.json: {e}")
         exit()
 
-config = load_config()
+with startup.trace("config"):
+    config = load_config()
 TOKEN = os.getenv('DISCORD_TOKEN') or config.get('TOKEN')
 PREFIX = config.get('PREFIX')
 
@@ -32,141 +43,169 @@ intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True
 
+class CZBot(commands.Bot):
+    """The bot, plus a pooled HTTP session shared by everything that makes outbound requests.
+
+    One-time startup work lives in setup_hook, which runs once before the gateway connects.
+    on_ready fires again on every reconnect, so it only logs.
+    """
+    http_session = None
+    keep_alive = None
+    boosters = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy_extensions = {}  # extension -> stub commands standing in for it until first use
+        self._lazy_lock = asyncio.Lock()
+        self._setup_done = False
+        self._setup_finished_at = None
+
+    async def setup_hook(self):
+        if self._setup_done:
+            return
+        self._setup_done = True
+
+        # Keep-alive connections are reused across requests instead of opening a new one each time
+        self.http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=20, keepalive_timeout=60, ttl_dns_cache=300),
+            timeout=aiohttp.ClientTimeout(total=10)
+        )
+
+        # Initialize database before loading cogs
+        # In a thread, so a long migration doesn't stall the web server sharing this loop
+        with startup.trace("db init"):
+            await asyncio.to_thread(db.init_db)
+        boosters.start(self)
+
+        with startup.trace("cogs"):
+            await self.load_all_cogs()
+
+        # Start keep-alive service
+        self.keep_alive = KeepAlive(self)
+        asyncio.create_task(self.keep_alive.start_keep_alive())
+        print("🔄 Keep-alive service started")
+        self._setup_finished_at = time.perf_counter()
+
+    # --- Cog Loading ---
+    async def load_all_cogs(self):
+        """Loads every .py file in the 'cogs' directory concurrently.
+
+        Cogs listed in LAZY_COGS only get placeholder commands now and are imported the first
+        time one of their commands is used.
+        """
+        names = [filename[:-3] for filename in sorted(os.listdir('./cogs')) if filename.endswith('.py')]
+        lazy = set(self.config.get('LAZY_COGS', []))
+        self.lazy_extensions = lazy_cogs.register(self, [name for name in names if name in lazy])
+        eager = [f'cogs.{name}' for name in names if f'cogs.{name}' not in self.lazy_extensions]
+        await asyncio.gather(*(self._load_cog(name) for name in eager))
+        if self.lazy_extensions:
+            print(f"💤 Deferred cogs until first use: {', '.join(self.lazy_extensions)}")
+
+    async def load_deferred(self, extension):
+        """Loads a deferred cog, once, however many of its commands arrive at the same time."""
+        async with self._lazy_lock:
+            if extension not in self.lazy_extensions:
+                return
+            start = time.perf_counter()
+            await self._load_cog(extension)
+            if extension not in self.lazy_extensions:
+                print(f"💤 Loaded deferred cog {extension} on first use ({(time.perf_counter() - start) * 1000:.0f}ms)")
+
+    async def _load_cog(self, cog_name):
+        try:
+            await self.load_extension(cog_name)
+            print(f"✅ Loaded cog: {cog_name}")
+        except Exception as e:
+            print(f"❌ Failed to load cog {cog_name}: {e}")
+
+    async def load_extension(self, name, *, package=None):
+        # A deferred cog's placeholder commands have to make way for the real ones
+        stubs = self.lazy_extensions.pop(name, [])
+        lazy_cogs.remove_stubs(self, stubs)
+        try:
+            with startup.trace(f"load {name}"):
+                await super().load_extension(name, package=package)
+        except Exception:
+            # Keep the commands answering; the next use of one tries the load again
+            if stubs:
+                lazy_cogs.restore_stubs(self, stubs)
+                self.lazy_extensions[name] = stubs
+            raise
+
+    async def get_context(self, origin, /, *, cls=commands.Context):
+        ctx = await super().get_context(origin, cls=cls)
+        extension = getattr(ctx.command, 'lazy_extension', None)
+        if extension is None:
+            return ctx
+        await self.load_deferred(extension)
+        # Resolve the command again now that the real one is registered
+        return await super().get_context(origin, cls=cls)
+
+    async def close(self):
+        await super().close()
+        if self.boosters:
+            self.boosters.stop()
+        if self.http_session:
+            await self.http_session.close()
+
 # We remove the default help command because we have a custom one in a cog.
-bot = commands.Bot(
+# The presence is sent with the initial IDENTIFY, so reconnects keep it without another update.
+bot = CZBot(
     command_prefix=commands.when_mentioned_or(PREFIX), 
     intents=intents, 
-    help_command=None
+    help_command=None,
+    activity=discord.Activity(type=discord.ActivityType.watching, name=f"for {PREFIX}help")
 )
 
 # Attach config to the bot object for easy access in cogs
 bot.config = config
 
-# --- Flask Web Server ---
-app = Flask(__name__)
-
-@app.route('/')
-def alive():
-    return '''
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Bot Status</title>
-        <style>
-            body { 
-                font-family: Arial, sans-serif; 
-                text-align: center; 
-                margin-top: 50px;
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                color: white;
-                min-height: 100vh;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                flex-direction: column;
-            }
-            .status-box {
-                background: rgba(255,255,255,0.1);
-                padding: 40px;
-                border-radius: 15px;
-                backdrop-filter: blur(10px);
-                box-shadow: 0 8px 32px rgba(0,0,0,0.1);
-            }
-            h1 { 
-                font-size: 3em; 
-                margin-bottom: 20px;
-                text-shadow: 2px 2px 4px rgba(0,0,0,0.3);
-            }
-            .pulse {
-                animation: pulse 2s infinite;
-            }
-            @keyframes pulse {
-                0% { opacity: 1; }
-                50% { opacity: 0.7; }
-                100% { opacity: 1; }
-            }
-        </style>
-    </head>
-    <body>
-        <div class="status-box">
-            <h1 class="pulse">🤖 I'm Alive!</h1>
-            <p>Discord Bot is running successfully</p>
-            <p>✅ All systems operational</p>
-        </div>
-    </body>
-    </html>
-    '''
-
-@app.route('/ping')
-def ping():
-    """Simple ping endpoint for UptimeRobot"""
-    return {"status": "alive", "timestamp": time.time()}, 200
-
-@app.route('/health')
-def health():
-    """Detailed health check"""
-    return {
-        "status": "healthy",
-        "bot_connected": bot.is_ready() if bot else False,
-        "uptime": time.time(),
-        "service": "discord_bot"
-    }, 200
-
-def run_flask():
-    """Run Flask server in a separate thread."""
-    import logging
-    # Disable Flask's default logging
-    log = logging.getLogger('werkzeug')
-    log.setLevel(logging.ERROR)
-    port = int(os.environ.get("PORT", 5000))
-    app.run(host='0.0.0.0', port=port, debug=False) 
+# --- Command Hooks ---
+# A group that runs its own callback before dispatching a subcommand calls these hooks for both;
+# an invocation is timed from the outermost start and recorded once, under the subcommand.
+@bot.before_invoke
+async def before_command(ctx):
+    if hasattr(ctx, 'perf'):
+        return
+    metrics.command_started(ctx)
+    perf.command_started(ctx)
+
+@bot.after_invoke
+async def after_command(ctx):
+    if ctx.invoked_subcommand is not None and ctx.invoked_subcommand is not ctx.command:
+        return
+    metrics.command_finished(ctx)
+    perf.command_finished(ctx)
+    startup.command_finished()
 
 @bot.event
 async def on_ready():
-    """Called when the bot is ready and has connected to Discord."""
+    """Called when the bot has connected to Discord, including after every reconnect."""
     print(f"✅ Logged in as {bot.user.name} ({bot.user.id})")
-    
-    # Initialize database before loading cogs
-    import database as db
-    db.init_db()
-    
-    # --- Cog Loading ---
-    # Automatically load all .py files from the 'cogs' directory.
-    for filename in os.listdir('./cogs'):
-        if filename.endswith('.py'):
-            try:
-                cog_name = f'cogs.{filename[:-3]}'
-                await bot.load_extension(cog_name)
-                print(f"✅ Loaded cog: {cog_name}")
-            except Exception as e:
-                print(f"❌ Failed to load cog {cog_name}: {e}")
-    
-    # Set the bot's presence
-    await bot.change_presence(
-        activity=discord.Activity(
-            type=discord.ActivityType.watching,
-            name=f"for {PREFIX}help"
-        )
-    )
-    
-    # Start keep-alive service
-    from keep_alive import KeepAlive
-    keep_alive = KeepAlive(bot)
-    asyncio.create_task(keep_alive.start_keep_alive())
-    print("🔄 Keep-alive service started")
-    
-    print("✅ Bot is ready!")
+    if bot._setup_finished_at is None or startup.finished:
+        return
+
+    startup.record("gateway", time.perf_counter() - bot._setup_finished_at)
+    startup.finish()
+    print("⏱️ Startup breakdown:\n" + "\n".join(startup.report()))
+    print(f"✅ Bot is ready! ({startup.since_start() * 1000:.0f}ms after launch)")
 
 async def main():
     """Main async function to start the bot."""
-    # Start Flask server in a separate thread
-    flask_thread = threading.Thread(target=run_flask)
-    flask_thread.daemon = True
-    flask_thread.start()
-    print("✅ Web server started on http://0.0.0.0:5000")
+    metrics.instrument_bot(bot)
+    perf.instrument_bot(bot)
+    watchdog.start(bot)
+
+    # The web server runs on the same event loop as the bot
+    web_server = bot.web_server = WebServer(bot)
+    await web_server.start()
     
-    async with bot:
-        await bot.start(TOKEN)
+    try:
+        async with bot:
+            await bot.start(TOKEN)
+    finally:
+        bot.watchdog.stop()
+        await web_server.stop()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,217 @@
+import bisect
+import functools
+import math
+import os
+import threading
+import time
+from contextvars import ContextVar
+import collection_index
+import perf
+
+# Most metrics are only updated from the event loop thread, so plain dict and list updates are
+# enough. Database functions also run in worker threads (init_db via asyncio.to_thread, the
+# benchmarks), so timed_db updates its metrics under a lock.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REGISTRY = []
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+def _format_value(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return "NaN"
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """A monotonically increasing count, optionally split by labels."""
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name, self.help, self.labelnames = name, help_text, tuple(labelnames)
+        self.values = {}
+        REGISTRY.append(self)
+
+    def inc(self, *labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        # A snapshot, since a worker thread may add a series while this runs
+        for labels, value in list(self.values.items()):
+            yield self.name + _format_labels(self.labelnames, labels), value
+
+class Histogram:
+    """Counts observations into cumulative buckets, optionally split by labels."""
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames = name, help_text, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.values = {}  # labels -> [bucket counts..., sum, count]
+        REGISTRY.append(self)
+
+    def observe(self, value, *labels):
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [0] * (len(self.buckets) + 2)
+        pos = bisect.bisect_left(self.buckets, value)
+        if pos < len(self.buckets):
+            series[pos] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def samples(self):
+        for labels, series in list(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield self.name + "_bucket" + _format_labels(self.labelnames, labels, ("le", _format_value(bound))), cumulative
+            yield self.name + "_bucket" + _format_labels(self.labelnames, labels, ("le", "+Inf")), series[-1]
+            yield self.name + "_sum" + _format_labels(self.labelnames, labels), series[-2]
+            yield self.name + "_count" + _format_labels(self.labelnames, labels), series[-1]
+
+class Gauge:
+    """A value read at scrape time from a callback returning a number or a {labels: value} dict."""
+    kind = "gauge"
+
+    def __init__(self, name, help_text, read, labelnames=()):
+        self.name, self.help, self.labelnames = name, help_text, tuple(labelnames)
+        self.read = read
+        REGISTRY.append(self)
+
+    def samples(self):
+        try:
+            value = self.read()
+        except Exception:
+            return
+        if isinstance(value, dict):
+            for labels, v in value.items():
+                yield self.name + _format_labels(self.labelnames, labels if isinstance(labels, tuple) else (labels,)), v
+        elif value is not None:
+            yield self.name, value
+
+def render():
+    """Renders every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(f"{name} {_format_value(value)}" for name, value in metric.samples())
+    return "\n".join(lines) + "\n"
+
+# --- Process Metrics ---
+PROCESS_START = time.time()
+
+def process_rss_bytes():
+    """Resident set size, from /proc on Linux and peak RSS elsewhere."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+Gauge("process_resident_memory_bytes", "Resident memory size in bytes.", process_rss_bytes)
+Gauge("process_uptime_seconds", "Seconds since the process started.", lambda: time.time() - PROCESS_START)
+
+# --- Database Metrics ---
+db_queries = Counter("bot_db_queries_total", "Calls to database.py functions.", ("function",))
+db_duration = Histogram("bot_db_query_duration_seconds", "Time spent in database.py functions.", ("function",),
+                        buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0))
+
+_db_metrics_lock = threading.Lock()
+
+# Set while a timed database function runs, so the ones it calls (like mutate_player's
+# get_player) aren't added to the command's DB time a second time
+_in_db_call = ContextVar('in_db_call', default=False)
+
+def timed_db(func):
+    """Counts and times every call to a database function."""
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        outermost = not _in_db_call.get()
+        token = _in_db_call.set(True) if outermost else None
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            with _db_metrics_lock:
+                db_queries.inc(name)
+                db_duration.observe(elapsed, name)
+            if outermost:
+                _in_db_call.reset(token)
+                perf.add_db_time(elapsed)
+    return wrapper
+
+# --- Command Metrics ---
+commands_total = Counter("bot_commands_total", "Commands invoked, by outcome.", ("command", "status"))
+command_duration = Histogram("bot_command_duration_seconds", "Command wall time.", ("command",))
+
+# --- Event Loop Lag ---
+loop_lag = Histogram("bot_event_loop_lag_seconds", "How late the event loop ran a scheduled wakeup.",
+                     buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0))
+_last_loop_lag = [0.0]
+Gauge("bot_event_loop_lag_last_seconds", "Lag measured by the latest probe.", lambda: _last_loop_lag[0])
+
+def record_loop_lag(lag):
+    """Called by the watchdog heartbeat with how late each wakeup ran."""
+    _last_loop_lag[0] = lag
+    loop_lag.observe(lag)
+
+# --- Bot Wiring ---
+def _cache_ratios(bot):
+    ratios = {}
+    def ratio(name, hits, misses):
+        if hits + misses:
+            ratios[name] = hits / (hits + misses)
+
+    commands_cog = bot.get_cog('Player Commands')
+    if commands_cog:
+        ratio("catalog_filters", commands_cog.catalog_cache_hits, commands_cog.catalog_cache_misses)
+    ai_cog = bot.get_cog('AI Battle')
+    if ai_cog:
+        ratio("ai_team_pool", ai_cog.pool_hits, ai_cog.pool_misses)
+    ratio("collection_index", collection_index.stats["hits"], collection_index.stats["misses"])
+    stats_cog = bot.get_cog('Stat Calculations')
+    if stats_cog:
+        info = stats_cog.stats_cache_info()
+        ratio("stats_for_level", info.hits, info.misses)
+    return ratios
+
+def _active_battles(bot):
+    cz_cog, ai_cog = bot.get_cog('Core Gameplay'), bot.get_cog('AI Battle')
+    return {
+        "pvp": len(cz_cog.active_battles) if cz_cog else 0,
+        "ai": len(ai_cog.active_battles) if ai_cog else 0
+    }
+
+def instrument_bot(bot):
+    """Registers the bot-level gauges."""
+    Gauge("bot_cache_hit_ratio", "Hit ratio of the in-memory caches.", lambda: _cache_ratios(bot), ("cache",))
+    Gauge("bot_active_battles", "Battles currently running.", lambda: _active_battles(bot), ("kind",))
+    Gauge("bot_gateway_latency_seconds", "Discord gateway heartbeat latency.",
+          lambda: bot.latency if math.isfinite(bot.latency) else None)
+    Gauge("bot_guilds", "Guilds the bot is in.", lambda: len(bot.guilds))
+
+def command_started(ctx):
+    ctx.metrics_started_at = time.perf_counter()
+
+def command_finished(ctx):
+    """Counts a finished command by outcome and records its wall time."""
+    name = ctx.command.qualified_name
+    commands_total.inc(name, "error" if ctx.command_failed else "ok")
+    started_at = getattr(ctx, 'metrics_started_at', None)
+    if started_at is not None:
+        command_duration.observe(time.perf_counter() - started_at, name)
@@ -0,0 +1,164 @@
+import sqlite3
+import time
+
+# --- Versioned Schema Migrations ---
+# The schema version lives in SQLite's PRAGMA user_version. Each migration brings the database
+# from the previous version to its own and bumps user_version in the same transaction, so a
+# migration is either fully applied or not at all. Add new migrations at the end with the next
+# version number; never edit one that has shipped.
+
+BACKFILL_BATCH_SIZE = 500  # Rows a backfill touches per transaction
+BACKFILL_PAUSE = 0.01      # Seconds between backfill batches, so other writers can take the lock
+
+MIGRATIONS = []  # (version, description, kind, function, options) in version order
+
+def _register(version, description, kind, options):
+    def decorator(func):
+        expected = MIGRATIONS[-1][0] + 1 if MIGRATIONS else 1
+        if version != expected:
+            raise ValueError(f"Migration {func.__name__} has version {version}, expected {expected}")
+        MIGRATIONS.append((version, description, kind, func, options))
+        return func
+    return decorator
+
+def migration(version, description):
+    """Registers `func(cursor)`, run inside a single transaction."""
+    return _register(version, description, 'schema', {})
+
+def backfill(version, description, table, batch_size=BACKFILL_BATCH_SIZE):
+    """Registers `func(cursor, rows)`, called with batches of `table`'s rows in rowid order.
+
+    Each batch commits on its own together with the last rowid it reached, so a large table
+    never holds the write lock for long, and a backfill interrupted by a restart resumes from
+    its last finished batch instead of starting over. The function must tolerate seeing rows
+    written after the backfill started.
+    """
+    return _register(version, description, 'backfill', {'table': table, 'batch_size': batch_size})
+
+def latest_version():
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+def migrate(database_file):
+    """Applies every migration newer than the database's user_version. Returns the final version."""
+    # isolation_level=None leaves transaction control to us
+    conn = sqlite3.connect(database_file, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    try:
+        current = conn.execute("PRAGMA user_version").fetchone()[0]
+        for version, description, kind, func, options in MIGRATIONS:
+            if version <= current:
+                continue
+            print(f"Updating database schema to v{version}: {description}...")
+            start = time.perf_counter()
+            if kind == 'schema':
+                _run_schema(conn, version, func)
+            else:
+                _run_backfill(conn, version, func, **options)
+            current = version
+            print(f"Schema update complete in {(time.perf_counter() - start) * 1000:.0f}ms.")
+        return current
+    finally:
+        conn.close()
+
+def _run_schema(conn, version, func):
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        func(cursor)
+        cursor.execute(f"PRAGMA user_version = {int(version)}")
+        cursor.execute("COMMIT")
+    except Exception:
+        cursor.execute("ROLLBACK")
+        raise
+
+def _run_backfill(conn, version, func, table, batch_size):
+    cursor = conn.cursor()
+    cursor.execute("CREATE TABLE IF NOT EXISTS migration_progress (version INTEGER PRIMARY KEY, last_rowid INTEGER NOT NULL)")
+    row = cursor.execute("SELECT last_rowid FROM migration_progress WHERE version = ?", (version,)).fetchone()
+    last_rowid = row[0] if row else 0
+    if last_rowid:
+        print(f"Resuming backfill after row {last_rowid}...")
+
+    while True:
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            rows = cursor.execute(f"SELECT rowid AS _rowid, * FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                                  (last_rowid, batch_size)).fetchall()
+            if rows:
+                func(cursor, rows)
+                last_rowid = rows[-1]['_rowid']
+                cursor.execute("INSERT OR REPLACE INTO migration_progress (version, last_rowid) VALUES (?, ?)", (version, last_rowid))
+            else:
+                # Every row is done: finish the migration in the same transaction as the cleanup
+                cursor.execute("DELETE FROM migration_progress WHERE version = ?", (version,))
+                cursor.execute(f"PRAGMA user_version = {int(version)}")
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        if not rows:
+            return
+        time.sleep(BACKFILL_PAUSE)
+
+# --- Migrations ---
+@migration(1, "players and market tables")
+def create_base_tables(cursor):
+    # Databases from before versioning already have these tables, possibly without the
+    # columns added since, so this has to be safe to run against them.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS players (
+            user_id INTEGER PRIMARY KEY,
+            coins INTEGER NOT NULL DEFAULT 500,
+            characters TEXT NOT NULL DEFAULT '{}',
+            inventory TEXT NOT NULL DEFAULT '{}',
+            team TEXT NOT NULL DEFAULT '{}',
+            latest_pull_id INTEGER,
+            selected_character_id INTEGER,
+            next_character_id INTEGER NOT NULL DEFAULT 1,
+            last_xp_gain_time REAL NOT NULL DEFAULT 0,
+            last_daily_date TEXT,
+            daily_streak INTEGER NOT NULL DEFAULT 0,
+            rules_accepted INTEGER NOT NULL DEFAULT 0,
+            last_pull_time REAL NOT NULL DEFAULT 0,
+            rank_points INTEGER NOT NULL DEFAULT 0,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    columns = {column[1] for column in cursor.execute("PRAGMA table_info(players)").fetchall()}
+    for name, definition in [('last_pull_time', "REAL NOT NULL DEFAULT 0"),
+                             ('rank_points', "INTEGER NOT NULL DEFAULT 0"),
+                             ('version', "INTEGER NOT NULL DEFAULT 0")]:
+        if name not in columns:
+            cursor.execute(f"ALTER TABLE players ADD COLUMN {name} {definition}")
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS market (
+            listing_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            seller_id INTEGER NOT NULL,
+            price INTEGER NOT NULL,
+            character_data TEXT NOT NULL,
+            listed_at REAL NOT NULL
+        )
+    ''')
+
+@migration(2, "indexes for the leaderboard and market listings")
+def add_lookup_indexes(cursor):
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_players_rank_points ON players (rank_points)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_market_listed_at ON market (listed_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_market_price ON market (price)")
+
+@migration(3, "player timers table")
+def create_player_timers(cursor):
+    # Cooldowns and timed effects (weekly reward, XP boosters), one row per player/kind/subject.
+    # `subject` narrows a timer to one thing, like the character a booster is on ('' when unused).
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS player_timers (
+            user_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            subject TEXT NOT NULL DEFAULT '',
+            expires_at REAL NOT NULL,
+            value REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, kind, subject)
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_player_timers_expires_at ON player_timers (expires_at)")
@@ -0,0 +1,105 @@
+import discord
+import inspect
+
+class JumpToPageModal(discord.ui.Modal, title="Jump to Page"):
+    """Asks for a page number and moves the paginator there."""
+    page = discord.ui.TextInput(label="Page number", placeholder="e.g. 3", max_length=6)
+
+    def __init__(self, paginator):
+        super().__init__()
+        self.paginator = paginator
+
+    async def on_submit(self, interaction: discord.Interaction):
+        try:
+            page_num = int(self.page.value) - 1
+        except ValueError:
+            await interaction.response.send_message("Please enter a valid page number.", ephemeral=True); return
+        page_num = max(0, min(self.paginator.total_pages - 1, page_num))
+        await self.paginator.show_page(interaction, page_num)
+
+class Paginator(discord.ui.View):
+    """A button-based paginator shared by every paginated listing.
+
+    Pages are rendered lazily by `render_page(page_num)` (sync or async) and each rendered
+    embed is cached, so flipping back and forth costs a single interaction response.
+    """
+    def __init__(self, author, total_pages, render_page, timeout=120.0):
+        super().__init__(timeout=timeout)
+        self.author = author
+        self.total_pages = max(1, total_pages)
+        self.render_page = render_page
+        self.current_page = 0
+        self.message = None
+        self._cache = {}
+        self._update_buttons()
+
+    async def get_page(self, page_num):
+        """Returns the embed for a page, rendering it only the first time it is shown."""
+        if page_num not in self._cache:
+            embed = self.render_page(page_num)
+            if inspect.isawaitable(embed):
+                embed = await embed
+            self._cache[page_num] = embed
+        return self._cache[page_num]
+
+    async def start(self, ctx):
+        """Sends the first page. Single-page listings are sent without any buttons."""
+        embed = await self.get_page(0)
+        if self.total_pages == 1:
+            self.stop()
+            return await ctx.send(embed=embed)
+        self.message = await ctx.send(embed=embed, view=self)
+        return self.message
+
+    async def show_page(self, interaction, page_num):
+        self.current_page = page_num
+        self._update_buttons()
+        await interaction.response.edit_message(embed=await self.get_page(page_num), view=self)
+
+    def _update_buttons(self):
+        at_start = self.current_page == 0
+        at_end = self.current_page >= self.total_pages - 1
+        self.first_page.disabled = at_start
+        self.previous_page.disabled = at_start
+        self.next_page.disabled = at_end
+        self.last_page.disabled = at_end
+        self.jump_to_page.label = f"{self.current_page + 1}/{self.total_pages}"
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        # Only the user who ran the command can flip pages
+        if interaction.user.id != self.author.id:
+            await interaction.response.send_message("This isn't your list!", ephemeral=True)
+            return False
+        return True
+
+    @discord.ui.button(emoji="⏮️", style=discord.ButtonStyle.secondary)
+    async def first_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.show_page(interaction, 0)
+
+    @discord.ui.button(emoji="◀️", style=discord.ButtonStyle.primary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.show_page(interaction, max(0, self.current_page - 1))
+
+    @discord.ui.button(label="1/1", style=discord.ButtonStyle.secondary)
+    async def jump_to_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await interaction.response.send_modal(JumpToPageModal(self))
+
+    @discord.ui.button(emoji="▶️", style=discord.ButtonStyle.primary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.show_page(interaction, min(self.total_pages - 1, self.current_page + 1))
+
+    @discord.ui.button(emoji="⏭️", style=discord.ButtonStyle.secondary)
+    async def last_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.show_page(interaction, self.total_pages - 1)
+
+    async def on_timeout(self):
+        # Release the cached pages and the render callback (and everything it closes over)
+        self._cache.clear()
+        self.render_page = None
+        for item in self.children:
+            item.disabled = True
+        if self.message:
+            try:
+                await self.message.edit(view=self)
+            except discord.HTTPException:
+                pass # Message might have been deleted
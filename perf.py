@@ -0,0 +1,90 @@
+import json
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+
+PERF_WINDOW = 200                     # Recent invocations kept per command for percentiles
+SLOW_LOG_FILE = 'slow_commands.jsonl'
+DEFAULT_SLOW_COMMAND_MS = 1000        # Overridable with SLOW_COMMAND_MS in config.json
+
+# The timings of the command running in the current task; DB and API calls add to it
+_current = ContextVar('perf_invocation', default=None)
+
+# command name -> deque of (wall, db, api) seconds
+samples = defaultdict(lambda: deque(maxlen=PERF_WINDOW))
+slow_threshold = DEFAULT_SLOW_COMMAND_MS / 1000
+
+def add_db_time(elapsed):
+    timings = _current.get()
+    if timings is not None:
+        timings['db'] += elapsed
+
+def add_api_time(elapsed):
+    timings = _current.get()
+    if timings is not None:
+        timings['api'] += elapsed
+
+def instrument_bot(bot):
+    """Times every Discord HTTP request and reads the slow-command threshold from the config."""
+    global slow_threshold
+    slow_threshold = bot.config.get('SLOW_COMMAND_MS', DEFAULT_SLOW_COMMAND_MS) / 1000
+    request = bot.http.request
+
+    async def timed_request(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await request(*args, **kwargs)
+        finally:
+            add_api_time(time.perf_counter() - start)
+
+    bot.http.request = timed_request
+
+def command_started(ctx):
+    ctx.perf = {'start': time.perf_counter(), 'db': 0.0, 'api': 0.0}
+    _current.set(ctx.perf)
+
+def command_finished(ctx):
+    timings = getattr(ctx, 'perf', None)
+    if timings is None:
+        return
+    wall = time.perf_counter() - timings['start']
+    name = ctx.command.qualified_name
+    samples[name].append((wall, timings['db'], timings['api']))
+    if wall >= slow_threshold:
+        _log_slow(ctx, name, wall, timings)
+
+def _log_slow(ctx, name, wall, timings):
+    entry = {
+        "time": time.time(), "command": name,
+        "user_id": ctx.author.id, "guild_id": ctx.guild.id if ctx.guild else None,
+        "args": [repr(arg) for arg in ctx.args[2:]],  # Skip self and ctx
+        "kwargs": {key: repr(value) for key, value in ctx.kwargs.items()},
+        "failed": ctx.command_failed,
+        "wall_ms": round(wall * 1000, 1), "db_ms": round(timings['db'] * 1000, 1), "api_ms": round(timings['api'] * 1000, 1)
+    }
+    try:
+        with open(SLOW_LOG_FILE, 'a') as f:
+            f.write(json.dumps(entry) + "\n")
+    except OSError as e:
+        print(f"❌ Could not write slow command log: {e}")
+
+def _percentile(sorted_values, pct):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct))]
+
+def summary():
+    """Per-command rolling stats in milliseconds: count, p50, p95, p99, max and mean DB/API time."""
+    stats = {}
+    for name, window in samples.items():
+        if not window:
+            continue
+        walls = sorted(wall for wall, _, _ in window)
+        stats[name] = {
+            "count": len(walls),
+            "p50": _percentile(walls, 0.50) * 1000,
+            "p95": _percentile(walls, 0.95) * 1000,
+            "p99": _percentile(walls, 0.99) * 1000,
+            "max": walls[-1] * 1000,
+            "db": sum(db for _, db, _ in window) / len(window) * 1000,
+            "api": sum(api for _, _, api in window) / len(window) * 1000
+        }
+    return stats
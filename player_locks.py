@@ -0,0 +1,48 @@
+import asyncio
+import functools
+import weakref
+from contextlib import asynccontextmanager
+
+# Sent when a compare-and-swap write to a player is rejected because someone else saved them first
+WRITE_CONFLICT_MESSAGE = "⚠️ Your data changed while this command was running, so nothing was saved. Please try again."
+
+# Weak values: a player's lock disappears once nothing is holding or waiting on it,
+# so the registry only ever contains the players that are busy right now.
+_locks = weakref.WeakValueDictionary()
+
+def get_lock(user_id):
+    """Returns the asyncio lock guarding a player's data."""
+    lock = _locks.get(user_id)
+    if lock is None:
+        lock = _locks[user_id] = asyncio.Lock()
+    return lock
+
+@asynccontextmanager
+async def player_lock(*user_ids):
+    """Holds the locks for one or more players.
+
+    Locks are always taken in ascending user ID order, so two commands locking the
+    same pair of players can never deadlock each other.
+    """
+    locks = [get_lock(user_id) for user_id in sorted(set(user_ids))]
+    acquired = []
+    try:
+        for lock in locks:
+            await lock.acquire()
+            acquired.append(lock)
+        yield
+    finally:
+        for lock in reversed(acquired):
+            lock.release()
+
+def serialized(func):
+    """Runs a command while holding the invoking player's lock.
+
+    Only for commands that read, modify and write the player without waiting on user input;
+    commands with prompts lock just the part after the prompt instead.
+    """
+    @functools.wraps(func)
+    async def wrapper(self, ctx, *args, **kwargs):
+        async with player_lock(ctx.author.id):
+            return await func(self, ctx, *args, **kwargs)
+    return wrapper
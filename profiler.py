@@ -0,0 +1,119 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+import asyncio
+from collections import Counter
+
+PROFILE_DIR = 'profiles'
+SAMPLE_INTERVAL = 0.005  # Seconds between stack samples (~200 Hz)
+MAX_PROFILE_SECONDS = 300
+# asyncio's own frames sit under every sample, so they are left out of the rankings
+_ASYNCIO_DIR = os.path.dirname(asyncio.__file__)
+
+def _output_path(kind, extension):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    return os.path.join(PROFILE_DIR, f"{kind}-{time.strftime('%Y%m%d-%H%M%S')}.{extension}")
+
+def _describe(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class SamplingProfiler:
+    """Samples the event loop thread's stack from a background thread.
+
+    The loop itself runs untouched, so the cost is one stack walk per sample on a separate
+    thread, which is cheap enough to run against the live bot.
+    """
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = 0
+        self.stacks = Counter()      # collapsed "outer;...;inner" stack -> samples
+        self.cumulative = Counter()  # function -> samples it was anywhere on the stack
+        self.own = Counter()         # function -> samples it was the innermost frame
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names, app_names = [], set()
+            while frame is not None:
+                name = _describe(frame.f_code)
+                names.append(name)
+                if not frame.f_code.co_filename.startswith(_ASYNCIO_DIR):
+                    app_names.add(name)
+                frame = frame.f_back
+            self.samples += 1
+            self.own[names[0]] += 1
+            self.cumulative.update(app_names)
+            self.stacks[";".join(reversed(names))] += 1
+
+    def write(self):
+        """Writes the collapsed stacks (the format flame graph tools read) and returns the path."""
+        path = _output_path("sample", "txt")
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+    def top(self, limit=10):
+        """(function, cumulative %, own %) for the functions on the stack most often."""
+        if not self.samples:
+            return []
+        return [(name, count / self.samples * 100, self.own[name] / self.samples * 100)
+                for name, count in self.cumulative.most_common(limit)]
+
+class CProfileSession:
+    """Deterministic profiling of the event loop thread with cProfile."""
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def write(self):
+        path = _output_path("cprofile", "prof")
+        self.profile.dump_stats(path)
+        return path
+
+    def top(self, limit=10):
+        """(function, cumulative seconds, call count) sorted by cumulative time."""
+        stats = pstats.Stats(self.profile, stream=io.StringIO())
+        rows = []
+        for (filename, line, name), (_, calls, _, cumulative, _) in stats.stats.items():
+            rows.append((f"{name} ({os.path.basename(filename)}:{line})", cumulative, calls))
+        rows.sort(key=lambda row: row[1], reverse=True)
+        return rows[:limit]
+
+# --- Memory Snapshots ---
+def memory_snapshot(limit=10):
+    """Writes the top allocation sites to a file and returns (path, [(site, size_bytes, count)])."""
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+    stats = snapshot.statistics('lineno')
+    path = _output_path("memory", "txt")
+    with open(path, 'w') as f:
+        for stat in stats[:200]:
+            f.write(f"{stat}\n")
+    top = [(f"{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}", stat.size, stat.count)
+           for stat in stats[:limit]]
+    return path, top
@@ -0,0 +1,173 @@
+import ast
+import asyncio
+import math
+import multiprocessing
+import operator
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# --- Limits ---
+# Together these bound the work any accepted expression can cause, so evaluation never gets
+# anywhere near the timeout in practice; the worker process and timeout are the backstop.
+MAX_EXPRESSION_LENGTH = 200
+MAX_NODES = 64             # AST nodes in the whole expression
+MAX_LITERAL_DIGITS = 30    # Digits in any number typed into the expression
+MAX_EXPONENT = 10_000      # Absolute value of any exponent
+MAX_RESULT_BITS = 1024     # Size of any integer produced along the way (about 308 digits)
+EVAL_TIMEOUT = 2.0         # Seconds before the worker is killed and replaced
+STARTUP_TIMEOUT = 30.0     # Seconds a fresh pool gets to start its workers
+WORKERS = 2
+
+class UnsafeExpression(ValueError):
+    """The expression uses something other than plain arithmetic, or exceeds a limit."""
+
+class EvaluationTimeout(Exception):
+    """The worker didn't finish in time and was replaced."""
+
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Pow: operator.pow,
+}
+_UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+def _check_size(value):
+    if isinstance(value, int) and value.bit_length() > MAX_RESULT_BITS:
+        raise UnsafeExpression("the result is too large")
+    if isinstance(value, float) and not math.isfinite(value):
+        raise UnsafeExpression("the result is too large")
+    return value
+
+def _power(base, exponent):
+    if abs(exponent) > MAX_EXPONENT:
+        raise UnsafeExpression(f"exponents are limited to {MAX_EXPONENT:,}")
+    if isinstance(base, int) and isinstance(exponent, int) and exponent > 0 and abs(base) > 1:
+        # Check the size before computing it: the result has about bit_length * exponent bits
+        if base.bit_length() * exponent > MAX_RESULT_BITS + exponent:
+            raise UnsafeExpression("the result is too large")
+    result = base ** exponent
+    if isinstance(result, complex):
+        raise UnsafeExpression("the result is not a real number")
+    return result
+
+def _multiply(left, right):
+    if isinstance(left, int) and isinstance(right, int) and left.bit_length() + right.bit_length() > MAX_RESULT_BITS + 1:
+        raise UnsafeExpression("the result is too large")
+    return left * right
+
+def _evaluate_node(node):
+    if isinstance(node, ast.Expression):
+        return _evaluate_node(node.body)
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return _check_size(node.value)
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+        return _UNARY_OPERATORS[type(node.op)](_evaluate_node(node.operand))
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        left, right = _evaluate_node(node.left), _evaluate_node(node.right)
+        if isinstance(node.op, ast.Pow):
+            return _check_size(_power(left, right))
+        if isinstance(node.op, ast.Mult):
+            return _check_size(_multiply(left, right))
+        return _check_size(_BINARY_OPERATORS[type(node.op)](left, right))
+    raise UnsafeExpression("only numbers, `+ - * / **` and parentheses are allowed")
+
+def evaluate(expression):
+    """Evaluates an arithmetic expression within the limits above. Runs in the caller's process.
+
+    Raises UnsafeExpression, SyntaxError, ZeroDivisionError or OverflowError for bad input.
+    """
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise UnsafeExpression(f"expressions are limited to {MAX_EXPRESSION_LENGTH} characters")
+    tree = ast.parse(expression.strip(), mode='eval')
+    nodes = list(ast.walk(tree))
+    if len(nodes) > MAX_NODES:
+        raise UnsafeExpression("the expression is too long")
+    for node in nodes:
+        if isinstance(node, ast.Constant) and isinstance(node.value, int) and len(str(abs(node.value))) > MAX_LITERAL_DIGITS:
+            raise UnsafeExpression(f"numbers are limited to {MAX_LITERAL_DIGITS} digits")
+    return _evaluate_node(tree)
+
+# --- Worker Pool ---
+# Evaluation happens in worker processes, so even an expression that slipped past the limits
+# could only tie up a worker, never the bot's event loop. 'spawn' keeps workers from inheriting
+# the bot's threads and locks the way fork would.
+_pool = None
+_pool_ready = None  # Task that finishes once the current pool's workers are running
+
+async def _start_workers(pool):
+    loop = asyncio.get_running_loop()
+    # Each submission that finds no idle worker starts another process, so this starts all of them
+    await asyncio.gather(*(loop.run_in_executor(pool, evaluate, "0") for _ in range(WORKERS)))
+
+def _get_pool():
+    """Returns the current pool, creating it and starting its workers if needed. Needs a running loop."""
+    global _pool, _pool_ready
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        _pool_ready = asyncio.ensure_future(_start_workers(_pool))
+        # Nobody may await a warm-up started from cog_load; retrieve its error so it isn't logged as unhandled
+        _pool_ready.add_done_callback(lambda task: task.cancelled() or task.exception())
+    return _pool
+
+def _kill_pool(pool):
+    """Throws away a pool, terminating its workers even if they are mid-evaluation."""
+    global _pool, _pool_ready
+    if pool is None:
+        return
+    if _pool is pool:
+        _pool = None
+        if _pool_ready is not None:
+            _pool_ready.cancel()
+        _pool_ready = None
+    for process in list((pool._processes or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def warm_up():
+    """Starts the worker processes in the background, so the first evaluation doesn't wait for them."""
+    _get_pool()
+    return _pool_ready
+
+async def _wait_until_ready(pool, ready):
+    # Spawned workers re-import the bot's modules, which can take longer than EVAL_TIMEOUT.
+    # That startup gets its own limit and isn't counted against the evaluation.
+    try:
+        await asyncio.wait_for(asyncio.shield(ready), STARTUP_TIMEOUT)
+    except asyncio.CancelledError:
+        if not ready.cancelled():
+            raise  # The command itself was cancelled
+        # Another evaluation's timeout threw this pool away while it was starting
+        raise EvaluationTimeout("the calculator was restarted, please try again")
+    except (asyncio.TimeoutError, BrokenProcessPool):
+        _kill_pool(pool)
+        raise EvaluationTimeout("the calculator could not start, please try again")
+
+async def evaluate_async(expression, timeout=EVAL_TIMEOUT):
+    """Evaluates an expression in a worker process, giving up after `timeout` seconds.
+
+    The timeout starts once the pool's workers are running.
+    """
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise UnsafeExpression(f"expressions are limited to {MAX_EXPRESSION_LENGTH} characters")
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    await _wait_until_ready(pool, _pool_ready)
+    try:
+        return await asyncio.wait_for(loop.run_in_executor(pool, evaluate, expression), timeout)
+    except asyncio.TimeoutError:
+        _kill_pool(pool)
+        # Start the replacement workers now rather than on the next call
+        _get_pool()
+        raise EvaluationTimeout(f"evaluation took longer than {timeout:g}s")
+    except BrokenProcessPool:
+        # Another evaluation's timeout killed the workers under this one
+        _kill_pool(pool)
+        raise EvaluationTimeout("the calculator was restarted, please try again")
+
+def shutdown():
+    _kill_pool(_pool)
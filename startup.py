@@ -0,0 +1,59 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# main.py imports this module first, so this is as close to process start as we can measure
+PROCESS_START = time.perf_counter()
+
+# [phase, depth, seconds] in the order the phases started; nested phases have a higher depth
+phases = []
+first_command = None  # Seconds from process start until the first command finished
+finished = False      # Set on first ready; later cog (re)loads and file parses aren't startup
+
+# Phases started inside another phase (e.g. parsing a file while a cog loads) are nested under it.
+# Cogs load concurrently, so the depth has to be tracked per task.
+_depth = ContextVar('startup_depth', default=0)
+
+@contextmanager
+def trace(phase):
+    """Times a startup phase. Does nothing once startup has finished."""
+    if finished:
+        yield
+        return
+    depth = _depth.get()
+    entry = [phase, depth, None]
+    phases.append(entry)
+    token = _depth.set(depth + 1)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        entry[2] = time.perf_counter() - start
+        _depth.reset(token)
+
+def record(phase, seconds):
+    """Adds a phase that was timed some other way, like waiting on the gateway."""
+    if not finished:
+        phases.append([phase, 0, seconds])
+
+def finish():
+    """Stops recording phases, so the breakdown stays the one from startup."""
+    global finished
+    finished = True
+
+def command_finished():
+    global first_command
+    if first_command is None:
+        first_command = time.perf_counter() - PROCESS_START
+        print(f"⏱️ First command finished {first_command * 1000:.0f}ms after startup")
+
+def since_start():
+    return time.perf_counter() - PROCESS_START
+
+def report():
+    """The traced phases as indented lines, in milliseconds."""
+    lines = []
+    for phase, depth, seconds in phases:
+        duration = f"{seconds * 1000:.1f}ms" if seconds is not None else "running"
+        lines.append(f"{'  ' * depth}{phase}: {duration}")
+    return lines
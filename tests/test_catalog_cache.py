@@ -0,0 +1,48 @@
+"""Checks the filtered character catalog LRU in the Player Commands cog.
+
+    python -m unittest tests.test_catalog_cache
+"""
+import unittest
+
+from cogs.commands import CharacterManagement
+
+def stats(value):
+    return {key: value for key in ('ATK', 'DEF', 'SPD', 'SP_ATK', 'SP_DEF', 'HP')}
+
+CHARACTERS = {
+    "Naruto": stats(10),
+    "Naruto Uzumaki": stats(30),
+    "Uzumaki Naruto": stats(20),
+    "Sasuke Uchiha": stats(40),
+}
+
+class CatalogCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.cog = CharacterManagement(bot=None)
+        self.cog.characters = CHARACTERS
+        self.cog._build_catalog_views()
+
+    def names(self, sort_key, filters):
+        return [name for name, _ in self.cog._get_filtered_catalog(sort_key, filters)]
+
+    def test_queries_differing_only_by_quoting_are_cached_separately(self):
+        quoted = 'name:"naruto uzumaki"'
+        unquoted = 'name:naruto uzumaki'
+        # Unquoted, `uzumaki` is a separate term, so word order no longer matters
+        for first in (quoted, unquoted):
+            self.setUp()
+            self.names('name', first)
+            self.assertEqual(self.names('name', quoted), ["Naruto Uzumaki"])
+            self.assertEqual(self.names('name', unquoted), ["Naruto Uzumaki", "Uzumaki Naruto"])
+
+    def test_reordered_filters_share_an_entry(self):
+        self.assertEqual(self.names('atk', 'name:naruto atk>15'), ["Naruto Uzumaki", "Uzumaki Naruto"])
+        self.assertEqual(self.names('atk', 'atk>15 name:naruto'), ["Naruto Uzumaki", "Uzumaki Naruto"])
+        self.assertEqual((self.cog.catalog_cache_misses, self.cog.catalog_cache_hits), (1, 1))
+
+    def test_sort_key_is_part_of_the_key(self):
+        self.assertEqual(self.names('name', 'name:naruto'), ["Naruto", "Naruto Uzumaki", "Uzumaki Naruto"])
+        self.assertEqual(self.names('hp', 'name:naruto'), ["Naruto Uzumaki", "Uzumaki Naruto", "Naruto"])
+
+if __name__ == '__main__':
+    unittest.main()
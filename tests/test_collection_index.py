@@ -0,0 +1,156 @@
+"""Checks the per-player collection index against plain scans of the collection.
+
+    python -m unittest tests.test_collection_index
+"""
+import random
+import unittest
+
+import collection_index
+from collection_index import CollectionIndex
+from cogs.commands import CharacterManagement
+
+NAMES = ["Naruto", "Naruto Uzumaki", "Sasuke Uchiha", "Sakura Haruno", "Kakashi Hatake"]
+
+def character(name, level, iv):
+    return {"name": name, "level": level, "iv": iv}
+
+def random_character(rng):
+    return character(rng.choice(NAMES), rng.randint(1, 100), round(rng.uniform(0, 100), 2))
+
+def player(characters, version=0, user_id=1):
+    return {"user_id": user_id, "characters": characters, "next_character_id": max(characters, default=0) + 1, "version": version}
+
+class IndexTestCase(unittest.TestCase):
+    def assertMatchesCollection(self, index, characters):
+        """Every view of the index must equal what a full scan and sort of the collection gives."""
+        self.assertEqual(len(index), len(characters))
+        self.assertEqual(index.ordered_ids('id'), sorted(characters))
+        self.assertEqual(index.ordered_ids('level'), sorted(characters, key=lambda cid: (-characters[cid]['level'], cid)))
+        self.assertEqual(index.ordered_ids('iv'), sorted(characters, key=lambda cid: (-characters[cid]['iv'], cid)))
+        for needle in ("naruto", "NARUTO", "uchiha", "a", "zzz"):
+            expected = sorted(cid for cid, c in characters.items() if needle.lower() in c['name'].lower())
+            self.assertEqual(index.find(needle), expected, needle)
+
+class CollectionIndexTests(IndexTestCase):
+    def setUp(self):
+        self.rng = random.Random(3)
+        self.characters = {cid: random_character(self.rng) for cid in range(1, 301)}
+
+    def test_build(self):
+        self.assertMatchesCollection(CollectionIndex(1, self.characters, 301), self.characters)
+
+    def test_string_keys_are_normalized(self):
+        index = CollectionIndex(1, {str(cid): c for cid, c in self.characters.items()}, 301)
+        self.assertMatchesCollection(index, self.characters)
+
+    def test_add_remove_update(self):
+        index = CollectionIndex(1, self.characters, 301)
+        next_id = 301
+        for _ in range(500):
+            action = self.rng.random()
+            if action < 0.4:
+                self.characters[next_id] = random_character(self.rng)
+                index.add(next_id, self.characters[next_id])
+                next_id += 1
+            elif action < 0.7 and self.characters:
+                cid = self.rng.choice(list(self.characters))
+                del self.characters[cid]
+                index.remove(cid)
+            elif self.characters:
+                cid = self.rng.choice(list(self.characters))
+                self.characters[cid]['level'] = self.rng.randint(1, 100)
+                self.characters[cid]['iv'] = round(self.rng.uniform(0, 100), 2)
+                index.update(cid, self.characters[cid])
+        self.assertMatchesCollection(index, self.characters)
+        self.assertEqual(index.next_character_id, next_id)
+
+    def test_find_returns_every_substring_match(self):
+        index = CollectionIndex(1, {1: character("Naruto", 5, 50), 2: character("Naruto Uzumaki", 5, 50)}, 3)
+        self.assertEqual(index.find("naruto"), [1, 2])
+        self.assertEqual(index.find("uzumaki"), [2])
+
+    def test_sync(self):
+        index = CollectionIndex(1, self.characters, 301)
+        for cid in (4, 9, 27):
+            self.characters[cid]['level'] = 100 - self.characters[cid]['level']
+        del self.characters[10]
+        self.characters[400] = random_character(self.rng)
+        index.sync(self.characters, 5)
+        self.assertMatchesCollection(index, self.characters)
+        self.assertEqual(index.version, 5)
+
+    def test_sync_after_most_of_the_collection_changed(self):
+        index = CollectionIndex(1, self.characters, 301)
+        for cid in list(self.characters)[:250]:
+            del self.characters[cid]
+        index.sync(self.characters, 1)
+        self.assertMatchesCollection(index, self.characters)
+
+class GetIndexTests(IndexTestCase):
+    def setUp(self):
+        collection_index.invalidate()
+        self.addCleanup(collection_index.invalidate)
+        self.characters = {1: character("Naruto", 10, 50), 2: character("Sasuke Uchiha", 20, 60)}
+
+    def test_write_that_skipped_the_index_is_picked_up(self):
+        index = collection_index.get_index(player(self.characters, version=3))
+        # A level changed and was saved without telling the index; only the version shows it
+        self.characters[1]['level'] = 90
+        misses = collection_index.stats["misses"]
+        self.assertIs(collection_index.get_index(player(self.characters, version=4)), index)
+        self.assertEqual(collection_index.stats["misses"], misses + 1)
+        self.assertMatchesCollection(index, self.characters)
+
+    def test_helpers_keep_the_index_current(self):
+        index = collection_index.get_index(player(self.characters, version=3))
+        self.characters[3] = character("Kakashi Hatake", 50, 70)
+        collection_index.character_added(1, 3, self.characters[3], version=4)
+        self.characters[1]['level'] = 95
+        collection_index.character_updated(1, 1, self.characters[1], version=5)
+        del self.characters[2]
+        collection_index.character_removed(1, 2, version=6)
+
+        misses = collection_index.stats["misses"]
+        self.assertIs(collection_index.get_index(player(self.characters, version=6)), index)
+        self.assertEqual(collection_index.stats["misses"], misses)
+        self.assertMatchesCollection(index, self.characters)
+
+    def test_helper_after_a_missed_write_leaves_the_index_to_resync(self):
+        index = collection_index.get_index(player(self.characters, version=3))
+        self.characters[1]['level'] = 90  # Saved as version 4 without telling the index
+        self.characters[3] = character("Kakashi Hatake", 50, 70)
+        collection_index.character_added(1, 3, self.characters[3], version=5)
+        self.assertEqual(index.version, 3)
+        self.assertMatchesCollection(collection_index.get_index(player(self.characters, version=5)), self.characters)
+
+class FakeContext:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, content=None, **kwargs):
+        self.sent.append(content)
+
+class FindCharacterTests(unittest.IsolatedAsyncioTestCase):
+    """`!sell` and `!select` resolve names through _find_character_from_input."""
+    async def asyncSetUp(self):
+        collection_index.invalidate()
+        self.cog = CharacterManagement(bot=None)
+        self.player = player({1: character("Naruto", 5, 50), 2: character("Naruto Uzumaki", 5, 50)}, user_id=42)
+
+    async def asyncTearDown(self):
+        collection_index.invalidate()
+
+    async def test_ambiguous_name_asks_instead_of_picking_one(self):
+        ctx = FakeContext()
+        self.assertIsNone(await self.cog._find_character_from_input(ctx, self.player, "naruto"))
+        self.assertIn("`1` (Naruto)", ctx.sent[0])
+        self.assertIn("`2` (Naruto Uzumaki)", ctx.sent[0])
+
+    async def test_unique_name_and_id(self):
+        ctx = FakeContext()
+        self.assertEqual(await self.cog._find_character_from_input(ctx, self.player, "uzumaki"), 2)
+        self.assertEqual(await self.cog._find_character_from_input(ctx, self.player, "1"), 1)
+        self.assertEqual(ctx.sent, [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+"""Checks lazy cog loading: which commands get placeholders, and loading on first use.
+
+    python -m unittest tests.test_lazy_cogs
+"""
+import unittest
+from unittest import mock
+
+import discord
+from discord.ext import commands
+
+import lazy_cogs
+import main
+from benchmarks import temporary_database
+
+class ScanTests(unittest.TestCase):
+    def test_subcommands_are_not_scanned_as_top_level_commands(self):
+        found = lazy_cogs.scan_commands('cogs/matchmaking.py')
+        self.assertEqual([(cog, spec['name'], spec['aliases']) for cog, spec in found], [("Matchmaking", "queue", ["q"])])
+
+    def test_command_names_aliases_and_cog_name(self):
+        found = {spec['name']: (cog, spec) for cog, spec in lazy_cogs.scan_commands('cogs/utils.py')}
+        self.assertEqual(set(found), {"afk", "calculator"})
+        cog, spec = found["calculator"]
+        self.assertEqual((cog, spec['aliases']), ("Utils", ["calc"]))
+        self.assertTrue(spec['help'].startswith("!calc"))
+
+class LoadTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.database = temporary_database()
+        self.database.__enter__()
+        self.bot = main.CZBot(command_prefix='!', intents=discord.Intents.none(), help_command=None)
+        self.bot.config = {}
+        self.bot.lazy_extensions = lazy_cogs.register(self.bot, ["abilities", "events"])
+
+    async def asyncTearDown(self):
+        for extension in list(self.bot.extensions):
+            await self.bot.unload_extension(extension)
+        self.database.__exit__(None, None, None)
+
+    async def test_stubs_stand_in_until_first_use(self):
+        stub = self.bot.get_command("abilities")
+        self.assertEqual((stub.lazy_extension, stub.lazy_cog_name, stub.cog), ("cogs.abilities", "Abilities", None))
+
+        await self.bot.load_deferred("cogs.abilities")
+        real = self.bot.get_command("abilities")
+        self.assertEqual(real.cog_name, "Abilities")
+        self.assertFalse(hasattr(real, 'lazy_extension'))
+        self.assertNotIn("cogs.abilities", self.bot.lazy_extensions)
+        # The other deferred cog is untouched
+        self.assertTrue(hasattr(self.bot.get_command("events"), 'lazy_extension'))
+
+    async def test_failed_load_keeps_the_stubs(self):
+        with mock.patch.object(commands.Bot, 'load_extension', side_effect=commands.ExtensionFailed("cogs.events", RuntimeError("boom"))):
+            await self.bot.load_deferred("cogs.events")
+        self.assertIn("cogs.events", self.bot.lazy_extensions)
+        self.assertEqual(self.bot.get_command("events").lazy_extension, "cogs.events")
+
+        # The next use tries again
+        await self.bot.load_deferred("cogs.events")
+        self.assertEqual(self.bot.get_command("events").cog_name, "Events")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+"""Checks that applying level potions in bulk matches drinking them one at a time.
+
+    python -m unittest tests.test_level_potions
+"""
+import math
+import random
+import unittest
+from collections import Counter
+
+from cogs.shop import apply_level_potions, POTION_HIGH_LEVEL, MAX_LEVEL
+
+# Enough to catch a skewed roll: each case is compared within three times its own sampling noise,
+# and the fixed seeds keep the outcome the same on every run
+SAMPLES = 5_000
+CASES = [(1, 1), (1, 10), (1, 30), (40, 5), (48, 3), (49, 60), (1, 1000), (70, 20), (99, 5)]
+
+def potion_loop(level, amount):
+    """The original implementation: roll every potion in turn."""
+    for _ in range(amount):
+        if level >= MAX_LEVEL:
+            break
+        increase = random.randint(1, 3) if level < POTION_HIGH_LEVEL else 1
+        level = min(MAX_LEVEL, level + increase)
+    return level
+
+def exact_loop_distribution(level, amount):
+    """The exact distribution of potion_loop's result, by dynamic programming over the potions."""
+    current = {level: 1.0}
+    for _ in range(amount):
+        following = Counter()
+        for lvl, p in current.items():
+            if lvl >= MAX_LEVEL:
+                following[lvl] += p
+            elif lvl < POTION_HIGH_LEVEL:
+                for increase in (1, 2, 3):
+                    following[min(MAX_LEVEL, lvl + increase)] += p / 3
+            else:
+                following[lvl + 1] += p
+        current = following
+    return current
+
+class LevelPotionDistributionTest(unittest.TestCase):
+    def assertSamplesMatch(self, sample, expected):
+        observed = Counter(sample() for _ in range(SAMPLES))
+        self.assertLessEqual(set(observed), set(expected), "produced a level the loop never can")
+
+        distance = sum(abs(observed[lvl] / SAMPLES - p) for lvl, p in expected.items()) / 2
+        # Sampling alone gives an expected distance of about sum(sqrt(2p(1-p) / (pi n))) / 2
+        noise = sum(math.sqrt(2 * p * (1 - p) / (math.pi * SAMPLES)) for p in expected.values()) / 2
+        self.assertLess(distance, 3 * noise + 1e-9, f"total variation distance {distance:.4f}, noise ~{noise:.4f}")
+
+    def test_matches_drinking_one_at_a_time(self):
+        random.seed(1234)
+        for level, amount in CASES:
+            with self.subTest(level=level, amount=amount):
+                self.assertSamplesMatch(lambda: apply_level_potions(level, amount), exact_loop_distribution(level, amount))
+
+    def test_sampled_loop_agrees_with_exact_distribution(self):
+        # Guards the reference itself: the DP has to describe what the loop actually does
+        random.seed(99)
+        for level, amount in [(1, 10), (48, 3)]:
+            with self.subTest(level=level, amount=amount):
+                self.assertSamplesMatch(lambda: potion_loop(level, amount), exact_loop_distribution(level, amount))
+
+    def test_bounds(self):
+        self.assertEqual(apply_level_potions(MAX_LEVEL, 5), MAX_LEVEL)
+        self.assertEqual(apply_level_potions(1, 10**9), MAX_LEVEL)
+        self.assertEqual(apply_level_potions(60, 7), 67)
+        self.assertEqual(apply_level_potions(10, 0), 10)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+"""Checks that market purchases stay atomic when buyers race, against a throwaway database.
+
+    python -m unittest tests.test_market
+
+A small version of benchmarks/market_stress.py, which runs far more buyers and rounds.
+"""
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import database as db
+from benchmarks import temporary_database
+from benchmarks.market_stress import run_round, total_coins, SELLER_ID, STARTING_COINS
+
+BUYERS = 40
+ROUNDS = 3
+
+def set_coins(user_id, coins):
+    player = db.get_player(user_id)
+    player['coins'] = coins
+    db.update_player(user_id, player)
+
+def list_character(seller_id, character, price):
+    seller = db.get_player(seller_id)
+    char_id = seller['next_character_id']
+    seller['characters'][char_id] = character
+    seller['next_character_id'] += 1
+    db.update_player(seller_id, seller)
+    status, listing = db.add_market_listing(seller_id, char_id, price)
+    assert status == "ok", status
+    return listing['listing_id']
+
+def run_together(*calls):
+    """Runs the calls at the same moment from separate threads and returns their results in order."""
+    start = threading.Barrier(len(calls))
+    def run(call):
+        start.wait()
+        return call()
+    with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+        return list(pool.map(run, calls))
+
+class MarketConcurrencyTests(unittest.TestCase):
+    def setUp(self):
+        self.database = temporary_database()
+        self.database.__enter__()
+        self.addCleanup(self.database.__exit__, None, None, None)
+        set_coins(SELLER_ID, STARTING_COINS)
+
+    def test_racing_buyers_get_one_winner_and_coins_are_conserved(self):
+        buyer_ids = list(range(100, 100 + BUYERS))
+        for buyer_id in buyer_ids:
+            set_coins(buyer_id, STARTING_COINS)
+        for round_number in range(1, ROUNDS + 1):
+            _, statuses, failures = run_round(round_number, buyer_ids)
+            self.assertEqual(failures, [], f"round {round_number}: {dict(statuses)}")
+
+    def test_buyer_cannot_spend_the_same_coins_twice(self):
+        buyer_id = 200
+        set_coins(buyer_id, 300)
+        first = list_character(SELLER_ID, {"name": "Gon", "level": 1, "iv": 50.0}, 300)
+        second = list_character(SELLER_ID, {"name": "Killua", "level": 1, "iv": 50.0}, 300)
+        coins_before = total_coins()
+
+        results = run_together(lambda: db.buy_market_listing(first, buyer_id), lambda: db.buy_market_listing(second, buyer_id))
+
+        self.assertEqual(sorted(status for status, _ in results), ["insufficient_funds", "ok"])
+        buyer = db.get_player(buyer_id)
+        self.assertEqual(buyer['coins'], 0)
+        self.assertEqual(len(buyer['characters']), 1)
+        self.assertEqual(total_coins(), coins_before)
+
+    def test_buy_racing_the_seller_removing_the_listing(self):
+        buyer_id = 300
+        set_coins(buyer_id, STARTING_COINS)
+        character = {"name": "Hisoka", "level": 7, "iv": 90.0}
+        listing_id = list_character(SELLER_ID, character, 500)
+
+        (status, _), returned = run_together(lambda: db.buy_market_listing(listing_id, buyer_id),
+                                             lambda: db.return_market_listing(listing_id, SELLER_ID))
+
+        # Exactly one side gets the character, and only a sale moves coins
+        self.assertNotEqual(status == "ok", returned is not None)
+        owners = [user_id for user_id in (buyer_id, SELLER_ID) if character in db.get_player(user_id)['characters'].values()]
+        self.assertEqual(owners, [buyer_id] if status == "ok" else [SELLER_ID])
+        self.assertEqual(db.get_player(buyer_id)['coins'], STARTING_COINS - 500 if status == "ok" else STARTING_COINS)
+        self.assertIsNone(db.get_market_listing(listing_id))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+"""Checks the metrics that are updated from more than one thread.
+
+    python -m unittest tests.test_metrics
+"""
+import sys
+import threading
+import unittest
+
+import metrics
+
+THREADS = 8
+CALLS = 5_000
+
+class TimedDbTests(unittest.TestCase):
+    def test_calls_from_many_threads_are_all_counted(self):
+        @metrics.timed_db
+        def threaded_metrics_test_query():
+            pass
+
+        name = ("threaded_metrics_test_query",)
+        start = threading.Barrier(THREADS)
+        def run():
+            start.wait()
+            for i in range(CALLS):
+                threaded_metrics_test_query()
+                if i % 100 == 0:
+                    metrics.render()  # A scrape racing the updates must not fail
+
+        # Switch threads far more often than usual, so unguarded updates would actually lose counts
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, interval)
+        threads = [threading.Thread(target=run) for _ in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(metrics.db_queries.values[name], THREADS * CALLS)
+        series = metrics.db_duration.values[name]
+        self.assertEqual(series[-1], THREADS * CALLS)
+        self.assertLessEqual(sum(series[:-2]), THREADS * CALLS)
+
+    def test_nested_calls_count_each_function(self):
+        @metrics.timed_db
+        def inner_metrics_test_query():
+            pass
+
+        @metrics.timed_db
+        def outer_metrics_test_query():
+            inner_metrics_test_query()
+
+        outer_metrics_test_query()
+        self.assertEqual(metrics.db_queries.values[("outer_metrics_test_query",)], 1)
+        self.assertEqual(metrics.db_queries.values[("inner_metrics_test_query",)], 1)
+
+if __name__ == '__main__':
+    unittest.main()
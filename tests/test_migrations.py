@@ -0,0 +1,162 @@
+"""Checks schema upgrades from pre-versioning databases and resuming an interrupted backfill.
+
+    python -m unittest tests.test_migrations
+"""
+import os
+import sqlite3
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+import migrations
+
+# The players table as the bot created it before schema versioning, and an older one from before
+# pull cooldowns and ranked battles
+BASELINE_PLAYERS = '''
+    CREATE TABLE players (
+        user_id INTEGER PRIMARY KEY,
+        coins INTEGER NOT NULL DEFAULT 500,
+        characters TEXT NOT NULL DEFAULT '{}',
+        inventory TEXT NOT NULL DEFAULT '{}',
+        team TEXT NOT NULL DEFAULT '{}',
+        latest_pull_id INTEGER,
+        selected_character_id INTEGER,
+        next_character_id INTEGER NOT NULL DEFAULT 1,
+        last_xp_gain_time REAL NOT NULL DEFAULT 0,
+        last_daily_date TEXT,
+        daily_streak INTEGER NOT NULL DEFAULT 0,
+        rules_accepted INTEGER NOT NULL DEFAULT 0
+        {extra_columns}
+    )
+'''
+BASELINE_MARKET = '''
+    CREATE TABLE market (
+        listing_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        seller_id INTEGER NOT NULL,
+        price INTEGER NOT NULL,
+        character_data TEXT NOT NULL,
+        listed_at REAL NOT NULL
+    )
+'''
+
+def migrate_quietly(path):
+    with redirect_stdout(None):
+        return migrations.migrate(path)
+
+class MigrationTestCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'test.db')
+
+    def query(self, sql, params=()):
+        conn = sqlite3.connect(self.path)
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def user_version(self):
+        return self.query("PRAGMA user_version")[0][0]
+
+class UpgradeTests(MigrationTestCase):
+    def create_baseline(self, extra_columns):
+        conn = sqlite3.connect(self.path)
+        conn.execute(BASELINE_PLAYERS.replace("{extra_columns}", extra_columns))
+        conn.execute(BASELINE_MARKET)
+        conn.execute("INSERT INTO players (user_id, coins, characters) VALUES (7, 1234, '{\"1\": {\"name\": \"Gon\"}}')")
+        conn.execute("INSERT INTO market (seller_id, price, character_data, listed_at) VALUES (7, 100, '{}', 1.0)")
+        conn.commit()
+        conn.close()
+
+    def assertCurrent(self):
+        self.assertEqual(self.user_version(), migrations.latest_version())
+        columns = {row[1] for row in self.query("PRAGMA table_info(players)")}
+        self.assertTrue({'last_pull_time', 'rank_points', 'version'} <= columns)
+        indexes = {row[0] for row in self.query("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        self.assertTrue({'idx_players_rank_points', 'idx_market_listed_at', 'idx_market_price', 'idx_player_timers_expires_at'} <= indexes)
+        # Existing rows keep their data and get the new columns' defaults
+        self.assertEqual(self.query("SELECT coins, characters, rank_points, version FROM players WHERE user_id = 7"),
+                         [(1234, '{"1": {"name": "Gon"}}', 0, 0)])
+        self.assertEqual(self.query("SELECT COUNT(*) FROM market"), [(1,)])
+
+    def test_upgrade_from_baseline_schema(self):
+        self.create_baseline(", last_pull_time REAL NOT NULL DEFAULT 0, rank_points INTEGER NOT NULL DEFAULT 0")
+        self.assertEqual(migrate_quietly(self.path), migrations.latest_version())
+        self.assertCurrent()
+
+    def test_upgrade_from_before_pull_cooldowns(self):
+        self.create_baseline("")
+        migrate_quietly(self.path)
+        self.assertCurrent()
+
+    def test_fresh_database(self):
+        migrate_quietly(self.path)
+        self.assertEqual(self.user_version(), migrations.latest_version())
+        self.assertEqual(self.query("SELECT COUNT(*) FROM players"), [(0,)])
+
+    def test_current_database_is_left_alone(self):
+        migrate_quietly(self.path)
+        with mock.patch.object(migrations, '_run_schema') as run_schema, mock.patch.object(migrations, '_run_backfill') as run_backfill:
+            migrate_quietly(self.path)
+        run_schema.assert_not_called()
+        run_backfill.assert_not_called()
+
+class Interrupted(Exception):
+    pass
+
+class BackfillTests(MigrationTestCase):
+    ROWS = 1_050
+    BATCH_SIZE = 100
+
+    def setUp(self):
+        super().setUp()
+        migrate_quietly(self.path)
+        conn = sqlite3.connect(self.path)
+        conn.executemany("INSERT INTO players (user_id, coins) VALUES (?, ?)", [(user_id, user_id) for user_id in range(1, self.ROWS + 1)])
+        conn.commit()
+        conn.close()
+
+        # A test-only backfill on top of the real migrations
+        self.version = migrations.latest_version() + 1
+        self.seen = []
+        self.fail_after_batches = None
+        self.migrations = list(migrations.MIGRATIONS)
+        patcher = mock.patch.multiple(migrations, MIGRATIONS=self.migrations, BACKFILL_PAUSE=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        @migrations.backfill(self.version, "double every balance", "players", batch_size=self.BATCH_SIZE)
+        def double_coins(cursor, rows):
+            if self.fail_after_batches is not None and len(self.seen) >= self.fail_after_batches * self.BATCH_SIZE:
+                raise Interrupted()
+            cursor.executemany("UPDATE players SET coins = coins * 2 WHERE rowid = ?", [(row['_rowid'],) for row in rows])
+            self.seen.extend(row['user_id'] for row in rows)
+
+    def assertEveryRowDoubledOnce(self):
+        self.assertEqual(sorted(self.seen), list(range(1, self.ROWS + 1)))
+        self.assertEqual(self.query("SELECT COUNT(*) FROM players WHERE coins != user_id * 2"), [(0,)])
+
+    def test_backfill_runs_in_batches(self):
+        migrate_quietly(self.path)
+        self.assertEveryRowDoubledOnce()
+        self.assertEqual(self.user_version(), self.version)
+        self.assertEqual(self.query("SELECT COUNT(*) FROM migration_progress"), [(0,)])
+
+    def test_interrupted_backfill_resumes_where_it_stopped(self):
+        self.fail_after_batches = 4
+        with self.assertRaises(Interrupted):
+            migrate_quietly(self.path)
+        # The finished batches are committed and recorded; the failed one left no trace
+        self.assertEqual(self.user_version(), self.version - 1)
+        self.assertEqual(self.query("SELECT last_rowid FROM migration_progress WHERE version = ?", (self.version,)), [(400,)])
+        self.assertEqual(self.query("SELECT COUNT(*) FROM players WHERE coins = user_id * 2"), [(400,)])
+
+        self.fail_after_batches = None
+        migrate_quietly(self.path)
+        self.assertEveryRowDoubledOnce()
+        self.assertEqual(self.user_version(), self.version)
+
+if __name__ == '__main__':
+    unittest.main()
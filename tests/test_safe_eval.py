@@ -0,0 +1,96 @@
+"""Fuzzes the calculator's evaluator with random and adversarial expressions.
+
+    python -m unittest tests.test_safe_eval
+
+Every expression must finish quickly in-process (so the worker timeout is only ever a
+backstop) and end either in a finite int or float or in one of the documented errors.
+"""
+import asyncio
+import math
+import random
+import time
+import unittest
+
+import safe_eval
+
+FUZZ_EXPRESSIONS = 20_000
+SLOW_EVALUATION = 0.05  # Seconds; the limits keep real evaluations orders of magnitude below this
+EXPECTED_ERRORS = (safe_eval.UnsafeExpression, SyntaxError, ZeroDivisionError, OverflowError)
+
+TOKENS = ['9', '99', '2', '0', '1.5', '1e308', '9' * 30, '**', '*', '/', '+', '-', '(', ')', '**-', '.', 'e', ' ']
+
+ADVERSARIAL = [
+    '9**9**9**9', '2**10000', '(9**30)**(9**30)', '9' * 30 + '**' + '9' * 4, '-(' * 40 + '1' + ')' * 40,
+    '(' * 40 + '1' + ')' * 40, '2**1024*2**1024', '10.0**400', '(-8)**(1/3)', '1e308*10', '1e999',
+    '-1e999', '1/0', '3**1000', '2**-10000', '*'.join(['9' * 30] * 30)[:200],
+    '__import__("os")', '().__class__', 'x', '[1]*9**9', '"a"*9', 'lambda: 1', '1 if 1 else 2',
+]
+
+def check_result(test, expression, result):
+    test.assertIn(type(result), (int, float), expression)
+    if isinstance(result, float):
+        test.assertTrue(math.isfinite(result), expression)
+    else:
+        test.assertLessEqual(result.bit_length(), safe_eval.MAX_RESULT_BITS, expression)
+
+class EvaluateTests(unittest.TestCase):
+    def run_expression(self, expression):
+        start = time.perf_counter()
+        try:
+            check_result(self, expression, safe_eval.evaluate(expression))
+        except EXPECTED_ERRORS:
+            pass
+        self.assertLess(time.perf_counter() - start, SLOW_EVALUATION, expression)
+
+    def test_random_expressions(self):
+        rng = random.Random(1)
+        for _ in range(FUZZ_EXPRESSIONS):
+            expression = ''.join(rng.choice(TOKENS) for _ in range(rng.randint(1, 40)))
+            self.run_expression(expression)
+
+    def test_adversarial_expressions(self):
+        for expression in ADVERSARIAL:
+            self.run_expression(expression)
+
+    def test_arithmetic(self):
+        self.assertEqual(safe_eval.evaluate('2 + 3 * 4'), 14)
+        self.assertEqual(safe_eval.evaluate('(2 + 3) * 4'), 20)
+        self.assertEqual(safe_eval.evaluate('2 ** 10'), 1024)
+        self.assertEqual(safe_eval.evaluate('-7 / 2'), -3.5)
+
+    def test_infinite_constants_are_rejected(self):
+        for expression in ('1e999', '-1e999', '1e999 - 1e999'):
+            with self.assertRaises(safe_eval.UnsafeExpression):
+                safe_eval.evaluate(expression)
+
+    def test_code_is_rejected(self):
+        for expression in ('__import__("os")', '().__class__', 'x', '"a"*9', 'lambda: 1'):
+            with self.assertRaises((safe_eval.UnsafeExpression, SyntaxError)):
+                safe_eval.evaluate(expression)
+
+class EvaluateAsyncTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncTearDown(self):
+        safe_eval.shutdown()
+
+    async def test_first_call_after_cold_start_is_not_timed_out(self):
+        # A spawn worker takes far longer than this to start, so only the evaluation itself may count
+        self.assertEqual(await safe_eval.evaluate_async('6*7', timeout=0.2), 42)
+
+    async def test_timeout_replaces_the_pool(self):
+        await safe_eval.warm_up()
+        with self.assertRaises(safe_eval.EvaluationTimeout):
+            await safe_eval.evaluate_async('1+1', timeout=0)
+        self.assertEqual(await safe_eval.evaluate_async('6*7', timeout=0.2), 42)
+
+    async def test_concurrent_evaluations(self):
+        results = await asyncio.gather(*(safe_eval.evaluate_async(f'{i}*2') for i in range(20)))
+        self.assertEqual(results, [i * 2 for i in range(20)])
+
+    async def test_errors_come_back_from_the_worker(self):
+        with self.assertRaises(ZeroDivisionError):
+            await safe_eval.evaluate_async('1/0')
+        with self.assertRaises(safe_eval.UnsafeExpression):
+            await safe_eval.evaluate_async('1e999')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+"""Checks the admin !uptime client against the local UptimeRobot stub.
+
+    python -m unittest tests.test_uptime
+"""
+import asyncio
+import types
+import unittest
+from unittest import mock
+
+import aiohttp
+from aiohttp import web
+
+import uptimerobot_stub
+from cogs import admin
+
+CALLERS = 20
+STUB_DELAY = 0.05
+
+class FakeContext:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, content=None, **kwargs):
+        self.sent.append(content)
+
+class UptimeTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        app = uptimerobot_stub.create_app(delay=STUB_DELAY)
+        self.stub = app['stub']
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        port = self.runner.addresses[0][1]
+
+        self.session = aiohttp.ClientSession()
+        self.cog = admin.Admin(types.SimpleNamespace(http_session=self.session, config={}))
+        self.cog.api_key = 'stub'
+        self.cog.api_url = f'http://127.0.0.1:{port}/v2/getMonitors'
+
+    async def asyncTearDown(self):
+        await self.session.close()
+        await self.runner.cleanup()
+
+    async def uptime(self):
+        ctx = FakeContext()
+        await self.cog.uptime_details.callback(self.cog, ctx)
+        return ctx.sent
+
+    async def test_concurrent_calls_share_one_request(self):
+        results = await asyncio.gather(*(self.cog.get_monitor_data() for _ in range(CALLERS)))
+        self.assertEqual(self.stub['requests'], 1)
+        self.assertTrue(all(result == uptimerobot_stub.MONITORS for result in results))
+
+    async def test_responses_are_cached_for_the_ttl(self):
+        await self.cog.get_monitor_data()
+        await self.cog.get_monitor_data()
+        self.assertEqual(self.stub['requests'], 1)
+
+        with mock.patch.object(admin, 'MONITOR_CACHE_TTL', 0):
+            await self.cog.get_monitor_data()
+        self.assertEqual(self.stub['requests'], 2)
+
+    async def test_uptime_summary(self):
+        self.assertEqual(await self.uptime(), ["**Total Monitors:** 3\n**Currently Up:** 2\n**Success Rate:** 66.7%"])
+
+    async def test_malformed_bodies_are_reported_to_every_caller(self):
+        for body in (["not", "a", "dict"], "text", 42, {"stat": "ok", "monitors": "none"}, {"stat": "ok", "monitors": [1, 2]}):
+            self.cog._monitor_cache = None
+            self.stub['body'] = body
+            results = await asyncio.gather(*(self.uptime() for _ in range(CALLERS)), return_exceptions=True)
+            self.assertEqual(results, [["❌ Error: Invalid JSON response"]] * CALLERS, body)
+
+    async def test_api_errors_are_not_cached(self):
+        self.stub['body'] = {"stat": "fail", "error": {"message": "rate limited"}}
+        self.assertEqual((await self.uptime())[0], "❌ Error: API Error: {'message': 'rate limited'}")
+        self.stub['body'] = None
+        self.assertEqual(len(await self.cog.get_monitor_data()), 3)
+        self.assertEqual(self.stub['requests'], 2)
+
+    async def test_unreachable_api(self):
+        self.cog.api_url = 'http://127.0.0.1:9/v2/getMonitors'
+        self.assertTrue((await self.uptime())[0].startswith("❌ Error: Request failed"))
+
+if __name__ == '__main__':
+    unittest.main()
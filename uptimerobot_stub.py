@@ -0,0 +1,46 @@
+"""A local stand-in for the UptimeRobot getMonitors API, for trying !uptime offline.
+
+Run it, then start the bot with:
+    UPTIMEROBOT_API_URL=http://127.0.0.1:8765/v2/getMonitors UPTIMEROBOT_API_KEY=stub
+
+Usage: python uptimerobot_stub.py [port] [delay_seconds]
+"""
+import asyncio
+import sys
+import time
+from aiohttp import web
+
+MONITORS = [
+    {"id": 1, "friendly_name": "Bot Web Server", "url": "http://127.0.0.1:5000", "status": 2},
+    {"id": 2, "friendly_name": "Bot Ping", "url": "http://127.0.0.1:5000/ping", "status": 2},
+    {"id": 3, "friendly_name": "Staging", "url": "http://127.0.0.1:5001", "status": 9},
+]
+
+def create_app(delay=0.0):
+    """Builds the stub app; `delay` simulates a slow upstream API.
+
+    app['stub'] counts the requests served; setting its 'body' makes the stub answer with that
+    JSON instead, to try malformed responses.
+    """
+    app = web.Application()
+    # A dict the handler mutates, since an app's own keys can't change once it has started
+    app['stub'] = stub = {"requests": 0, "body": None}
+
+    async def get_monitors(request):
+        stub["requests"] += 1
+        form = await request.post()
+        if not form.get('api_key'):
+            return web.json_response({"stat": "fail", "error": {"type": "invalid_parameter", "message": "api_key is missing."}})
+        if delay:
+            await asyncio.sleep(delay)
+        if stub["body"] is not None:
+            return web.json_response(stub["body"])
+        return web.json_response({"stat": "ok", "monitors": MONITORS, "served_at": time.time()})
+
+    app.router.add_post('/v2/getMonitors', get_monitors)
+    return app
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0
+    web.run_app(create_app(delay), host='127.0.0.1', port=port)
@@ -0,0 +1,90 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+import metrics
+
+HEARTBEAT_INTERVAL = 0.1           # Seconds between event loop heartbeats
+DEFAULT_STALL_THRESHOLD_MS = 250   # Overridable with LOOP_STALL_MS in config.json
+MAX_STALLS_KEPT = 20
+
+stalls_total = metrics.Counter("bot_event_loop_stalls_total", "Times the event loop was blocked past the stall threshold.")
+
+class LoopWatchdog:
+    """Detects event loop stalls and records what the loop thread was doing during them.
+
+    A heartbeat coroutine stamps the time every HEARTBEAT_INTERVAL and records how late each
+    wakeup was. A separate thread watches the stamp; when it goes stale past the threshold the
+    loop is blocked, so the thread grabs the loop thread's current stack, which points straight
+    at the synchronous call holding it up.
+    """
+    def __init__(self, threshold_ms=DEFAULT_STALL_THRESHOLD_MS):
+        self.threshold = threshold_ms / 1000
+        self.last_beat = time.monotonic()
+        self.recent_lag = deque(maxlen=600)  # About the last minute of heartbeats
+        self.stalls = deque(maxlen=MAX_STALLS_KEPT)
+        self.loop_thread_id = None
+        self._current_stall = None
+        self._heartbeat_task = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.loop_thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + HEARTBEAT_INTERVAL
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self.last_beat = now
+            self.recent_lag.append(lag)
+            metrics.record_loop_lag(lag)
+
+            stall = self._current_stall
+            if stall is not None:
+                # The loop is running again; note how long the stall lasted in total
+                stall['duration'] = lag
+                self._current_stall = None
+
+    def _watch(self):
+        while not self._stop.wait(HEARTBEAT_INTERVAL / 2):
+            stale_for = time.monotonic() - self.last_beat - HEARTBEAT_INTERVAL
+            if stale_for < self.threshold or self._current_stall is not None:
+                continue
+            frame = sys._current_frames().get(self.loop_thread_id)
+            stall = {
+                "time": time.time(),
+                "duration": stale_for,  # Replaced with the full duration once the loop recovers
+                "stack": "".join(traceback.format_stack(frame)) if frame else "(loop thread not found)"
+            }
+            self._current_stall = stall
+            self.stalls.append(stall)
+            stalls_total.inc()
+            print(f"⚠️ Event loop blocked for over {stale_for * 1000:.0f}ms. Stack:\n{stall['stack']}")
+
+    def lag_percentiles(self):
+        """p50/p95/p99/max of the recent heartbeat lag, in milliseconds."""
+        lags = sorted(self.recent_lag)
+        if not lags:
+            return None
+        pick = lambda pct: lags[min(len(lags) - 1, int(len(lags) * pct))] * 1000
+        return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": lags[-1] * 1000}
+
+def start(bot):
+    """Starts the watchdog on the running loop and attaches it to the bot."""
+    bot.watchdog = LoopWatchdog(bot.config.get('LOOP_STALL_MS', DEFAULT_STALL_THRESHOLD_MS))
+    bot.watchdog.start()
+    return bot.watchdog
@@ -0,0 +1,111 @@
+import os
+import time
+from aiohttp import web
+import metrics
+
+# --- Status Page ---
+# The page never changes, so it is rendered once at import instead of on every request.
+STATUS_PAGE = '''
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Bot Status</title>
+    <style>
+        body {
+            font-family: Arial, sans-serif;
+            text-align: center;
+            margin-top: 50px;
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            color: white;
+            min-height: 100vh;
+            display: flex;
+            align-items: center;
+            justify-content: center;
+            flex-direction: column;
+        }
+        .status-box {
+            background: rgba(255,255,255,0.1);
+            padding: 40px;
+            border-radius: 15px;
+            backdrop-filter: blur(10px);
+            box-shadow: 0 8px 32px rgba(0,0,0,0.1);
+        }
+        h1 {
+            font-size: 3em;
+            margin-bottom: 20px;
+            text-shadow: 2px 2px 4px rgba(0,0,0,0.3);
+        }
+        .pulse {
+            animation: pulse 2s infinite;
+        }
+        @keyframes pulse {
+            0% { opacity: 1; }
+            50% { opacity: 0.7; }
+            100% { opacity: 1; }
+        }
+    </style>
+</head>
+<body>
+    <div class="status-box">
+        <h1 class="pulse">🤖 I'm Alive!</h1>
+        <p>Discord Bot is running successfully</p>
+        <p>✅ All systems operational</p>
+    </div>
+</body>
+</html>
+'''.encode('utf-8')
+
+class WebServer:
+    """Serves the keep-alive and health endpoints from the bot's own event loop."""
+    def __init__(self, bot, host='0.0.0.0', port=None):
+        self.bot = bot
+        self.host = host
+        self.port = port or int(os.environ.get("PORT", 5000))
+        self.runner = None
+        self.last_request_at = 0.0  # Last request that wasn't the bot's own keep-alive ping
+
+        self.app = web.Application(middlewares=[self.track_traffic])
+        self.app.router.add_get('/', self.alive)
+        self.app.router.add_get('/ping', self.ping)
+        self.app.router.add_get('/health', self.health)
+        self.app.router.add_get('/metrics', self.metrics_page)
+
+    @web.middleware
+    async def track_traffic(self, request, handler):
+        if 'X-Keep-Alive' not in request.headers:
+            self.last_request_at = time.time()
+        return await handler(request)
+
+    async def alive(self, request):
+        return web.Response(body=STATUS_PAGE, content_type='text/html', charset='utf-8')
+
+    async def ping(self, request):
+        """Simple ping endpoint for UptimeRobot"""
+        return web.json_response({"status": "alive", "timestamp": time.time()})
+
+    async def health(self, request):
+        """Detailed health check"""
+        return web.json_response({
+            "status": "healthy",
+            "bot_connected": self.bot.is_ready(),
+            "uptime": time.time() - metrics.PROCESS_START,
+            "service": "discord_bot"
+        })
+
+    async def metrics_page(self, request):
+        """Prometheus text exposition of the bot's internal metrics"""
+        return web.Response(text=metrics.render(), headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+    async def start(self):
+        # access_log=None keeps request logging quiet, like the old server
+        self.runner = web.AppRunner(self.app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        print(f"✅ Web server started on http://{self.host}:{self.port}")
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
+            print("🛑 Web server stopped")